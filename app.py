@@ -1,3 +1,4 @@
+import json
 import os
 import sys
 import time
@@ -6,22 +7,19 @@ import time
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
 from flask import (
+    Blueprint,
     Flask,
     render_template,
     request,
     jsonify,
+    Response,
 )
-from flask_caching import Cache
-from dexscreener import DexscreenerClient
-import pandas as pd
-import matplotlib
-matplotlib.use('Agg')  
 import logging
 from dotenv import load_dotenv
 
 # Configure logging
 logging.basicConfig(
-    level=logging.DEBUG,
+    level=os.getenv('LOG_LEVEL', 'INFO').upper(),
     format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
 )
 logger = logging.getLogger(__name__)
@@ -29,43 +27,36 @@ logger = logging.getLogger(__name__)
 # Load environment variables
 load_dotenv()
 
-# RUN FLASK
-app = Flask(__name__)
+# Computed /landing_page_data results, shared across workers when CACHE_BACKEND is sqlite or redis
+from utils.cache import make_cache, RESULT_CACHE_TTL
+result_cache = make_cache('results', ttl=RESULT_CACHE_TTL)
 
-# Single configuration block for all app settings
-app.config.update(
-    SECRET_KEY=os.getenv('SECRET_KEY', 'your-secret-key-here'),
-    STATIC_FOLDER='static',
-    CACHING=True,
-    CACHE_TYPE='simple'
-)
-
-logger.info("App configuration complete")
-
-# Error handlers
-@app.errorhandler(500)
-def internal_error(error):
-    logger.error(f"Internal Server Error: {error}")
-    return jsonify({"error": "Internal Server Error", "details": str(error)}), 500
+from utils.client_logs import SHARED_CHANNEL, valid_channel_name
+from utils.serialization import SCHEMAS, json_response, opportunity_payload
 
-@app.errorhandler(404)
-def not_found_error(error):
-    logger.error(f"Not Found Error: {error}")
-    return jsonify({"error": "Not Found", "details": str(error)}), 404
-
-@app.errorhandler(Exception)
-def handle_exception(error):
-    logger.error(f"Unhandled Exception: {error}", exc_info=True)
-    return jsonify({"error": "Internal Server Error", "details": str(error)}), 500
+# The pipeline (numpy, pydantic models, the shared Dexscreener fetcher) is imported by the
+# first route that needs it, or up front by warm_up() in a preloading gunicorn master
+routes = Blueprint('arbscreener', __name__)
 
-# Single cache initialization
-cache = Cache(app)
-logger.info("Cache initialized")
+def compute_landing_page_data(cache_key, investment_amount, slippage_rate, transaction_fee, contract_address, emit=None):
+    from utils.main_utils import process_arbitrage_data
+    from utils.rate_limiter import priority_scope
 
-client = DexscreenerClient()
+    # Interactive searches draw on the full upstream budget
+    with priority_scope('high'):
+        arbitrage_results = process_arbitrage_data(
+            None,  # No user portfolio needed
+            investment_amount,
+            slippage_rate,
+            transaction_fee,
+            search_address=contract_address,
+            emit=emit
+        )
+    result_cache.set(cache_key, arbitrage_results)
+    return arbitrage_results
 
 # APPLICATION ROUTES
-@app.route('/', methods=['GET', 'POST'])
+@routes.route('/', methods=['GET', 'POST'])
 def index():
     logger.info("Handling request to index route")
     try:
@@ -78,58 +69,267 @@ def index():
         logger.error(f"Error in index route: {e}")
         return jsonify({"error": str(e)}), 500
 
-@app.route('/landing_page_data', methods=['POST'])
+@routes.route('/landing_page_data', methods=['POST'])
 def fetch_arbitrage_opportunities():
     logger.info("Handling request to fetch arbitrage opportunities")
     try:
-        from utils.main_utils import process_arbitrage_data
+        from utils.main_utils import client_logs, inflight
+        from utils.poller import poller
 
         investment_amount = float(request.form.get('initial_investment', 10000))
         slippage_rate = float(request.form.get('slippage', 0.0005))
         transaction_fee = float(request.form.get('fee_percentage', 0.0003))
         contract_address = request.form.get('search', '7vfCXTUXx5WJV5JADk17DUJ4ksgau7utNKj4b963voxs')
+        log_channel = request.form.get('log_channel')
+        if log_channel and not valid_channel_name(log_channel):
+            return jsonify({"error": "Invalid log_channel"}), 400
+        schema = request.form.get('schema', 'lean')
+        if schema not in SCHEMAS:
+            return jsonify({"error": f"schema must be one of {', '.join(SCHEMAS)}"}), 400
+        try:
+            limit = result_limit(request.form)
+        except ValueError:
+            return jsonify({"error": "limit must be a non-negative integer"}), 400
 
         logger.debug(f"Processing request with parameters: investment={investment_amount}, slippage={slippage_rate}, fee={transaction_fee}, contract={contract_address}")
 
-        arbitrage_results = process_arbitrage_data(
-            None,  # No user portfolio needed 
-            investment_amount, 
-            slippage_rate, 
-            transaction_fee, 
-            search_address=contract_address
-        )
-        
-        return jsonify(arbitrage_results), 200
+        # Watched contracts are served from the poller's latest snapshot
+        snapshot = poller.latest(contract_address, investment_amount, slippage_rate, transaction_fee)
+        if snapshot is not None:
+            arbitrage_results, fetched_at = snapshot
+            return json_response(opportunity_payload(arbitrage_results[:limit], schema), headers={
+                'X-Snapshot-Timestamp': f"{fetched_at:.3f}",
+                'X-Snapshot-Age': f"{time.time() - fetched_at:.3f}",
+            })
+
+        cache_key = ('landing_page_data', contract_address, investment_amount, slippage_rate, transaction_fee)
+        arbitrage_results = result_cache.get(cache_key)
+        if arbitrage_results is None:
+            # Identical searches already running in this worker share their result
+            with client_logs.scope(log_channel):
+                arbitrage_results = inflight.do(
+                    cache_key,
+                    compute_landing_page_data,
+                    cache_key,
+                    investment_amount,
+                    slippage_rate,
+                    transaction_fee,
+                    contract_address,
+                )
+
+        return json_response(opportunity_payload(arbitrage_results[:limit], schema))
     except Exception as e:
         logger.error(f"Error in fetch_arbitrage_opportunities: {e}")
         return jsonify({"error": str(e)}), 500
 
-from utils.main_utils import client_handler
-@app.route('/get_logs', methods=['GET'])
-def get_logs():
+@routes.route('/landing_page_batch', methods=['POST'])
+def fetch_arbitrage_opportunities_batch():
+    """
+    /landing_page_data for many addresses in one request: a JSON body with `addresses`
+    (or a form with comma separated `search`), answered as {address: opportunities}.
+    """
+    logger.info("Handling batch request for arbitrage opportunities")
     try:
-        logs = client_handler.get_logs()
-        return jsonify(logs)
+        from utils.batch import BATCH_MAX_ADDRESSES, process_arbitrage_batch
+
+        params = request.get_json(silent=True) or request.form
+        addresses = params.get('addresses') or [address.strip() for address in params.get('search', '').split(',')]
+        addresses = [address for address in addresses if address]
+        if not addresses:
+            return jsonify({"error": "No addresses given"}), 400
+        if len(addresses) > BATCH_MAX_ADDRESSES:
+            return jsonify({"error": f"At most {BATCH_MAX_ADDRESSES} addresses per batch"}), 400
+        schema = params.get('schema', 'lean')
+        if schema not in SCHEMAS:
+            return jsonify({"error": f"schema must be one of {', '.join(SCHEMAS)}"}), 400
+        try:
+            limit = result_limit(params)
+        except ValueError:
+            return jsonify({"error": "limit must be a non-negative integer"}), 400
+
+        results = process_arbitrage_batch(
+            addresses,
+            float(params.get('initial_investment', 10000)),
+            float(params.get('slippage', 0.0005)),
+            float(params.get('fee_percentage', 0.0003)),
+        )
+        return json_response({address: opportunity_payload(opportunities[:limit], schema)
+                              for address, opportunities in results.items()})
     except Exception as e:
-        logger.error(f"Error in get_logs: {e}")
+        logger.error(f"Error in fetch_arbitrage_opportunities_batch: {e}")
         return jsonify({"error": str(e)}), 500
 
-if __name__ == '__main__':
+def result_limit(params):
+    """The `limit` parameter: how many of the best opportunities to return, None (all of them) when absent."""
+    value = params.get('limit')
+    if value in (None, ''):
+        return None
+    limit = int(value)
+    if limit < 0:
+        raise ValueError('limit must not be negative')
+    return limit or None
+
+def sweep_values(params, key, default):
+    """A sweep parameter as a list: a JSON list, a comma separated string or a single value."""
+    value = params.get(key, default)
+    if isinstance(value, str):
+        value = value.split(',')
+    elif not isinstance(value, list):
+        value = [value]
+    return [float(item) for item in value]
+
+@routes.route('/landing_page_sweep', methods=['POST'])
+def fetch_arbitrage_opportunities_sweep():
+    """
+    /landing_page_data for many parameter scenarios over one search: a JSON body with
+    `scenarios` ([{initial_investment, slippage, fee_percentage}, ...]) or lists of
+    values for those three keys, swept as a grid. Answered as one entry per scenario.
+    """
+    logger.info("Handling sweep request for arbitrage opportunities")
     try:
-        # Use PORT environment variable for Railway
-        port = int(os.getenv('PORT', 8080))
-        logger.info(f"Starting application on port {port}")
-        app.run(host='0.0.0.0', port=port)
+        from utils.sweep import SWEEP_MAX_SCENARIOS, Scenario, process_arbitrage_sweep, scenario_grid
+
+        params = request.get_json(silent=True) or request.form
+        contract_address = params.get('search') or '7vfCXTUXx5WJV5JADk17DUJ4ksgau7utNKj4b963voxs'
+        if params.get('scenarios'):
+            listed = params['scenarios']
+            if isinstance(listed, str):
+                listed = json.loads(listed)
+            scenarios = [Scenario(float(scenario.get('initial_investment', 10000)),
+                                  float(scenario.get('slippage', 0.0005)),
+                                  float(scenario.get('fee_percentage', 0.0003)))
+                         for scenario in listed]
+        else:
+            scenarios = scenario_grid(sweep_values(params, 'initial_investment', 10000),
+                                      sweep_values(params, 'slippage', 0.0005),
+                                      sweep_values(params, 'fee_percentage', 0.0003))
+        if len(scenarios) > SWEEP_MAX_SCENARIOS:
+            return jsonify({"error": f"At most {SWEEP_MAX_SCENARIOS} scenarios per sweep"}), 400
+        schema = params.get('schema', 'lean')
+        if schema not in SCHEMAS:
+            return jsonify({"error": f"schema must be one of {', '.join(SCHEMAS)}"}), 400
+        try:
+            limit = result_limit(params)
+        except ValueError:
+            return jsonify({"error": "limit must be a non-negative integer"}), 400
+
+        results = process_arbitrage_sweep(None, scenarios, search_address=contract_address)
+        for scenario, arbitrage_results in zip(scenarios, results):
+            # Later single searches with one of the swept parameter sets are served from the cache
+            result_cache.set(('landing_page_data', contract_address) + tuple(scenario), arbitrage_results)
+        return json_response([dict(scenario._asdict(), opportunities=opportunity_payload(found[:limit], schema))
+                              for scenario, found in zip(scenarios, results)])
     except Exception as e:
-        logger.critical(f"Failed to start application: {e}", exc_info=True)
-        raise
+        logger.error(f"Error in fetch_arbitrage_opportunities_sweep: {e}")
+        return jsonify({"error": str(e)}), 500
+
+def compute_cycle_data(cache_key, contract_address, slippage_rate, transaction_fee, max_hops):
+    from utils.main_utils import process_cycle_data
+    from utils.rate_limiter import priority_scope
+
+    with priority_scope('high'):
+        cycles = process_cycle_data(contract_address, slippage_rate, transaction_fee, limit=None, max_hops=max_hops)
+    result_cache.set(cache_key, cycles)
+    return cycles
+
+@routes.route('/landing_page_cycles', methods=['POST'])
+def fetch_cycle_opportunities():
+    """
+    Trade cycles of 3 up to `max_hops` pools through the searched token's pools and
+    the pools trading their other tokens, sized on the x·y=k curves, best first.
+    """
+    logger.info("Handling request to fetch cycle opportunities")
+    try:
+        from utils.main_utils import CYCLE_MAX_HOPS, inflight
+
+        slippage_rate = float(request.form.get('slippage', 0.0005))
+        transaction_fee = float(request.form.get('fee_percentage', 0.0003))
+        contract_address = request.form.get('search', '7vfCXTUXx5WJV5JADk17DUJ4ksgau7utNKj4b963voxs')
+        max_hops = int(request.form.get('max_hops', CYCLE_MAX_HOPS))
+        if not 3 <= max_hops <= CYCLE_MAX_HOPS:
+            return jsonify({"error": f"max_hops must be between 3 and {CYCLE_MAX_HOPS}"}), 400
+        try:
+            limit = result_limit(request.form)
+        except ValueError:
+            return jsonify({"error": "limit must be a non-negative integer"}), 400
+
+        cache_key = ('landing_page_cycles', contract_address, slippage_rate, transaction_fee, max_hops)
+        cycles = result_cache.get(cache_key)
+        if cycles is None:
+            cycles = inflight.do(cache_key, compute_cycle_data, cache_key, contract_address,
+                                 slippage_rate, transaction_fee, max_hops)
+        return json_response(cycles[:limit])
+    except Exception as e:
+        logger.error(f"Error in fetch_cycle_opportunities: {e}")
+        return jsonify({"error": str(e)}), 500
+
+@routes.route('/landing_page_stream', methods=['GET'])
+def stream_arbitrage_opportunities():
+    """
+    Same search as /landing_page_data as server-sent events: each opportunity as
+    soon as it is confirmed, with progress and log events, then 'done'.
+    """
+    logger.info("Handling request to stream arbitrage opportunities")
+    from utils.main_utils import inflight
+    from utils.poller import poller
+    from utils.streaming import replay_events, stream_events
+
+    investment_amount = float(request.args.get('initial_investment', 10000))
+    slippage_rate = float(request.args.get('slippage', 0.0005))
+    transaction_fee = float(request.args.get('fee_percentage', 0.0003))
+    contract_address = request.args.get('search') or '7vfCXTUXx5WJV5JADk17DUJ4ksgau7utNKj4b963voxs'
+
+    snapshot = poller.latest(contract_address, investment_amount, slippage_rate, transaction_fee)
+    cache_key = ('landing_page_data', contract_address, investment_amount, slippage_rate, transaction_fee)
+    cached_results = result_cache.get(cache_key) if snapshot is None else None
+    if snapshot is not None:
+        arbitrage_results, fetched_at = snapshot
+        events = replay_events(arbitrage_results, snapshot_timestamp=fetched_at,
+                               snapshot_age=time.time() - fetched_at)
+    elif cached_results is not None:
+        events = replay_events(cached_results)
+    else:
+        # Identical searches already running in this worker, streamed or not, share one run
+        events = stream_events(compute_landing_page_data, cache_key, investment_amount,
+                               slippage_rate, transaction_fee, contract_address, key=cache_key, group=inflight)
+
+    return Response(events, mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no',  # Keep nginx-style proxies from buffering the stream
+    })
+
+@routes.route('/get_logs', methods=['GET'])
+def get_logs():
+    """
+    Log messages of a channel numbered above `after`, with the cursor to pass next
+    time. Reading leaves them in place for other readers.
+    """
+    try:
+        from utils.main_utils import client_logs
+
+        channel = request.args.get('channel') or SHARED_CHANNEL
+        if not valid_channel_name(channel):
+            return jsonify({"error": "Invalid channel"}), 400
+        return jsonify(client_logs.read(channel, request.args.get('after', -1, type=int)))
+    except Exception as e:
+        logger.error(f"Error in get_logs: {e}")
+        return jsonify({"error": str(e)}), 500
 
 # Health check endpoint
-@app.route('/health')
+@routes.route('/health')
 def health_check():
     try:
+        from utils.main_utils import pair_cache, upstream_limiter, inflight, history, pool_repository
+        from utils.poller import poller
         return jsonify({
             "status": "healthy",
+            "pair_cache": pair_cache.stats(),
+            "result_cache": result_cache.stats(),
+            "rate_limiter": upstream_limiter.stats(),
+            "single_flight": inflight.stats(),
+            "poller": poller.stats(),
+            "history": history.stats() if history is not None else None,
+            "persistence": pool_repository.stats() if pool_repository is not None else None,
             "timestamp": time.time()
         })
     except Exception as e:
@@ -140,3 +340,78 @@ def health_check():
             "timestamp": time.time()
         }), 500
 
+
+# Prometheus scrape endpoint, summed over every worker sharing METRICS_PATH
+@routes.route('/metrics')
+def prometheus_metrics():
+    from utils.metrics import metrics
+    return Response(metrics.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+
+def internal_error(error):
+    logger.error(f"Internal Server Error: {error}")
+    return jsonify({"error": "Internal Server Error", "details": str(error)}), 500
+
+def not_found_error(error):
+    logger.error(f"Not Found Error: {error}")
+    return jsonify({"error": "Not Found", "details": str(error)}), 404
+
+def handle_exception(error):
+    logger.error(f"Unhandled Exception: {error}", exc_info=True)
+    return jsonify({"error": "Internal Server Error", "details": str(error)}), 500
+
+def create_app():
+    """
+    The Flask app with every route and error handler. Light to build: the
+    pipeline modules load on the first request that uses them, see warm_up().
+    """
+    app = Flask(__name__)
+
+    # Single configuration block for all app settings
+    app.config.update(
+        SECRET_KEY=os.getenv('SECRET_KEY', 'your-secret-key-here'),
+        STATIC_FOLDER='static',
+    )
+    app.register_error_handler(500, internal_error)
+    app.register_error_handler(404, not_found_error)
+    app.register_error_handler(Exception, handle_exception)
+    app.register_blueprint(routes)
+
+    logger.info("App configuration complete")
+    return app
+
+def warm_up(app):
+    """
+    Import the pipeline and compile the page template ahead of the first request.
+    Run in a preloading gunicorn master (see gunicorn.conf.py) so every worker
+    forks with them already in copy-on-write memory.
+    """
+    import utils.main_utils  # noqa: F401  numpy, the Dexscreener models, the shared fetcher and caches
+    import utils.batch  # noqa: F401
+    import utils.poller  # noqa: F401
+    import utils.streaming  # noqa: F401
+    import utils.sweep  # noqa: F401
+    app.jinja_env.get_template('index.html')
+    logger.info("Pipeline modules loaded")
+
+def start_background_tasks():
+    """
+    Start this process's market poller when POLLER_ENABLED. Threads do not survive
+    a fork, so under gunicorn each worker calls this from the post_fork hook.
+    """
+    from utils.poller import poller, POLLER_ENABLED
+    if POLLER_ENABLED:
+        poller.start()
+
+app = create_app()
+
+if __name__ == '__main__':
+    try:
+        start_background_tasks()
+        # Use PORT environment variable for Railway
+        port = int(os.getenv('PORT', 8080))
+        logger.info(f"Starting application on port {port}")
+        app.run(host='0.0.0.0', port=port)
+    except Exception as e:
+        logger.critical(f"Failed to start application: {e}", exc_info=True)
+        raise
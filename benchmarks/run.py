@@ -0,0 +1,214 @@
+"""
+Times the arbitrage pipeline stages on synthetic markets of growing size.
+
+    python -m benchmarks.run --sizes 100,1000,10000,100000 --output results.json
+    python -m benchmarks.run --output new.json --baseline results.json
+
+Each stage runs `--repeat` times per size with the garbage collector off; the
+minimum and median wall times are kept. Results are JSON with the machine and
+commit they came from, and --baseline flags stages that got slower.
+"""
+import argparse
+import gc
+import json
+import logging
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+
+from benchmarks.synthetic import LIQUIDITY_DISTRIBUTIONS, synthetic_market
+
+DEFAULT_SIZES = (100, 1000, 10000, 100000)
+# A stage whose median time grows by more than this fraction over the baseline is a regression
+DEFAULT_TOLERANCE = 0.2
+# Edges followed out of each token by the four-hop cycle stage
+CYCLE_MAX_EDGES = 8
+
+
+def measure(func, repeat=3, setup=None):
+    """(seconds of each run, result of the last run); setup() runs untimed before each one."""
+    times, result = [], None
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        gc.collect()
+        gc.disable()
+        try:
+            started = time.perf_counter()
+            result = func()
+            times.append(time.perf_counter() - started)
+        finally:
+            gc.enable()
+    return times, result
+
+
+def stage_result(stage, pools, items, times):
+    best = min(times)
+    return {
+        'stage': stage,
+        'pools': pools,
+        'items': items,
+        'repeat': len(times),
+        'min': best,
+        'median': statistics.median(times),
+        'items_per_second': items / best if best else None,
+    }
+
+
+def benchmark_size(pool_count, repeat=3, token_count=None, chain_count=1, liquidity='lognormal', seed=7,
+                   initial_investment=10000, slippage=0.0005, fee_percentage=0.0003):
+    """Stage results for one synthetic market of `pool_count` pools."""
+    import utils.main_utils as main_utils
+    from src.controllers import ArbitrageController
+    from utils.replay import ReplayFetcher, SimulatedClock, replay_environment
+
+    pairs = synthetic_market(pool_count, token_count, chain_count, liquidity, seed=seed)
+    results = []
+
+    times, pools = measure(lambda: main_utils.process_token_pairs(pairs), repeat)
+    results.append(stage_result('process_token_pairs', pool_count, len(pairs), times))
+
+    times, opportunities = measure(lambda: main_utils.find_arbitrage_opportunities(
+        pools, slippage, fee_percentage, initial_investment, None), repeat)
+    results.append(stage_result('find_arbitrage_opportunities', pool_count, len(pools), times))
+
+    # Third-pool lookups are answered offline from the synthetic market
+    replay_fetcher = ReplayFetcher()
+    replay_fetcher.update(pairs)
+    with replay_environment(replay_fetcher, SimulatedClock()) as before_tick:
+        quote_pairs, pair_chains = main_utils.filter_and_process_opportunities(opportunities)
+        unique_pair_addresses = main_utils.matching_pair_addresses(opportunities, quote_pairs, pair_chains)
+
+        def fresh_state():
+            # Every run fetches, rather than reusing the pool snapshots of the previous one
+            before_tick()
+            main_utils.pool_snapshots = main_utils.PoolSnapshotStore()
+
+        times, combined = measure(lambda: main_utils.find_third_contract_data(
+            unique_pair_addresses, opportunities, initial_investment, slippage, fee_percentage),
+            repeat, setup=fresh_state)
+    results.append(stage_result('find_third_contract_data', pool_count, len(opportunities), times))
+
+    def discrepancies():
+        for opportunity in combined:
+            main_utils.calculate_price_discrepancies(opportunity)
+
+    times, _ = measure(discrepancies, repeat)
+    results.append(stage_result('calculate_price_discrepancies', pool_count, len(combined), times))
+
+    controller = ArbitrageController(fee=fee_percentage)
+    pool_records = [pool for pool in pools if pool.price_native > 0]
+    times, _ = measure(lambda: controller.find_arbitrage_opportunities(pool_records), repeat)
+    results.append(stage_result('ArbitrageController.find_arbitrage_opportunities', pool_count,
+                                len(pool_records), times))
+
+    # Four-hop cycles over the best-rated edges of each token, the bounded search on hub-heavy graphs
+    cycle_controller = ArbitrageController(max_hops=4, fee=fee_percentage, max_edges=CYCLE_MAX_EDGES)
+    times, _ = measure(lambda: cycle_controller.find_cycles(pool_records), repeat)
+    results.append(stage_result('ArbitrageController.find_cycles', pool_count, len(pool_records), times))
+    return results
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__)), check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def environment():
+    import numpy as np
+
+    return {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'machine': platform.machine(),
+        'processor': platform.processor(),
+        'cpu_count': os.cpu_count(),
+        'numpy': np.__version__,
+        'commit': git_commit(),
+        'timestamp': time.time(),
+    }
+
+
+def compare_results(baseline, current, tolerance=DEFAULT_TOLERANCE):
+    """
+    (stage, pools, baseline median, current median, ratio, regressed) for every
+    stage and size present in both runs.
+    """
+    previous = {(result['stage'], result['pools']): result for result in baseline['results']}
+    rows = []
+    for result in current['results']:
+        before = previous.get((result['stage'], result['pools']))
+        if before is None:
+            continue
+        ratio = result['median'] / before['median'] if before['median'] else float('inf')
+        rows.append((result['stage'], result['pools'], before['median'], result['median'], ratio,
+                     ratio > 1 + tolerance))
+    return rows
+
+
+def format_results(results):
+    lines = [f"{'stage':<50} {'pools':>8} {'items':>9} {'min s':>10} {'median s':>10} {'items/s':>12}"]
+    for result in results:
+        rate = result['items_per_second']
+        lines.append(f"{result['stage']:<50} {result['pools']:>8} {result['items']:>9} {result['min']:>10.4f} "
+                     f"{result['median']:>10.4f} {rate if rate is not None else float('nan'):>12,.0f}")
+    return '\n'.join(lines)
+
+
+def format_comparison(rows):
+    lines = [f"{'stage':<50} {'pools':>8} {'before s':>10} {'after s':>10} {'ratio':>7}"]
+    for stage, pools, before, after, ratio, regressed in rows:
+        lines.append(f"{stage:<50} {pools:>8} {before:>10.4f} {after:>10.4f} {ratio:>7.2f}"
+                     f"{'  REGRESSION' if regressed else ''}")
+    return '\n'.join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark the arbitrage pipeline on synthetic markets.')
+    parser.add_argument('--sizes', default=','.join(map(str, DEFAULT_SIZES)), help='comma separated pool counts')
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--tokens', type=int, default=None, help='token universe size (default: pools / 10)')
+    parser.add_argument('--chains', type=int, default=1)
+    parser.add_argument('--liquidity', choices=LIQUIDITY_DISTRIBUTIONS, default='lognormal')
+    parser.add_argument('--seed', type=int, default=7)
+    parser.add_argument('--output', help='write the results as JSON to this file')
+    parser.add_argument('--baseline', help='results JSON of an earlier run to compare against')
+    parser.add_argument('--tolerance', type=float, default=DEFAULT_TOLERANCE,
+                        help='slowdown ratio above 1 reported as a regression')
+    args = parser.parse_args(argv)
+
+    import utils.main_utils  # noqa: F401  Configures logging on import, quieted below
+
+    logging.getLogger().setLevel(logging.ERROR)
+    params = {'repeat': args.repeat, 'tokens': args.tokens, 'chains': args.chains,
+              'liquidity': args.liquidity, 'seed': args.seed}
+    results = []
+    for size in (int(size) for size in args.sizes.split(',') if size.strip()):
+        size_results = benchmark_size(size, args.repeat, args.tokens, args.chains, args.liquidity, args.seed)
+        print(format_results(size_results), flush=True)
+        results.extend(size_results)
+    report = {'environment': environment(), 'params': params, 'results': results}
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        if baseline.get('params') != params:
+            print(f"Baseline ran with {baseline.get('params')}, not {params}", file=sys.stderr)
+        rows = compare_results(baseline, report, args.tolerance)
+        print(format_comparison(rows))
+        if any(row[-1] for row in rows):
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,148 @@
+"""
+Times app startup and measures its memory, each run in a fresh interpreter.
+
+    python -m benchmarks.startup --repeat 5 --output startup.json
+
+Phases, cumulative within a run:
+  import_app     `import app`: the Flask app built by create_app()
+  warm_up        app.warm_up(): the pipeline modules a preloading gunicorn master loads
+  first_request  GET /health, the first request of a worker that was not warmed up
+
+For each phase the wall time since interpreter start and the RSS are kept. With
+--workers, the warmed process forks that many children, as gunicorn --preload
+does, and reports the memory each of them dirties on a request (Private_Dirty
+from /proc, Linux only).
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+PHASES = ('import_app', 'warm_up', 'first_request')
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def rss_bytes(pid='self'):
+    """Resident set size of a process, from /proc when there is one, else the peak RSS of this process."""
+    try:
+        with open(f'/proc/{pid}/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except OSError:
+        import resource
+
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == 'darwin' else peak * 1024
+
+
+def private_dirty_bytes(pid='self'):
+    """Memory the process wrote to since it forked, or None without /proc/<pid>/smaps_rollup."""
+    try:
+        with open(f'/proc/{pid}/smaps_rollup') as f:
+            for line in f:
+                if line.startswith('Private_Dirty:'):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        return None
+    return None
+
+
+def forked_workers(app, workers):
+    """Private_Dirty of each of `workers` children forked from this process after one request each."""
+    read_end, write_end = os.pipe()
+    children = []
+    for _ in range(workers):
+        pid = os.fork()
+        if pid == 0:
+            os.close(read_end)
+            app.test_client().get('/health')
+            os.write(write_end, json.dumps(private_dirty_bytes()).encode() + b'\n')
+            os._exit(0)
+        children.append(pid)
+    os.close(write_end)
+    with os.fdopen(read_end) as f:
+        results = [json.loads(line) for line in f]
+    for pid in children:
+        os.waitpid(pid, 0)
+    return results
+
+
+def child(workers):
+    """One measured startup, printed as JSON; runs in the fresh interpreter `measure_startup` starts."""
+    started = float(os.environ['STARTUP_BENCHMARK_T0'])
+    phases = {}
+
+    def mark(phase):
+        phases[phase] = {'seconds': time.time() - started, 'rss': rss_bytes()}
+
+    import app as app_module
+    mark('import_app')
+    app_module.warm_up(app_module.app)
+    mark('warm_up')
+    app_module.app.test_client().get('/health')
+    mark('first_request')
+
+    report = {'phases': phases}
+    if workers:
+        report['worker_private_dirty'] = forked_workers(app_module.app, workers)
+    print(json.dumps(report))
+
+
+def measure_startup(workers=0):
+    env = dict(os.environ, STARTUP_BENCHMARK_T0=repr(time.time()), LOG_LEVEL='ERROR', POLLER_ENABLED='false')
+    output = subprocess.run([sys.executable, '-m', 'benchmarks.startup', '--child', '--workers', str(workers)],
+                            cwd=ROOT, env=env, capture_output=True, text=True, check=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def summarize(runs):
+    results = []
+    for phase in PHASES:
+        seconds = [run['phases'][phase]['seconds'] for run in runs]
+        rss = [run['phases'][phase]['rss'] for run in runs]
+        results.append({'phase': phase, 'repeat': len(runs), 'min': min(seconds),
+                        'median': statistics.median(seconds), 'rss': statistics.median(rss)})
+    return results
+
+
+def format_results(results):
+    lines = [f"{'phase':<16} {'min s':>8} {'median s':>9} {'RSS MiB':>9}"]
+    for result in results:
+        lines.append(f"{result['phase']:<16} {result['min']:>8.3f} {result['median']:>9.3f} "
+                     f"{result['rss'] / 2**20:>9.1f}")
+    return '\n'.join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Measure app startup time and memory.')
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--workers', type=int, default=0, help='forked workers to measure after warm-up')
+    parser.add_argument('--output', help='write the results as JSON to this file')
+    parser.add_argument('--child', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.child:
+        child(args.workers)
+        return
+
+    runs = [measure_startup(args.workers) for _ in range(args.repeat)]
+    results = summarize(runs)
+    print(format_results(results))
+    dirty = [size for run in runs for size in run.get('worker_private_dirty', ()) if size is not None]
+    if dirty:
+        print(f"forked worker private dirty: median {statistics.median(dirty) / 2**20:.1f} MiB "
+              f"of {results[1]['rss'] / 2**20:.1f} MiB warmed RSS")
+
+    if args.output:
+        # Imported here so the measured child interpreters never load it
+        from benchmarks.run import environment
+
+        with open(args.output, 'w') as f:
+            json.dump({'environment': environment(), 'params': vars(args), 'results': results,
+                       'worker_private_dirty': dirty}, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
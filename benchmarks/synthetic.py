@@ -0,0 +1,65 @@
+import math
+import random
+from typing import List
+
+from dexscreener.models import TokenPair
+
+LIQUIDITY_DISTRIBUTIONS = ('uniform', 'lognormal', 'pareto')
+
+
+def liquidity_sampler(distribution: str, rng: random.Random):
+    """USD liquidity draws; lognormal and pareto give the long tail of real markets."""
+    if distribution == 'uniform':
+        return lambda: rng.uniform(1e3, 1e6)
+    if distribution == 'lognormal':
+        return lambda: rng.lognormvariate(math.log(5e4), 1.5)
+    if distribution == 'pareto':
+        return lambda: 2e3 * rng.paretovariate(1.1)
+    raise ValueError(f'Unknown liquidity distribution: {distribution}')
+
+
+def synthetic_market(pool_count: int, token_count: int = None, chain_count: int = 1,
+                     liquidity: str = 'lognormal', spread: float = 0.02, seed: int = 7) -> List[TokenPair]:
+    """
+    `pool_count` Dexscreener pairs over `token_count` tokens (default: one per
+    ten pools) spread over `chain_count` chains.
+
+    Every token has a reference USD price and each pool quotes the implied native
+    price off by up to `spread`, with its reserves in that ratio, so pools sharing
+    tokens disagree the way live ones do. The same arguments always build the same market.
+    """
+    rng = random.Random(seed)
+    token_count = max(3, token_count or pool_count // 10)
+    tokens = [f'TOKEN{n:06d}' for n in range(token_count)]
+    usd_prices = [math.exp(rng.uniform(math.log(1e-4), math.log(1e4))) for _ in tokens]
+    chains = ['solana', 'ethereum', 'bsc', 'base', 'arbitrum', 'polygon'][:chain_count]
+    chains += [f'chain{n}' for n in range(len(chains), chain_count)]
+    sample_liquidity = liquidity_sampler(liquidity, rng)
+    counts = {'buys': 1, 'sells': 1}
+    periods = {'m5': 0.0, 'h1': 0.0, 'h6': 0.0, 'h24': 0.0}
+
+    pairs = []
+    for n in range(pool_count):
+        base, quote = rng.sample(range(token_count), 2)
+        chain_id = chains[n % len(chains)]
+        price_native = usd_prices[base] / usd_prices[quote] * (1 + rng.uniform(-spread, spread))
+        liquidity_usd = sample_liquidity()
+        address = f'POOL{n:07d}'
+        pairs.append(TokenPair(**{
+            'chainId': chain_id,
+            'dexId': rng.choice(['raydium', 'orca', 'uniswap']),
+            'url': f'https://dexscreener.com/{chain_id}/{address}',
+            'pairAddress': address,
+            'baseToken': {'address': tokens[base], 'name': tokens[base], 'symbol': tokens[base]},
+            'quoteToken': {'address': tokens[quote], 'name': tokens[quote], 'symbol': tokens[quote]},
+            'priceNative': price_native,
+            'priceUsd': usd_prices[base],
+            'txns': {'m5': counts, 'h1': counts, 'h6': counts, 'h24': counts},
+            'volume': periods,
+            'priceChange': periods,
+            # Reserves in the ratio of the pool's own price, as a constant-product pool holds them
+            'liquidity': {'usd': liquidity_usd,
+                          'base': liquidity_usd / 2 / usd_prices[base],
+                          'quote': liquidity_usd / 2 / usd_prices[base] * price_native},
+        }))
+    return pairs
@@ -0,0 +1,35 @@
+"""
+gunicorn settings, read from the working directory by default.
+
+The app is loaded and warmed up once in the master, then workers fork from it
+and share its memory copy-on-write. GUNICORN_PRELOAD=false loads the app in
+each worker instead.
+
+Workers draw upstream requests from one rate-limit bucket in a SQLite file,
+so their combined rate stays within the Dexscreener limit.
+"""
+import gc
+import os
+import tempfile
+
+preload_app = os.getenv('GUNICORN_PRELOAD', 'true').lower() in ('1', 'true', 'yes')
+
+# Read by utils.rate_limiter on import, which happens after this file in the master and every worker
+os.environ.setdefault('RATE_LIMIT_STATE_PATH', os.path.join(tempfile.gettempdir(), 'arbscreener-rate-limit.sqlite3'))
+
+
+def when_ready(server):
+    # Runs in the master before the first worker is forked
+    if server.cfg.preload_app:
+        import app
+
+        app.warm_up(app.app)
+        # Objects loaded so far are never collected, so collections in the workers
+        # do not write to (and un-share) the pages holding them
+        gc.freeze()
+
+
+def post_fork(server, worker):
+    import app
+
+    app.start_background_tasks()
@@ -1,16 +1,41 @@
-from typing import List
+from itertools import permutations
+from typing import List, Optional
+from .graph import Cycle, TokenGraph
 from .models import LiquidityPool, ArbitrageOpportunity
 
 class ArbitrageController:
     """Controller to handle the logic for identifying triangular arbitrage opportunities."""
 
+    def __init__(self, max_hops: int = 3, fee: float = 0.0, max_edges: Optional[int] = None) -> None:
+        self.max_hops = max_hops
+        self.fee = fee
+        # Best-rated edges followed out of each token; None follows them all
+        self.max_edges = max_edges
+
+    def find_cycles(self, pools: List[LiquidityPool], profitable_only: bool = True) -> List[Cycle]:
+        """Find trade cycles of 3 up to `max_hops` pools, most profitable first."""
+        graph = TokenGraph(pools, self.fee)
+        cycles = list(graph.find_cycles(max_hops=self.max_hops, profitable_only=profitable_only,
+                                        max_edges=self.max_edges))
+        cycles.sort(key=lambda cycle: cycle.weight)
+        return cycles
+
     def find_arbitrage_opportunities(self, pools: List[LiquidityPool]) -> List[ArbitrageOpportunity]:
         """Identify sets of three pools that form a valid triangular arbitrage structure."""
-        opportunities = []
-        for pool_a in pools:
-            for pool_b in pools:
-                if pool_a.quote_token == pool_b.quote_token and pool_a.base_token != pool_b.base_token:
-                    for pool_c in pools:
-                        if pool_c.base_token == pool_a.base_token and pool_c.quote_token == pool_b.base_token:
-                            opportunities.append(ArbitrageOpportunity(pool_a, pool_b, pool_c))
-        return opportunities 
\ No newline at end of file
+        positions = {id(pool): position for position, pool in enumerate(pools)}
+        graph = TokenGraph(pools, self.fee)
+        seen = set()
+        matches = []
+        for cycle in graph.find_cycles(max_hops=3):
+            triangle = frozenset(id(pool) for pool in cycle.pools)
+            if triangle in seen:
+                continue  # The same triangle traded in the other direction
+            seen.add(triangle)
+            # pool_a and pool_b share a quote token, pool_c joins their base tokens
+            for pool_a, pool_b, pool_c in permutations(cycle.pools):
+                if pool_a.quote_token == pool_b.quote_token and pool_a.base_token != pool_b.base_token \
+                        and pool_c.base_token == pool_a.base_token and pool_c.quote_token == pool_b.base_token:
+                    key = (positions[id(pool_a)], positions[id(pool_b)], positions[id(pool_c)])
+                    matches.append((key, ArbitrageOpportunity(pool_a, pool_b, pool_c)))
+        matches.sort(key=lambda match: match[0])
+        return [opportunity for _, opportunity in matches]
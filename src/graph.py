@@ -0,0 +1,161 @@
+import heapq
+import math
+from collections import defaultdict
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+from .models import LiquidityPool
+
+
+class Edge:
+    """One trade direction through a pool, weighted by -log(rate) net of fees."""
+    __slots__ = ('pool', 'source', 'target', 'rate', 'weight')
+
+    def __init__(self, pool: LiquidityPool, source: int, target: int, rate: float) -> None:
+        self.pool = pool
+        self.source = source
+        self.target = target
+        self.rate = rate
+        self.weight = -math.log(rate) if rate > 0 else math.inf
+
+    def __repr__(self) -> str:
+        return f"Edge({self.source}->{self.target}, rate={self.rate})"
+
+
+class Cycle:
+    """A closed trade route that starts and ends on the same token."""
+    __slots__ = ('tokens', 'edges')
+
+    def __init__(self, tokens: Tuple[str, ...], edges: Tuple[Edge, ...]) -> None:
+        self.tokens = tokens
+        self.edges = edges
+
+    @property
+    def pools(self) -> List[LiquidityPool]:
+        return [edge.pool for edge in self.edges]
+
+    @property
+    def hops(self) -> int:
+        return len(self.edges)
+
+    @property
+    def weight(self) -> float:
+        return sum(edge.weight for edge in self.edges)
+
+    @property
+    def rate(self) -> float:
+        """Amount of the start token returned per unit traded around the cycle."""
+        weight = self.weight
+        return math.exp(-weight) if weight != math.inf else 0.0
+
+    @property
+    def is_profitable(self) -> bool:
+        return self.weight < 0
+
+    def __repr__(self) -> str:
+        return f"Cycle(tokens={' -> '.join(self.tokens)}, rate={self.rate})"
+
+
+class TokenGraph:
+    """
+    Directed multigraph of tokens, with two edges (one per trade direction)
+    for every pool. Parallel pools between the same tokens stay separate edges.
+    """
+
+    def __init__(self, pools: Iterable[LiquidityPool] = (), fee: float = 0.0) -> None:
+        self.fee = fee
+        self.tokens: List[str] = []
+        self.nodes: Dict[str, int] = {}
+        self.adjacency: List[List[Edge]] = []
+        self._between: Dict[Tuple[int, int], List[Edge]] = defaultdict(list)
+        for pool in pools:
+            self.add_pool(pool)
+
+    @classmethod
+    def from_token_pairs(cls, token_pairs: Iterable[LiquidityPool], fee: float = 0.0) -> "TokenGraph":
+        """Build a graph from `utils.main_utils.process_token_pairs` pools."""
+        return cls(token_pairs, fee)
+
+    def _node(self, token: str) -> int:
+        node = self.nodes.get(token)
+        if node is None:
+            node = self.nodes[token] = len(self.tokens)
+            self.tokens.append(token)
+            self.adjacency.append([])
+        return node
+
+    def add_pool(self, pool: LiquidityPool) -> None:
+        """Add both trade directions of a pool. Pools quoting a token against itself are ignored."""
+        if pool.base_token == pool.quote_token:
+            return
+        base = self._node(pool.base_token)
+        quote = self._node(pool.quote_token)
+        price = pool.price_native or 0.0
+        sell_base = Edge(pool, base, quote, price * (1 - self.fee))
+        buy_base = Edge(pool, quote, base, (1 / price) * (1 - self.fee) if price > 0 else 0.0)
+        for edge in (sell_base, buy_base):
+            self.adjacency[edge.source].append(edge)
+            self._between[(edge.source, edge.target)].append(edge)
+
+    def find_cycles(self, max_hops: int = 3, min_hops: int = 3, profitable_only: bool = False,
+                    max_edges: Optional[int] = None) -> Iterator[Cycle]:
+        """
+        Yield every directed cycle of min_hops..max_hops pools through distinct tokens.
+
+        Each cycle is reported once per direction, starting from its lowest
+        numbered token, so rotations of the same route are not repeated.
+
+        With profitable_only, a path is abandoned as soon as its -log weight
+        stops being negative. Every profitable cycle has a rotation whose
+        partial weights are all negative, so none are lost; each is reported
+        from the lowest numbered token such a rotation starts at. max_edges
+        keeps only the best-rated edges out of each token when extending paths,
+        bounding the search on graphs dominated by a few hub tokens.
+        """
+        adjacency = self.adjacency
+        if max_edges is not None:
+            adjacency = [heapq.nsmallest(max_edges, edges, key=lambda edge: edge.weight) for edges in adjacency]
+        for start in range(len(self.tokens)):
+            yield from self._extend(start, [start], [], 0.0, adjacency, min_hops, max_hops, profitable_only)
+
+    def _extend(self, start: int, path: List[int], edges: List[Edge], weight: float,
+                adjacency: List[List[Edge]], min_hops: int, max_hops: int,
+                profitable_only: bool) -> Iterator[Cycle]:
+        node = path[-1]
+        hops = len(edges) + 1
+        if min_hops <= hops <= max_hops and len(edges) > 0:
+            for edge in self._between.get((node, start), ()):
+                if any(edge.pool is used.pool for used in edges):
+                    continue
+                if profitable_only and not (weight + edge.weight < 0 and
+                                            self._first_negative_rotation(edges + [edge]) == start):
+                    continue
+                yield Cycle(tuple(self.tokens[n] for n in path) + (self.tokens[start],),
+                            tuple(edges) + (edge,))
+        if hops >= max_hops:
+            return
+        for edge in adjacency[node]:
+            target = edge.target
+            # Distinct tokens along the path already imply distinct pools
+            if target in path or (not profitable_only and target <= start):
+                continue
+            extended = weight + edge.weight
+            if profitable_only and extended >= 0:
+                continue
+            path.append(target)
+            edges.append(edge)
+            yield from self._extend(start, path, edges, extended, adjacency, min_hops, max_hops, profitable_only)
+            edges.pop()
+            path.pop()
+
+    @staticmethod
+    def _first_negative_rotation(edges: List[Edge]) -> int:
+        """Lowest numbered token starting a rotation of the cycle whose partial weights are all negative."""
+        starts = []
+        for offset in range(len(edges)):
+            weight = 0.0
+            for edge in edges[offset:] + edges[:offset]:
+                weight += edge.weight
+                if weight >= 0:
+                    break
+            else:
+                starts.append(edges[offset].source)
+        return min(starts)
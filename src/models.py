@@ -1,25 +1,227 @@
-from typing import List, Tuple
+import math
+from typing import Any, Dict, List, Optional, Tuple
+
+
+def _finite(value: Any) -> Any:
+    """None for NaN and infinite floats, which JSON has no literal for; anything else unchanged."""
+    if isinstance(value, float) and not math.isfinite(value):
+        return None
+    return value
+
+
+def _money(value: float) -> str:
+    return f"${value:,.2f}"
+
+
+def _amount(value: float) -> str:
+    return f"{value:,.2f}"
+
+
+def _percent(value: Optional[float]) -> str:
+    return 'N/A' if value is None else f"{value:.2f}%"
+
 
 class LiquidityPool:
-    """Represents a liquidity pool with base and quote token addresses."""
-    def __init__(self, base_token: str, quote_token: str) -> None:
+    """
+    A liquidity pool with base and quote token addresses and its native (quote per base) price,
+    plus the Dexscreener market data of the pool when it came from a search.
+    """
+    __slots__ = ('base_token', 'quote_token', 'price_native', 'pool_address', 'name', 'url', 'price_usd',
+                 'liquidity_usd', 'liquidity_base', 'liquidity_quote', 'chain_id', 'dex_id',
+                 'base_name', 'quote_name')
+
+    def __init__(self, base_token: str, quote_token: str, price_native: float = 0.0,
+                 pool_address: Optional[str] = None, name: Optional[str] = None, url: str = 'N/A',
+                 price_usd: float = 0.0, liquidity_usd: float = 0.0, liquidity_base: float = 0.0,
+                 liquidity_quote: float = 0.0, chain_id: str = 'N/A', dex_id: str = 'N/A',
+                 base_name: str = 'N/A', quote_name: str = 'N/A') -> None:
         self.base_token = base_token
         self.quote_token = quote_token
+        self.price_native = price_native
+        self.pool_address = pool_address
+        self.name = name if name is not None else f"{base_name}/{quote_name}"
+        self.url = url
+        self.price_usd = price_usd
+        self.liquidity_usd = liquidity_usd
+        self.liquidity_base = liquidity_base
+        self.liquidity_quote = liquidity_quote
+        self.chain_id = chain_id
+        self.dex_id = dex_id
+        self.base_name = base_name
+        self.quote_name = quote_name
+
+    def to_dict(self) -> Dict[str, Any]:
+        """The pair fields served to clients, as `process_token_pairs` used to return them."""
+        return {
+            'pair': self.name,
+            'pool_address': self.pool_address,
+            'pool_url': self.url,
+            'price_usd': self.price_usd,
+            'price_native': self.price_native,
+            'liquidity_usd': self.liquidity_usd,
+            'liquidity_base': self.liquidity_base,
+            'liquidity_quote': self.liquidity_quote,
+            'baseToken_address': self.base_token,
+            'quoteToken_address': self.quote_token,
+            'chain_id': self.chain_id,
+            'dex_id': self.dex_id,
+            'baseToken_name': self.base_name,
+            'quoteToken_name': self.quote_name,
+        }
 
     def __repr__(self) -> str:
         return f"LiquidityPool(base_token={self.base_token}, quote_token={self.quote_token})"
 
 
 class ArbitrageOpportunity:
-    """Represents a triangular arbitrage opportunity consisting of three liquidity pools."""
-    def __init__(self, pool_a: LiquidityPool, pool_b: LiquidityPool, pool_c: LiquidityPool) -> None:
+    """
+    A two-pool arbitrage opportunity, or a triangular one once `pool_c` closes the route.
+
+    `profit` is what the user's investment earns; `optimal_input` and `achievable_profit`
+    are the best-sized trade on the pools' x·y=k curves, when the route was sized. All
+    three are in USD, so two-pool and triangular routes rank on one scale.
+    Numbers are kept as numbers; `to_record` serves them as such, `to_dict` formats them.
+    """
+    __slots__ = ('pool_a', 'pool_b', 'pool_c', 'price_diff', 'liquidity_diff', 'profit', 'base_liquidity',
+                 'quote_prices_usd', 'discrepancies', 'optimal_input', 'achievable_profit')
+
+    def __init__(self, pool_a: LiquidityPool, pool_b: LiquidityPool, pool_c: Optional[LiquidityPool] = None,
+                 price_diff: float = 0.0, liquidity_diff: float = 0.0, profit: float = 0.0,
+                 base_liquidity: float = 0.0, quote_prices_usd: Optional[Tuple[float, ...]] = None,
+                 discrepancies: Optional[Dict[str, Optional[float]]] = None,
+                 optimal_input: Optional[float] = None, achievable_profit: Optional[float] = None) -> None:
         self.pool_a = pool_a
         self.pool_b = pool_b
         self.pool_c = pool_c
+        self.price_diff = price_diff
+        self.liquidity_diff = liquidity_diff
+        self.profit = profit
+        self.base_liquidity = base_liquidity
+        self.quote_prices_usd = quote_prices_usd
+        self.discrepancies = discrepancies
+        self.optimal_input = optimal_input
+        self.achievable_profit = achievable_profit
+
+    @property
+    def pools(self) -> List[LiquidityPool]:
+        return [pool for pool in (self.pool_a, self.pool_b, self.pool_c) if pool is not None]
+
+    @property
+    def int_profit(self) -> float:
+        """Profit truncated to 8 decimals."""
+        return int(self.profit * 10**8) / 10**8
+
+    @property
+    def rank_profit(self) -> float:
+        """Achievable USD profit truncated to 8 decimals, the ranking key; `int_profit`, also USD, for unsized routes."""
+        if self.achievable_profit is None:
+            return self.int_profit
+        return int(self.achievable_profit * 10**8) / 10**8
+
+    def with_third_pool(self, pool_c: LiquidityPool) -> "ArbitrageOpportunity":
+        """A copy of this opportunity closed by `pool_c`, left for the triangle to be sized."""
+        return ArbitrageOpportunity(self.pool_a, self.pool_b, pool_c, self.price_diff, self.liquidity_diff,
+                                    self.profit, self.base_liquidity)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """The flat, formatted form served to clients."""
+        data: Dict[str, Any] = {}
+        for number, pool in enumerate(self.pools, 1):
+            data.update({
+                f'pair{number}': pool.name,
+                f'pair{number}_price': pool.price_usd,
+                f'pair{number}_price_round': f"{round(pool.price_usd, 8)}",
+                f'pair{number}_liquidity': _money(pool.liquidity_usd),
+                f'pair{number}_liquidity_base': _amount(pool.liquidity_base),
+                f'pair{number}_liquidity_quote': _amount(pool.liquidity_quote),
+                f'pool_pair{number}_address': pool.pool_address,
+                f'pair{number}_baseToken_address': pool.base_token,
+                f'pair{number}_quoteToken_address': pool.quote_token,
+                f'pool_pair{number}_url': pool.url,
+                f'pair{number}_chain_id': pool.chain_id,
+                f'pair{number}_dex_id': pool.dex_id,
+                f'pair{number}_priceNative': pool.price_native,
+                f'pair{number}_priceNative_round': f"{round(pool.price_native, 8)}",
+            })
+        data.update({
+            'price_diff': _money(self.price_diff),
+            'liquidity_diff': _money(self.liquidity_diff),
+            'profit': _money(self.profit),
+            'int_profit': self.int_profit,
+            'rank_profit': self.rank_profit,
+            'potential_profit': _money(self.base_liquidity * self.price_diff),
+            'nativePrice_difference': self.price_diff,
+        })
+        if self.quote_prices_usd is not None:
+            for number, price in enumerate(self.quote_prices_usd, 1):
+                data[f'quote_price_usd_{number}'] = f"${price:.2f}"
+        if self.discrepancies is not None:
+            for key, value in self.discrepancies.items():
+                data[key] = _percent(value)
+        if self.achievable_profit is not None:
+            data['optimal_input'] = _money(self.optimal_input)
+            data['achievable_profit'] = _money(self.achievable_profit)
+        return data
+
+    def to_record(self) -> Dict[str, Any]:
+        """
+        The lean form served to clients: numbers left unformatted, and each token's
+        name listed once under `tokens` rather than per pool. The page formats it.
+        NaN and infinite numbers become None, as orjson would write them.
+        """
+        tokens: Dict[str, str] = {}
+        pools = []
+        for pool in self.pools:
+            tokens.setdefault(pool.base_token, pool.base_name)
+            tokens.setdefault(pool.quote_token, pool.quote_name)
+            pools.append({
+                'address': pool.pool_address,
+                'url': pool.url,
+                'chain_id': pool.chain_id,
+                'dex_id': pool.dex_id,
+                'base': pool.base_token,
+                'quote': pool.quote_token,
+                'price_usd': _finite(pool.price_usd),
+                'price_native': _finite(pool.price_native),
+                'liquidity_usd': _finite(pool.liquidity_usd),
+                'liquidity_base': _finite(pool.liquidity_base),
+                'liquidity_quote': _finite(pool.liquidity_quote),
+            })
+        return {
+            'pools': pools,
+            'tokens': tokens,
+            'quote_prices_usd': ([_finite(price) for price in self.quote_prices_usd]
+                                 if self.quote_prices_usd is not None else None),
+            'price_diff': _finite(self.price_diff),
+            'liquidity_diff': _finite(self.liquidity_diff),
+            'profit': _finite(self.profit),
+            'potential_profit': _finite(self.base_liquidity * self.price_diff),
+            'optimal_input': _finite(self.optimal_input),
+            'achievable_profit': _finite(self.achievable_profit),
+            'rank_profit': _finite(self.rank_profit),
+            'discrepancies': ({key: _finite(value) for key, value in self.discrepancies.items()}
+                              if self.discrepancies is not None else None),
+        }
+
+    def __eq__(self, other: object) -> bool:
+        if not isinstance(other, ArbitrageOpportunity):
+            return NotImplemented
+        return all(getattr(self, name) == getattr(other, name) for name in self.__slots__)
+
+    __hash__ = None
 
     def __repr__(self) -> str:
         return (f"ArbitrageOpportunity(\n"
                 f"  pool_a={self.pool_a},\n"
                 f"  pool_b={self.pool_b},\n"
                 f"  pool_c={self.pool_c}\n"
-                f")") 
\ No newline at end of file
+                f")")
+
+
+def to_serializable(value: Any) -> Any:
+    """`json.dumps` default hook for the record types: opportunities in their lean form, non-finite numbers as None."""
+    if isinstance(value, ArbitrageOpportunity):
+        return value.to_record()
+    if isinstance(value, LiquidityPool):
+        return {key: _finite(item) for key, item in value.to_dict().items()}
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
@@ -0,0 +1,88 @@
+import random
+
+import numpy as np
+
+import utils.main_utils as main_utils
+from src.models import ArbitrageOpportunity, LiquidityPool
+from utils.amm import best_cycle_trade, optimal_trade, route_coefficients, route_output, swap_output
+from utils.arbitrage import evaluate_candidate
+
+
+def pool(address: str, base: str, quote: str, price: float, depth: float = 1e6) -> LiquidityPool:
+    """A pool holding `depth` base tokens and the quote tokens matching its price, A worth $1."""
+    return LiquidityPool(base, quote, price_native=price, pool_address=address,
+                         price_usd=1.0 if base == 'A' else 0.5, liquidity_usd=2 * depth, liquidity_base=depth, liquidity_quote=depth * price)
+
+
+def test_route_coefficients_compose_swaps() -> None:
+    """The folded route returns what swapping hop by hop returns."""
+    hops = [(1e5, 2e5), (3e5, 1.4e5), (7e4, 5.2e4)]
+    for amount in (1.0, 1e3, 5e4):
+        swapped = amount
+        for reserve_in, reserve_out in hops:
+            swapped = swap_output(swapped, reserve_in, reserve_out, 0.003, 0.999)
+        assert abs(route_output(amount, route_coefficients(hops, 0.003, 0.999)) - swapped) < 1e-9 * swapped
+
+
+def test_optimal_trade_beats_every_other_size() -> None:
+    """The closed-form size earns at least as much as any size on a fine grid; losing routes trade nothing."""
+    rng = random.Random(5)
+    for _ in range(50):
+        hops = [(rng.uniform(1e4, 1e6), rng.uniform(1e4, 1e6)) for _ in range(rng.choice([2, 3]))]
+        coefficients = route_coefficients(hops, 0.003)
+        amount_in, profit = optimal_trade(hops, 0.003)
+        grid = np.linspace(0, max(2 * amount_in, 1e3), 2001)
+        assert profit >= (route_output(grid, coefficients) - grid).max() - 1e-6
+        if coefficients[0] <= coefficients[1]:
+            assert amount_in == 0 and profit == 0
+
+
+def test_optimal_trade_is_vectorized() -> None:
+    """Columns of reserves size every route in one call, as sizing them one by one does."""
+    rng = np.random.default_rng(3)
+    reserves = rng.uniform(1e4, 1e6, size=(4, 500))
+    amounts, profits = optimal_trade([(reserves[0], reserves[1]), (reserves[2], reserves[3])], 0.003, 0.9995)
+    for n in range(0, 500, 37):
+        amount, profit = optimal_trade([(reserves[0, n], reserves[1, n]), (reserves[2, n], reserves[3, n])],
+                                       0.003, 0.9995)
+        assert amounts[n] == amount and profits[n] == profit
+
+
+def test_triangle_is_sized_in_its_profitable_direction() -> None:
+    """A mispriced triangle is sized and ranked by achievable profit; its investment is checked on depth."""
+    pools = [pool('AB', 'A', 'B', 2.0), pool('AC', 'A', 'C', 4.2), pool('BC', 'B', 'C', 2.0)]
+    trade = best_cycle_trade(pools, 0.003)
+    # A buys 4.2 C, which buy 2.1 B, which buy 1.05 A: the same cycle entered from B on the first pool
+    assert trade.start_token == 'B' and [p.pool_address for p in trade.pools] == ['AB', 'AC', 'BC']
+    assert trade.profit_usd > 0 and trade.amount_in_usd > 0
+
+    opportunity = main_utils.combine_opportunity_data(ArbitrageOpportunity(pools[0], pools[1]), pools[2])
+    main_utils.size_triangle(opportunity, 0.0, 0.003)
+    assert opportunity.achievable_profit == trade.profit_usd
+    assert opportunity.to_dict()['rank_profit'] == opportunity.rank_profit
+    assert main_utils.check_price_compatibility(opportunity, 1000, 0.0, 0.003)
+    # Far past the optimum the price impact eats the spread
+    assert not main_utils.check_price_compatibility(opportunity, 100 * trade.amount_in_usd, 0.0, 0.003)
+
+    balanced = [pool('AB', 'A', 'B', 2.0), pool('AC', 'A', 'C', 4.0), pool('BC', 'B', 'C', 2.0)]
+    assert best_cycle_trade(balanced, 0.003).profit_usd == 0
+    assert best_cycle_trade([pool('AB', 'A', 'B', 2.0), pool('CD', 'C', 'D', 1.0)]) is None
+
+
+def test_two_pool_trade_is_sized_on_real_reserves_in_usd() -> None:
+    """A two-pool trade swaps against each pool's own reserves and reports its size and profit in USD."""
+    cheap = pool('AB-1', 'A', 'B', 2.0)
+    dear = pool('AB-2', 'A', 'B', 2.2, depth=5e5)
+    _, profit, _, optimal_input, achievable_profit = evaluate_candidate(cheap, dear, 0.0, 0.003, 1000)
+
+    # B, worth $0.5, buys A on AB-1, which is sold for B on AB-2
+    hops = [(cheap.liquidity_quote, cheap.liquidity_base), (dear.liquidity_base, dear.liquidity_quote)]
+    expected = swap_output(swap_output(1000 / 0.5, *hops[0], 0.003), *hops[1], 0.003) * 0.5 - 1000
+    amount, best = optimal_trade(hops, 0.003)
+    assert profit > 0 and abs(profit - expected) < 1e-6
+    assert abs(optimal_input - amount * 0.5) < 1e-6 * optimal_input
+    assert abs(achievable_profit - best * 0.5) < 1e-6 * achievable_profit
+
+    # Reserves that do not back the quoted price are what the trade meets
+    dear.liquidity_quote = 4e5
+    assert evaluate_candidate(cheap, dear, 0.0, 0.003, 1000) is None
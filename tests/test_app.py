@@ -0,0 +1,62 @@
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+PROBE = """
+import json, sys
+import app
+loaded = lambda: [name for name in ('utils.main_utils', 'numpy', 'pandas', 'matplotlib', 'flask_sqlalchemy')
+                  if name in sys.modules]
+before = loaded()
+app.warm_up(app.app)
+status = app.app.test_client().get('/health').status_code
+print(json.dumps({'before': before, 'after': loaded(), 'status': status}))
+"""
+
+
+def test_app_import_defers_the_pipeline_until_warm_up() -> None:
+    """Importing the app builds it without the pipeline; warm_up loads it, never pandas or matplotlib."""
+    env = dict(os.environ, LOG_LEVEL='ERROR', POLLER_ENABLED='false')
+    output = subprocess.run([sys.executable, '-c', PROBE], cwd=ROOT, env=env, capture_output=True,
+                            text=True, check=True).stdout
+    result = json.loads(output.strip().splitlines()[-1])
+    assert result == {'before': [], 'after': ['utils.main_utils', 'numpy'], 'status': 200}
+
+
+def test_result_limit_is_opt_in() -> None:
+    """Responses are only cut to the best `limit` opportunities when the request asks for it."""
+    from app import result_limit
+    from utils.main_utils import RESULT_LIMIT
+
+    assert RESULT_LIMIT is None or 'RESULT_LIMIT' in os.environ
+    assert result_limit({}) is None and result_limit({'limit': ''}) is None and result_limit({'limit': '0'}) is None
+    assert result_limit({'limit': '25'}) == 25
+    for invalid in ('-1', 'ten'):
+        with pytest.raises(ValueError):
+            result_limit({'limit': invalid})
+
+
+def test_cycles_endpoint_sizes_profitable_routes() -> None:
+    """Cycles close through the pools of the searched token's counterparties and come back sized in USD."""
+    from app import app, result_cache
+    from tests.test_replay import market
+    from utils.replay import ReplayFetcher, SimulatedClock, replay_environment
+
+    fetcher = ReplayFetcher()
+    fetcher.update(market(2.6))
+    result_cache.clear()
+    with replay_environment(fetcher, SimulatedClock()):
+        response = app.test_client().post('/landing_page_cycles', data={'search': 'A', 'max_hops': '3'})
+        invalid = app.test_client().post('/landing_page_cycles', data={'search': 'A', 'max_hops': '2'})
+    result_cache.clear()
+    cycles = response.get_json()
+    assert response.status_code == 200 and invalid.status_code == 400
+    assert cycles and all(cycle['hops'] == 3 and cycle['rate'] > 1 for cycle in cycles)
+    assert any('BC-1' in cycle['pool_addresses'] for cycle in cycles)
+    profits = [cycle['achievable_profit'] for cycle in cycles]
+    assert all(profit > 0 for profit in profits) and profits == sorted(profits, reverse=True)
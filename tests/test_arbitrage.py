@@ -1,6 +1,8 @@
+import random
 import pytest
 from src.models import LiquidityPool, ArbitrageOpportunity
 from src.controllers import ArbitrageController
+from src.graph import TokenGraph
 
 
 def test_find_arbitrage_opportunities() -> None:
@@ -16,4 +18,70 @@ def test_find_arbitrage_opportunities() -> None:
     assert isinstance(opportunities[0], ArbitrageOpportunity)
     assert opportunities[0].pool_a.base_token == 'A123'
     assert opportunities[0].pool_b.base_token == 'C123'
-    assert opportunities[0].pool_c.base_token == 'A123' 
\ No newline at end of file
+    assert opportunities[0].pool_c.base_token == 'A123' 
+
+def test_find_arbitrage_opportunities_matches_nested_scan() -> None:
+    """The graph search returns the same triangles, in the same order, as the nested loops."""
+    rng = random.Random(3)
+    tokens = [f'T{n}' for n in range(8)]
+    pools = [LiquidityPool(*rng.sample(tokens, 2)) for _ in range(60)]
+    expected = []
+    for pool_a in pools:
+        for pool_b in pools:
+            if pool_a.quote_token == pool_b.quote_token and pool_a.base_token != pool_b.base_token:
+                for pool_c in pools:
+                    if pool_c.base_token == pool_a.base_token and pool_c.quote_token == pool_b.base_token:
+                        expected.append((pool_a, pool_b, pool_c))
+    found = ArbitrageController().find_arbitrage_opportunities(pools)
+    assert expected
+    assert [(o.pool_a, o.pool_b, o.pool_c) for o in found] == expected
+
+
+def test_find_cycles_prices_routes_net_of_fees() -> None:
+    """A mispriced triangle is profitable before fees and not after a large fee."""
+    pools = [
+        LiquidityPool('A', 'B', price_native=2.0),
+        LiquidityPool('B', 'C', price_native=3.0),
+        LiquidityPool('C', 'A', price_native=0.2),
+    ]
+    cycles = ArbitrageController().find_cycles(pools)
+    assert len(cycles) == 1
+    assert cycles[0].tokens == ('A', 'B', 'C', 'A')
+    assert abs(cycles[0].rate - 1.2) < 1e-9
+    assert ArbitrageController(fee=0.1).find_cycles(pools) == []
+
+
+def test_find_cycles_respects_max_hops() -> None:
+    """A four-pool loop is only reported once the hop limit allows it."""
+    pools = [
+        LiquidityPool('A', 'B', price_native=1.1),
+        LiquidityPool('B', 'C', price_native=1.0),
+        LiquidityPool('C', 'D', price_native=1.0),
+        LiquidityPool('D', 'A', price_native=1.0),
+    ]
+    assert ArbitrageController(max_hops=3).find_cycles(pools) == []
+    cycles = ArbitrageController(max_hops=4).find_cycles(pools)
+    assert [cycle.hops for cycle in cycles] == [4]
+
+
+def test_profitable_cycles_pruned_search_matches_full_enumeration() -> None:
+    """Pruning on partial weights finds exactly the profitable cycles a full enumeration filters down to."""
+    rng = random.Random(5)
+    tokens = [f'T{n}' for n in range(7)]
+    prices = {token: rng.uniform(0.5, 2.0) for token in tokens}
+    pools = []
+    for _ in range(40):
+        base, quote = rng.sample(tokens, 2)
+        pools.append(LiquidityPool(base, quote, price_native=prices[base] / prices[quote] * rng.uniform(0.9, 1.1)))
+    graph = TokenGraph(pools, fee=0.003)
+
+    def key(cycle):
+        return frozenset((id(edge.pool), edge.source) for edge in cycle.edges)
+
+    expected = {key(cycle) for cycle in graph.find_cycles(max_hops=4) if cycle.is_profitable}
+    pruned = [key(cycle) for cycle in graph.find_cycles(max_hops=4, profitable_only=True)]
+    assert expected
+    assert len(pruned) == len(set(pruned))
+    assert set(pruned) == expected
+    capped = {key(cycle) for cycle in graph.find_cycles(max_hops=4, profitable_only=True, max_edges=3)}
+    assert capped and capped <= expected
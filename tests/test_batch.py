@@ -0,0 +1,68 @@
+import os
+
+import utils.batch as batch_module
+import utils.main_utils as main_utils
+from benchmarks.synthetic import synthetic_market
+from utils.batch import InlineExecutor, batch_executor, process_arbitrage_batch, process_pool, shutdown_pools
+from utils.replay import ReplayFetcher, SimulatedClock, replay_environment
+
+ADDRESSES = ['TOKEN000001', 'TOKEN000002', 'TOKEN000003', 'TOKEN000001', 'TOKEN000004']
+
+
+def market_fetcher() -> ReplayFetcher:
+    fetcher = ReplayFetcher()
+    fetcher.update(synthetic_market(400, token_count=25, liquidity='uniform', spread=0.1, seed=11))
+    return fetcher
+
+
+def test_batch_matches_single_searches_with_fewer_lookups() -> None:
+    """Each address gets what its own search returns, in one pass that fetches shared lookups once."""
+    expected, single_requests = {}, 0
+    for address in dict.fromkeys(ADDRESSES):
+        fetcher = market_fetcher()
+        with replay_environment(fetcher, SimulatedClock()):
+            expected[address] = [o.to_dict() for o in main_utils.process_arbitrage_data(
+                None, 10000, 0.0005, 0.0003, search_address=address, limit=0)]
+        single_requests += fetcher.requests
+
+    for max_workers in (1, 2):
+        fetcher = market_fetcher()
+        with replay_environment(fetcher, SimulatedClock()):
+            results = process_arbitrage_batch(ADDRESSES, 10000, 0.0005, 0.0003, limit=0, max_workers=max_workers)
+        assert list(results) == list(expected)
+        assert {address: [o.to_dict() for o in found] for address, found in results.items()} == expected
+        assert fetcher.requests < single_requests
+    assert any(expected.values())
+
+
+def test_batch_pool_outlives_requests() -> None:
+    """Batches reuse one pool of each size rather than starting processes per request."""
+    try:
+        with batch_executor(2, 5) as first, batch_executor(2, 3) as second:
+            assert first is second is process_pool(2)
+            assert list(first.map(abs, [-1, -2])) == [1, 2]
+        with batch_executor(2, 1) as single:
+            assert isinstance(single, InlineExecutor)
+    finally:
+        shutdown_pools()
+
+
+def test_batch_uses_the_process_pool_by_default(monkeypatch) -> None:
+    """Without max_workers a batch runs on the pool of BATCH_MAX_WORKERS, one worker per core unless overridden."""
+    if 'BATCH_MAX_WORKERS' not in os.environ:
+        assert batch_module.BATCH_MAX_WORKERS == (os.cpu_count() or 1)
+    monkeypatch.setattr(batch_module, 'BATCH_MAX_WORKERS', 2)
+    pools = []
+
+    def recording_pool(max_workers):
+        pools.append(max_workers)
+        return process_pool(max_workers)
+
+    monkeypatch.setattr(batch_module, 'process_pool', recording_pool)
+    try:
+        with replay_environment(market_fetcher(), SimulatedClock()):
+            results = process_arbitrage_batch(ADDRESSES[:2], 10000, 0.0005, 0.0003, limit=0)
+    finally:
+        shutdown_pools()
+    assert pools == [2]
+    assert list(results) == ADDRESSES[:2]
@@ -0,0 +1,32 @@
+from benchmarks.run import benchmark_size, compare_results
+from benchmarks.synthetic import synthetic_market
+
+
+def test_synthetic_market_is_reproducible() -> None:
+    """The same arguments build the same market, spread over the requested chains."""
+    first = synthetic_market(200, token_count=20, chain_count=3, liquidity='pareto', seed=5)
+    second = synthetic_market(200, token_count=20, chain_count=3, liquidity='pareto', seed=5)
+    assert [(p.pair_address, p.price_native, p.liquidity.usd) for p in first] == \
+           [(p.pair_address, p.price_native, p.liquidity.usd) for p in second]
+    assert {pair.chain_id for pair in first} == {'solana', 'ethereum', 'bsc'}
+    assert len({pair.base_token.address for pair in first} | {pair.quote_token.address for pair in first}) <= 20
+
+
+def test_benchmark_times_every_stage_and_flags_regressions() -> None:
+    """Each stage gets a timing per size, and slower medians beyond the tolerance are regressions."""
+    results = benchmark_size(100, repeat=1)
+    assert [result['stage'] for result in results] == [
+        'process_token_pairs',
+        'find_arbitrage_opportunities',
+        'find_third_contract_data',
+        'calculate_price_discrepancies',
+        'ArbitrageController.find_arbitrage_opportunities',
+        'ArbitrageController.find_cycles',
+    ]
+    assert all(result['pools'] == 100 and result['min'] >= 0 for result in results)
+
+    baseline = {'results': [{'stage': 'find_third_contract_data', 'pools': 100, 'median': 1.0}]}
+    current = {'results': [{'stage': 'find_third_contract_data', 'pools': 100, 'median': 1.5},
+                           {'stage': 'process_token_pairs', 'pools': 100, 'median': 0.1}]}
+    assert compare_results(baseline, current, tolerance=0.2) == [('find_third_contract_data', 100, 1.0, 1.5, 1.5, True)]
+    assert compare_results(baseline, current, tolerance=0.6)[0][-1] is False
@@ -0,0 +1,160 @@
+import os
+import subprocess
+import sys
+from utils.cache import RedisCache, SQLiteCache, TTLCache, cached, make_cache
+
+
+class FakeClock:
+    """Manually advanced monotonic clock."""
+    def __init__(self) -> None:
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def test_ttl_cache_expires_entries() -> None:
+    """Entries are served until their TTL passes, then count as misses."""
+    clock = FakeClock()
+    cache = TTLCache(maxsize=10, ttl=5, clock=clock)
+    cache.set('a', 1)
+    assert cache.get('a') == 1
+    clock.now = 5
+    assert cache.get('a') is None
+    stats = cache.stats()
+    assert (stats['hits'], stats['misses'], stats['expirations']) == (1, 1, 1)
+
+
+def test_ttl_cache_evicts_least_recently_used() -> None:
+    """Once full, the entry read least recently is dropped first."""
+    cache = TTLCache(maxsize=2, ttl=60)
+    cache.set('a', 1)
+    cache.set('b', 2)
+    cache.get('a')
+    cache.set('c', 3)
+    assert cache.get('b') is None
+    assert cache.get('a') == 1 and cache.get('c') == 3
+    assert cache.stats()['evictions'] == 1
+
+
+def test_cached_skips_failed_lookups() -> None:
+    """Repeated lookups hit the cache, but None results are retried upstream."""
+    calls = []
+
+    @cached(TTLCache(ttl=60), lambda query: ('search', query))
+    def lookup(query):
+        calls.append(query)
+        return None if query == 'missing' else [query]
+
+    assert lookup('SOL') == ['SOL'] and lookup('SOL') == ['SOL']
+    lookup('missing')
+    lookup('missing')
+    assert calls == ['SOL', 'missing', 'missing']
+
+
+def test_sqlite_cache_is_shared_across_processes(tmp_path) -> None:
+    """A value stored by one process is a hit for another process using the same file."""
+    path = str(tmp_path / 'cache.sqlite3')
+    writer = SQLiteCache(path=path, namespace='pairs', ttl=60)
+    writer.set(('search', 'SOL'), [{'pool': 'P1', 'price_native': 1.5}])
+    script = (
+        'from utils.cache import SQLiteCache;'
+        f'cache = SQLiteCache(path={path!r}, namespace="pairs");'
+        'print(cache.get(("search", "SOL"))[0]["price_native"], cache.get(("search", "ETH")))'
+    )
+    output = subprocess.run([sys.executable, '-c', script], capture_output=True, text=True, check=True,
+                            cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    assert output.stdout.split() == ['1.5', 'None']
+
+
+def test_sqlite_cache_expires_and_trims(tmp_path) -> None:
+    """Expired rows miss, and the table is trimmed back to maxsize."""
+    cache = SQLiteCache(path=str(tmp_path / 'cache.sqlite3'), namespace='results', maxsize=10, ttl=60)
+    cache.set('stale', 1, ttl=-1)
+    assert cache.get('stale') is None
+    for n in range(63):
+        cache.set(n, n)
+    assert len(cache) == 10
+    assert cache.get(62) == 62
+    assert make_cache('results', backend='memory').stats()['backend'] == 'memory'
+
+
+class FakeRedis:
+    """The few Redis commands RedisCache sends, with key expiry on a manual clock."""
+    def __init__(self, clock: FakeClock) -> None:
+        self.clock = clock
+        self.values = {}
+        self.sorted_sets = {}
+
+    @staticmethod
+    def _name(key) -> str:
+        return key.decode() if isinstance(key, bytes) else key
+
+    def pipeline(self, transaction=True) -> 'FakePipeline':
+        return FakePipeline(self)
+
+    def get(self, key):
+        value, expires_at = self.values.get(self._name(key), (None, None))
+        if expires_at is not None and expires_at <= self.clock():
+            del self.values[self._name(key)]
+            return None
+        return value
+
+    def set(self, key, value, px=None):
+        self.values[self._name(key)] = (value, self.clock() + px / 1000 if px else None)
+
+    def delete(self, *keys) -> int:
+        return sum(self.values.pop(self._name(key), None) is not None or
+                   self.sorted_sets.pop(self._name(key), None) is not None for key in keys)
+
+    def scan_iter(self, match):
+        return [key.encode() for key in list(self.values) if key.startswith(match.rstrip('*'))]
+
+    def zadd(self, name, mapping, xx=False) -> None:
+        members = self.sorted_sets.setdefault(name, {})
+        for member, score in mapping.items():
+            if not xx or member in members:
+                members[member] = score
+
+    def zcard(self, name) -> int:
+        return len(self.sorted_sets.get(name, {}))
+
+    def zrange(self, name, start, end) -> list:
+        members = sorted(self.sorted_sets.get(name, {}).items(), key=lambda item: item[1])
+        return [member.encode() for member, _ in members[start:end + 1]]
+
+    def zrem(self, name, *members) -> None:
+        for member in members:
+            self.sorted_sets.get(name, {}).pop(self._name(member), None)
+
+
+class FakePipeline:
+    def __init__(self, client: FakeRedis) -> None:
+        self.client = client
+        self.calls = []
+
+    def __getattr__(self, command):
+        return lambda *args, **kwargs: self.calls.append((command, args, kwargs))
+
+    def execute(self) -> list:
+        return [getattr(self.client, command)(*args, **kwargs) for command, args, kwargs in self.calls]
+
+
+def test_redis_cache_expires_and_trims() -> None:
+    """Hits, misses and server-side expiry as the other backends; the namespace is trimmed back to maxsize."""
+    clock = FakeClock()
+    cache = RedisCache(namespace='results', maxsize=10, ttl=60, client=FakeRedis(clock))
+    cache.set(('search', 'SOL'), [{'pool': 'P1', 'price_native': 1.5}])
+    assert cache.get(('search', 'SOL')) == [{'pool': 'P1', 'price_native': 1.5}]
+    assert cache.get(('search', 'ETH')) is None
+    cache.set('stale', 1, ttl=5)
+    clock.now = 5
+    assert cache.get('stale') is None
+    for n in range(62):
+        cache.set(n, n)
+    assert len(cache) == 10
+    assert cache.get(61) == 61 and cache.get(0) is None
+    stats = cache.stats()
+    assert (stats['hits'], stats['misses'], stats['evictions']) == (2, 3, 54)
+    cache.clear()
+    assert len(cache) == 0 and cache.get(61) is None
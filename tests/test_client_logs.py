@@ -0,0 +1,82 @@
+import logging
+
+from utils.client_logs import SHARED_CHANNEL, ClientLogChannels, LogChannel, valid_channel_name
+
+
+class Clock:
+    def __init__(self) -> None:
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+class CountedStr:
+    """Log argument counting how often it is formatted."""
+    formatted = 0
+
+    def __str__(self) -> str:
+        CountedStr.formatted += 1
+        return 'counted'
+
+
+def make_logger(handler: logging.Handler) -> logging.Logger:
+    logger = logging.getLogger(f'test_client_logs.{id(handler)}')
+    logger.propagate = False
+    logger.setLevel(logging.DEBUG)
+    logger.addHandler(handler)
+    return logger
+
+
+def test_channel_is_a_ring_buffer_read_by_cursor() -> None:
+    """Reads leave messages for other readers; overwritten ones are reported as missed."""
+    channel = LogChannel(maxlen=3)
+    for n in range(5):
+        channel.append(f'message {n}')
+    assert channel.read() == {'logs': ['message 2', 'message 3', 'message 4'], 'cursor': 4, 'missed': 2}
+    assert channel.read(after=2) == {'logs': ['message 3', 'message 4'], 'cursor': 4, 'missed': 0}
+    channel.append('message 5')
+    assert channel.read(after=4) == {'logs': ['message 5'], 'cursor': 5, 'missed': 0}
+    assert channel.read(after=5)['logs'] == []
+
+
+def test_records_go_to_the_run_channel_and_are_gated() -> None:
+    """Runs log to their own channel, below-level and unread records are never formatted."""
+    clock = Clock()
+    handler = ClientLogChannels(level='INFO', idle=60, clock=clock)
+    logger = make_logger(handler)
+
+    CountedStr.formatted = 0
+    logger.info('nobody reads the shared channel yet: %s', CountedStr())
+    with handler.scope('client-1'):
+        logger.debug('below the client level: %s', CountedStr())
+        logger.info('for client 1')
+    assert CountedStr.formatted == 0
+
+    assert handler.read('client-1')['logs'] == ['for client 1']
+    assert handler.read(SHARED_CHANNEL)['logs'] == []
+    logger.info('shared now that it is read')
+    assert handler.read(SHARED_CHANNEL, after=-1)['logs'] == ['shared now that it is read']
+
+    clock.now = 61
+    logger.info('the reader went away: %s', CountedStr())
+    assert CountedStr.formatted == 0
+    assert handler.read(SHARED_CHANNEL)['logs'] == ['shared now that it is read']
+
+
+def test_channel_count_is_bounded() -> None:
+    """The least recently used channel is dropped past max_channels; names are checked."""
+    handler = ClientLogChannels(max_channels=2)
+    logger = make_logger(handler)
+    for name in ('a', 'b'):
+        handler.read(name)
+        with handler.scope(name):
+            logger.info(f'for {name}')
+    assert handler.read('a')['logs'] == ['for a']
+
+    # 'b' is now the least recently used channel, dropped when 'c' is opened
+    handler.read('c')
+    assert handler.read('a') == {'logs': ['for a'], 'cursor': 0, 'missed': 0}
+    assert handler.read('b') == {'logs': [], 'cursor': -1, 'missed': 0}
+    assert valid_channel_name('page-abc_1')
+    assert not valid_channel_name('../etc') and not valid_channel_name('x' * 65) and not valid_channel_name('')
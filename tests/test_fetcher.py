@@ -0,0 +1,86 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import pytest
+from utils.fetcher import DexscreenerFetcher
+
+
+def pair_payload(pair_address: str, base: str, quote: str, price_native: float = 1.0) -> dict:
+    """Minimal Dexscreener pair JSON accepted by `TokenPair`."""
+    counts = {'buys': 1, 'sells': 1}
+    periods = {'m5': 0.0, 'h1': 0.0, 'h6': 0.0, 'h24': 0.0}
+    return {
+        'chainId': 'solana',
+        'dexId': 'raydium',
+        'url': f'https://dexscreener.com/solana/{pair_address}',
+        'pairAddress': pair_address,
+        'baseToken': {'address': base, 'name': base, 'symbol': base},
+        'quoteToken': {'address': quote, 'name': quote, 'symbol': quote},
+        'priceNative': str(price_native),
+        'priceUsd': str(price_native),
+        'txns': {'m5': counts, 'h1': counts, 'h6': counts, 'h24': counts},
+        'volume': periods,
+        'priceChange': periods,
+        'liquidity': {'usd': 50000.0, 'base': 1000.0, 'quote': 1000.0},
+    }
+
+
+class StubDexscreener(BaseHTTPRequestHandler):
+    """Answers search and token lookups after a fixed delay."""
+    delay = 0.2
+
+    def do_GET(self) -> None:
+        time.sleep(self.delay)
+        url = urlparse(self.path)
+        if url.path.endswith('/dex/search'):
+            query = parse_qs(url.query)['q'][0]
+            pairs = [pair_payload(f'{query}-pool', query, 'USDC')]
+        else:
+            token = url.path.rsplit('/', 1)[-1]
+            pairs = [pair_payload(f'{token}-pool', token, 'SOL')]
+        body = json.dumps({'pairs': pairs}).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args) -> None:
+        pass
+
+
+@pytest.fixture
+def stub_url():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), StubDexscreener)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f'http://127.0.0.1:{server.server_port}/latest'
+    server.shutdown()
+    server.server_close()
+
+
+def test_fetcher_issues_lookups_concurrently(stub_url: str) -> None:
+    """Eight delayed lookups on eight workers take about one delay, in input order."""
+    spent = []
+    fetcher = DexscreenerFetcher(base_url=stub_url, max_workers=8, before_request=lambda: spent.append(1))
+    queries = [f'TOKEN{n}' for n in range(8)]
+    started = time.perf_counter()
+    results = fetcher.map(fetcher.search_pairs, queries)
+    elapsed = time.perf_counter() - started
+    fetcher.close()
+    assert [result[0].base_token.address for result in results] == queries
+    assert len(spent) == 8
+    assert elapsed < 8 * StubDexscreener.delay / 2
+
+
+def test_fetcher_token_pairs(stub_url: str) -> None:
+    """Token lookups are parsed into `TokenPair` models."""
+    fetcher = DexscreenerFetcher(base_url=stub_url)
+    pairs = fetcher.get_token_pairs('ABC')
+    fetcher.close()
+    assert pairs[0].pair_address == 'ABC-pool'
+    assert pairs[0].quote_token.address == 'SOL'
+    assert pairs[0].liquidity.usd == 50000.0
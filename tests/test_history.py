@@ -0,0 +1,49 @@
+import os
+
+import pytest
+
+from src.models import LiquidityPool
+from utils.history import PoolHistoryStore, make_history_store
+
+pytest.importorskip('pyarrow')
+
+DAY = 86400.0
+START = 1735689600.0  # 2025-01-01T00:00:00Z
+
+
+def make_pool(address: str, chain_id: str, price_native: float) -> LiquidityPool:
+    return LiquidityPool('BASE', 'QUOTE', price_native=price_native, pool_address=address, price_usd=price_native * 2,
+                         liquidity_usd=50000.0, liquidity_base=100.0, liquidity_quote=200.0,
+                         chain_id=chain_id, dex_id='raydium')
+
+
+def test_history_partitions_by_chain_and_date(tmp_path) -> None:
+    """Fetches land in chain/date partitions and are read back in fetch order."""
+    store = PoolHistoryStore(str(tmp_path), flush_rows=1000, flush_interval=3600)
+    store.append([make_pool('P1', 'solana', 1.0), make_pool('E1', 'ethereum', 5.0)], fetched_at=START + DAY + 10)
+    store.append([make_pool('P1', 'solana', 1.1)], fetched_at=START + 10)
+    assert store.stats()['pending_rows'] == 3
+    store.flush()
+
+    assert sorted(os.listdir(tmp_path)) == ['chain_id=ethereum', 'chain_id=solana']
+    assert sorted(os.listdir(tmp_path / 'chain_id=solana')) == ['date=2025-01-01', 'date=2025-01-02']
+
+    table = store.scan(chain_id='solana')
+    assert table.column('price_native').to_pylist() == [1.1, 1.0]
+    assert set(table.column('chain_id').to_pylist()) == {'solana'}
+
+    first_day = store.scan(end=START + DAY - 1, columns=['pool_address', 'price_usd'])
+    assert first_day.to_pydict() == {'pool_address': ['P1'], 'price_usd': [2.2]}
+    assert store.scan(start=START + DAY).num_rows == 2
+
+
+def test_history_flushes_when_buffer_fills(tmp_path) -> None:
+    """Appends write a file once flush_rows are pending; disabled without a path."""
+    store = PoolHistoryStore(str(tmp_path), flush_rows=2, flush_interval=3600)
+    store.append([make_pool('P1', 'solana', 1.0)], fetched_at=START)
+    assert store.files_written == 0
+    store.append([make_pool('P2', 'solana', 1.0)], fetched_at=START)
+    assert store.files_written == 1
+    assert store.scan().num_rows == 2
+    assert PoolHistoryStore(str(tmp_path / 'missing')).scan().num_rows == 0
+    assert make_history_store(None) is None
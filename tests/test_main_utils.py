@@ -0,0 +1,89 @@
+from collections import defaultdict
+from types import SimpleNamespace
+import random
+
+import utils.main_utils as main_utils
+from src.models import ArbitrageOpportunity, LiquidityPool
+from utils.main_utils import find_matching_third_pair, find_matching_third_pairs, token_pair_key, top_opportunities
+
+
+def make_pair_details(address: str, base: str, quote: str, liquidity_usd: float, chain_id: str = 'solana') -> LiquidityPool:
+    """Build a `create_pair_details` pool."""
+    return LiquidityPool(base, quote, price_native=1.0, pool_address=address, url=f'https://example.test/{address}',
+                         price_usd=1.0, liquidity_usd=liquidity_usd, liquidity_base=1.0, liquidity_quote=1.0,
+                         chain_id=chain_id, dex_id='raydium', base_name=base, quote_name=quote)
+
+
+def test_find_matching_third_pairs_uses_token_pair_index() -> None:
+    """Third pools are found by unordered token pair on the opportunity's chain, deepest first."""
+    token_pair_index = defaultdict(list)
+    for details in [
+        make_pair_details('shallow', 'B', 'C', 20000),
+        make_pair_details('deep', 'C', 'B', 90000),
+        make_pair_details('other-chain', 'B', 'C', 500000, chain_id='ethereum'),
+        make_pair_details('unrelated', 'A', 'C', 500000),
+    ]:
+        token_pair_index[token_pair_key(details.chain_id, details.base_token, details.quote_token)].append(details)
+    opportunity = ArbitrageOpportunity(make_pair_details('AB', 'A', 'B', 50000), make_pair_details('AC', 'A', 'C', 50000))
+    candidates = find_matching_third_pairs(opportunity, token_pair_index)
+    assert [pair.pool_address for pair in candidates] == ['deep', 'shallow']
+    assert find_matching_third_pair(opportunity, token_pair_index).pool_address == 'deep'
+    other_chain = ArbitrageOpportunity(make_pair_details('AB', 'A', 'B', 50000, chain_id='bsc'),
+                                       make_pair_details('AC', 'A', 'C', 50000, chain_id='bsc'))
+    assert find_matching_third_pair(other_chain, token_pair_index) is None
+
+
+def test_top_opportunities_matches_full_sort() -> None:
+    """The bounded heap keeps the same entries, in the same order, as sorting everything."""
+    rng = random.Random(3)
+    opportunities = [SimpleNamespace(id=n, rank_profit=rng.choice([1.0, 2.5, 7.0, rng.uniform(0, 10)])) for n in range(500)]
+    full_sort = sorted(opportunities, key=lambda x: x.rank_profit, reverse=True)
+    assert top_opportunities(iter(opportunities), 20) == full_sort[:20]
+    assert top_opportunities(iter(opportunities), 0) == full_sort
+
+
+def test_process_arbitrage_data_consumes_pipeline_lazily(monkeypatch) -> None:
+    """process_arbitrage_data ranks what the generator pipeline yields without listing it first."""
+    yielded = []
+
+    def pipeline(*args):
+        for n in range(50):
+            yielded.append(n)
+            yield SimpleNamespace(id=n, rank_profit=float(n % 7))
+
+    monkeypatch.setattr(main_utils, 'iter_arbitrage_data', pipeline)
+    results = main_utils.process_arbitrage_data(None, 10000, 0.0005, 0.0003, search_address='A', limit=3)
+    assert [result.id for result in results] == [6, 13, 20]
+    assert len(yielded) == 50
+
+
+def test_triangle_fields_are_numbers_until_serialized() -> None:
+    """Quote prices and discrepancies are computed on numbers and only formatted by to_dict."""
+    pool_a = make_pair_details('AB', 'A', 'B', 50000)
+    pool_b = make_pair_details('AC', 'A', 'C', 50000)
+    pool_a.price_usd, pool_a.price_native = 2.0, 4.0
+    pool_b.price_usd, pool_b.price_native = 2.2, 2.0
+    pool_c = make_pair_details('BC', 'B', 'C', 50000)
+    opportunity = main_utils.combine_opportunity_data(ArbitrageOpportunity(pool_a, pool_b, profit=1.23456789012), pool_c)
+    main_utils.calculate_usd_prices(opportunity)
+    main_utils.calculate_price_discrepancies(opportunity)
+
+    assert opportunity.quote_prices_usd == (0.5, 1.1, 1.0)
+    assert abs(opportunity.discrepancies['baseToken_difference_12'] - (2.0 - 2.2) / 2.0 * 100) < 1e-9
+    data = opportunity.to_dict()
+    assert data['quote_price_usd_1'] == '$0.50'
+    assert data['baseToken_difference_12'] == '-10.00%'
+    assert data['pool_pair3_address'] == 'BC'
+    assert data['int_profit'] == 1.23456789
+    assert data['profit'] == '$1.23'
+
+
+def test_complete_opportunities_returns_each_triangle_once() -> None:
+    """Every distinct triangle is returned once, unprofitable ones included, ranked by their sized profit."""
+    token_pair_index = defaultdict(list)
+    pool_c = make_pair_details('BC', 'B', 'C', 50000)
+    token_pair_index[token_pair_key(pool_c.chain_id, pool_c.base_token, pool_c.quote_token)].append(pool_c)
+    opportunity = ArbitrageOpportunity(make_pair_details('AB', 'A', 'B', 50000), make_pair_details('AC', 'A', 'C', 50000))
+    found = list(main_utils.complete_opportunities([opportunity, opportunity], token_pair_index, 10000, 0.0005, 0.003))
+    assert [[pool.pool_address for pool in triangle.pools] for triangle in found] == [['AB', 'AC', 'BC']]
+    assert not main_utils.check_price_compatibility(found[0], 10000, 0.0005, 0.003)
@@ -0,0 +1,57 @@
+import multiprocessing
+import sys
+
+import pytest
+
+from utils.metrics import Metrics
+
+
+def test_render_counters_and_histograms() -> None:
+    """Counters sum per label set; histogram buckets are cumulative with a +Inf bucket, sum and count."""
+    metrics = Metrics(path=None, buckets=(0.1, 1.0))
+    metrics.inc('arbscreener_cache_requests_total', cache='pairs', result='hit')
+    metrics.inc('arbscreener_cache_requests_total', 2, cache='pairs', result='hit')
+    metrics.observe('arbscreener_stage_duration_seconds', 0.05, stage='pair_scan')
+    metrics.observe('arbscreener_stage_duration_seconds', 0.5, stage='pair_scan')
+    with metrics.timer('arbscreener_stage_duration_seconds', stage='total'):
+        pass
+    with pytest.raises(KeyError):
+        metrics.inc('arbscreener_unknown_total')
+
+    lines = metrics.render().splitlines()
+    assert '# TYPE arbscreener_stage_duration_seconds histogram' in lines
+    assert 'arbscreener_cache_requests_total{cache="pairs",result="hit"} 3' in lines
+    assert 'arbscreener_stage_duration_seconds_bucket{stage="pair_scan",le="0.1"} 1' in lines
+    assert 'arbscreener_stage_duration_seconds_bucket{stage="pair_scan",le="1.0"} 2' in lines
+    assert 'arbscreener_stage_duration_seconds_bucket{stage="pair_scan",le="+Inf"} 2' in lines
+    assert 'arbscreener_stage_duration_seconds_sum{stage="pair_scan"} 0.55' in lines
+    assert 'arbscreener_stage_duration_seconds_count{stage="total"} 1' in lines
+
+
+def record_in_worker(path: str, hits: int) -> None:
+    metrics = Metrics(path=path, flush_interval=3600, buckets=(1.0,))
+    for _ in range(hits):
+        metrics.inc('arbscreener_cache_requests_total', cache='pairs', result='hit')
+    metrics.observe('arbscreener_fetch_duration_seconds', 0.5, operation='search')
+    metrics.flush()
+
+
+@pytest.mark.skipif(sys.platform == 'win32', reason='needs fork')
+def test_metrics_are_summed_across_processes(tmp_path) -> None:
+    """Any process sharing the metrics file reports the series recorded by all of them."""
+    path = str(tmp_path / 'metrics.sqlite3')
+    context = multiprocessing.get_context('fork')
+    workers = [context.Process(target=record_in_worker, args=(path, hits)) for hits in (2, 5)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    assert [worker.exitcode for worker in workers] == [0, 0]
+
+    scraper = Metrics(path=path, buckets=(1.0,))
+    scraper.inc('arbscreener_cache_requests_total', cache='pairs', result='miss')
+    lines = scraper.render().splitlines()
+    assert 'arbscreener_cache_requests_total{cache="pairs",result="hit"} 7' in lines
+    assert 'arbscreener_cache_requests_total{cache="pairs",result="miss"} 1' in lines
+    assert 'arbscreener_fetch_duration_seconds_count{operation="search"} 2' in lines
+    assert 'arbscreener_fetch_duration_seconds_sum{operation="search"} 1.0' in lines
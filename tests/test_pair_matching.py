@@ -0,0 +1,138 @@
+import random
+from src.models import LiquidityPool
+from utils.amm import token_price_usd
+from utils.arbitrage import (
+    calculate_arbitrage_profit,
+    find_arbitrage_opportunities_indexed,
+    format_opportunity,
+    optimal_arbitrage_trade,
+)
+from utils.vectorized import PairColumns, candidate_blocks, candidate_index_pairs, find_arbitrage_opportunities_vectorized
+
+
+def make_pairs(count: int, token_count: int, seed: int = 7) -> list:
+    """Build random `process_token_pairs` pools over a small token universe."""
+    rng = random.Random(seed)
+    tokens = [f'T{n}' for n in range(token_count)]
+    pairs = []
+    for n in range(count):
+        base, quote = rng.sample(tokens, 2)
+        pairs.append(LiquidityPool(
+            base_token=base,
+            quote_token=quote,
+            price_native=rng.uniform(0.5, 2.0),
+            pool_address=f'P{n}',
+            url=f'https://example.test/P{n}',
+            price_usd=rng.uniform(0.01, 100),
+            liquidity_usd=rng.choice([5000, 50000, 500000]),
+            liquidity_base=rng.uniform(1e4, 1e6),
+            liquidity_quote=rng.uniform(1e4, 1e6),
+            chain_id='solana',
+            dex_id='raydium',
+            base_name=base,
+            quote_name=quote,
+        ))
+    return pairs
+
+
+def reserve(pool: LiquidityPool, token: str) -> float:
+    return pool.liquidity_base if token == pool.base_token else pool.liquidity_quote
+
+
+def quadratic_scan(token_pairs, slippage, fee_percentage, initial_investment) -> list:
+    """The original every-pair-against-every-pair scan, kept as a reference."""
+    opportunities = []
+    for i, pair1 in enumerate(token_pairs):
+        for j, pair2 in enumerate(token_pairs):
+            if i == j:
+                continue
+            if pair1.base_token == pair2.base_token:
+                pair1_price, pair2_price = pair1.price_native, pair2.price_native
+                base_liquidity = min(pair1.liquidity_base, pair2.liquidity_base)
+                shared = pair1.base_token
+            elif pair1.base_token == pair2.quote_token:
+                pair1_price, pair2_price = pair1.price_native, 1 / pair2.price_native
+                base_liquidity = min(pair1.liquidity_base, pair2.liquidity_quote)
+                shared = pair1.base_token
+            elif pair1.quote_token == pair2.base_token:
+                pair1_price, pair2_price = 1 / pair1.price_native, pair2.price_native
+                base_liquidity = min(pair1.liquidity_quote, pair2.liquidity_base)
+                shared = pair1.quote_token
+            else:
+                continue
+            if not (pair1.liquidity_usd > 10000 and pair2.liquidity_usd > 10000):
+                continue
+            price_diff = pair2_price - pair1_price
+            if price_diff <= 0:
+                continue
+            # Buy the shared token on pair1 with its other token, sell it on pair2 for its other token
+            token_in = pair1.quote_token if shared == pair1.base_token else pair1.base_token
+            token_out = pair2.quote_token if shared == pair2.base_token else pair2.base_token
+            entry_hop = (reserve(pair1, token_in), reserve(pair1, shared))
+            exit_hop = (reserve(pair2, shared), reserve(pair2, token_out))
+            entry_usd = token_price_usd(pair1, token_in)
+            exit_usd = entry_usd if token_out == token_in else token_price_usd(pair2, token_out)
+            if entry_usd <= 0 or exit_usd <= 0:
+                continue
+            profit = calculate_arbitrage_profit(initial_investment, entry_hop, exit_hop, slippage,
+                                                fee_percentage, entry_usd, exit_usd)
+            if profit > 0:
+                optimal_input, achievable_profit = optimal_arbitrage_trade(
+                    entry_hop, exit_hop, slippage, fee_percentage, entry_usd, exit_usd)
+                opportunities.append(format_opportunity(
+                    pair1, pair2, price_diff, pair1.liquidity_usd - pair2.liquidity_usd, profit, base_liquidity,
+                    float(optimal_input), float(achievable_profit)))
+    return opportunities
+
+
+def test_indexed_scan_matches_quadratic_scan() -> None:
+    """The indexed engine must return exactly the opportunities of the full scan, in order."""
+    pairs = make_pairs(120, 15)
+    expected = quadratic_scan(pairs, 0.0005, 0.0003, 10000)
+    found = find_arbitrage_opportunities_indexed(pairs, 0.0005, 0.0003, 10000)
+    assert expected
+    assert found == expected
+
+
+def test_indexed_scan_skips_illiquid_pairs() -> None:
+    """Pairs at or below the liquidity floor never take part in an opportunity."""
+    pairs = make_pairs(60, 6)
+    for pair in pairs:
+        pair.liquidity_usd = 10000
+    assert find_arbitrage_opportunities_indexed(pairs, 0.0005, 0.0003, 10000) == []
+
+
+def test_vectorized_scan_matches_indexed_scan() -> None:
+    """The batched numpy pass returns the scalar engine's opportunities, across block boundaries."""
+    pairs = make_pairs(300, 20, seed=11)
+    expected = find_arbitrage_opportunities_indexed(pairs, 0.0005, 0.0003, 10000)
+    assert expected
+    assert find_arbitrage_opportunities_vectorized(pairs, 0.0005, 0.0003, 10000, block_candidates=500) == expected
+    assert find_arbitrage_opportunities_vectorized(pairs[:0], 0.0005, 0.0003, 10000) == []
+
+
+def test_vectorized_blocks_are_bounded_by_candidates() -> None:
+    """A hub token shared by most pools gets small blocks; each stays within the candidate budget."""
+    pairs = make_pairs(400, 40, seed=5)
+    for pair in pairs[::2]:
+        pair.quote_token = 'HUB'
+    columns = PairColumns(pairs)
+    blocks = list(candidate_blocks(columns, 2000))
+    assert blocks[0][0] == 0 and blocks[-1][1] == len(columns)
+    assert all(stop == next_start for (_, stop), (next_start, _) in zip(blocks, blocks[1:]))
+    for start, stop in blocks:
+        assert stop - start == 1 or len(candidate_index_pairs(columns, start, stop)[0]) <= 2000
+    assert len(blocks) > 1
+    expected = find_arbitrage_opportunities_indexed(pairs, 0.0005, 0.0003, 10000)
+    assert find_arbitrage_opportunities_vectorized(pairs, 0.0005, 0.0003, 10000, block_candidates=2000) == expected
+
+
+def test_unpriced_pools_are_skipped_by_both_scans() -> None:
+    """A pool quoting a zero price takes no part in an opportunity, scalar or vectorized."""
+    pairs = make_pairs(120, 10, seed=3)
+    for pair in pairs[::7]:
+        pair.price_native = 0.0
+    expected = find_arbitrage_opportunities_indexed(pairs, 0.0005, 0.0003, 10000)
+    assert expected
+    assert all(o.pool_a.price_native > 0 and o.pool_b.price_native > 0 for o in expected)
+    assert find_arbitrage_opportunities_vectorized(pairs, 0.0005, 0.0003, 10000) == expected
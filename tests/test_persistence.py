@@ -0,0 +1,66 @@
+from datetime import datetime
+
+from src.models import LiquidityPool
+from utils.persistence import PoolRepository, make_pool_repository, normalize_database_url
+
+
+def make_pool(address: str, price_native: float, liquidity_usd: float = 50000.0) -> LiquidityPool:
+    return LiquidityPool('BASE', 'QUOTE', price_native=price_native, pool_address=address, price_usd=price_native * 2,
+                         liquidity_usd=liquidity_usd, chain_id='solana', dex_id='raydium')
+
+
+def test_upsert_inserts_then_updates_in_batches(tmp_path) -> None:
+    """A fetch is upserted in batches; re-sent addresses are updated in place and the last duplicate wins."""
+    repository = PoolRepository(f"sqlite:///{tmp_path / 'pools.db'}", batch_size=2)
+    repository.create_tables()
+    assert repository.upsert_pools([make_pool(f'P{n}', 1.0) for n in range(5)]) == 5
+    assert repository.upsert_pools([make_pool('P1', 2.0), make_pool('P9', 3.0), make_pool('P1', 2.5, 10.0)],
+                                   updated_at=datetime(2025, 1, 1)) == 2
+
+    assert repository.last_prices(['P0', 'P1', 'P9', 'missing']) == {'P0': 1.0, 'P1': 2.5, 'P9': 3.0}
+    assert repository.last_price('missing') is None
+    with repository.engine.connect() as connection:
+        rows = connection.exec_driver_sql(
+            "SELECT COUNT(*), MAX(liquidity_usd) FROM contracts WHERE contract_address = 'P1'").fetchall()
+        assert rows == [(1, 10.0)]
+    assert repository.stats()['rows_upserted'] == 7
+
+
+def test_database_url_normalization() -> None:
+    """postgres:// URLs are rewritten for SQLAlchemy, and persistence is off without a URL."""
+    assert normalize_database_url('postgres://u:p@db/x') == 'postgresql://u:p@db/x'
+    assert normalize_database_url('sqlite:///x.db') == 'sqlite:///x.db'
+    assert make_pool_repository(None) is None
+
+
+def test_create_tables_adds_columns_missing_from_deployed_tables(tmp_path) -> None:
+    """Tables created before liquidity_usd existed gain the column, keeping their rows, and upserts work."""
+    repository = PoolRepository(f"sqlite:///{tmp_path / 'pools.db'}")
+    with repository.engine.begin() as connection:
+        for table in ('contracts', 'lake'):
+            connection.exec_driver_sql(
+                f'CREATE TABLE {table} (id INTEGER PRIMARY KEY, contract_address VARCHAR(255) NOT NULL UNIQUE, '
+                'base_token_address VARCHAR(255), quote_token_address VARCHAR(255), chain_id VARCHAR(50), '
+                'dex_id VARCHAR(50), last_updated DATETIME, price_native FLOAT, price_usd FLOAT)')
+        connection.exec_driver_sql("INSERT INTO contracts (contract_address, price_native) VALUES ('P0', 1.0)")
+
+    repository.create_tables()
+    assert repository.add_missing_columns([repository._table('contracts'), repository._table('lake')]) == []
+    assert repository.upsert_pools([make_pool('P1', 2.0, 10.0)]) == 1
+    assert repository.upsert_pools([make_pool('P1', 2.0, 10.0)], table='lake') == 1
+    assert repository.last_prices(['P0', 'P1']) == {'P0': 1.0, 'P1': 2.0}
+
+
+def test_persisted_pools_reach_both_tables(tmp_path, monkeypatch) -> None:
+    """Each fetch's pools are upserted into contracts and lake alike, refreshed in place."""
+    import utils.main_utils as main_utils
+
+    repository = PoolRepository(f"sqlite:///{tmp_path / 'pools.db'}")
+    repository.create_tables()
+    monkeypatch.setattr(main_utils, 'pool_repository', repository)
+    main_utils.persist_pools([make_pool('P0', 1.0), make_pool('P1', 2.0)])
+    main_utils.persist_pools([make_pool('P1', 2.5)])
+
+    for table in ('contracts', 'lake'):
+        assert repository.last_prices(['P0', 'P1'], table) == {'P0': 1.0, 'P1': 2.5}
+    assert repository.stats()['rows_upserted'] == 6
@@ -0,0 +1,69 @@
+import os
+
+import utils.poller as poller_module
+from src.models import ArbitrageOpportunity, LiquidityPool
+from utils.cache import SQLiteCache, TTLCache
+from utils.poller import MarketPoller
+
+
+def test_poller_serves_precomputed_snapshots(monkeypatch) -> None:
+    """A refresh stores the pairs and each scenario's results; stale snapshots are not served."""
+    searches = []
+    monkeypatch.setattr(poller_module, 'fetch_and_cache_pairs', lambda address: searches.append(address) or ['raw pair'])
+    monkeypatch.setattr(poller_module, 'process_token_pairs', lambda search: [{'pool_address': 'P1'}])
+    monkeypatch.setattr(poller_module, 'process_arbitrage_data',
+                        lambda purchases, investment, slippage, fee, search_address=None, scanner=None: [{'int_profit': investment}])
+
+    poller = MarketPoller(watchlist=['SOL'], scenarios=[(10000, 0.0005, 0.0003), (500, 0.001, 0.0003)],
+                          lock_path=None, store=TTLCache(ttl=60))
+    assert poller.latest('SOL', 10000, 0.0005, 0.0003) is None
+    poller.refresh_all()
+
+    results, fetched_at = poller.latest('SOL', 10000, 0.0005, 0.0003)
+    assert results == [{'int_profit': 10000}]
+    assert poller.latest('SOL', 500, 0.001, 0.0003)[0] == [{'int_profit': 500}]
+    assert poller.latest_pairs('SOL')[0] == [{'pool_address': 'P1'}]
+    assert poller.latest('ETH', 10000, 0.0005, 0.0003) is None
+    assert searches == ['SOL']
+
+    poller.max_staleness = -1
+    assert poller.latest('SOL', 10000, 0.0005, 0.0003) is None
+
+
+def test_one_poller_leads_and_every_worker_serves_its_snapshots(tmp_path, monkeypatch) -> None:
+    """Two pollers contend for a real lock file; the follower serves what the leader stored in the shared cache."""
+    pool = LiquidityPool('A', 'B', price_native=2.0, pool_address='P1', liquidity_usd=50000.0)
+    monkeypatch.setattr(poller_module, 'fetch_and_cache_pairs', lambda address: ['raw pair'])
+    monkeypatch.setattr(poller_module, 'process_token_pairs', lambda search: [pool])
+    monkeypatch.setattr(poller_module, 'process_arbitrage_data',
+                        lambda purchases, investment, slippage, fee, search_address=None, scanner=None:
+                        [ArbitrageOpportunity(pool, pool, profit=investment)])
+
+    lock_path = str(tmp_path / 'poller.lock')
+    cache_path = str(tmp_path / 'cache.sqlite3')
+    leader, follower = (MarketPoller(watchlist=['SOL'], lock_path=lock_path,
+                                     store=SQLiteCache(path=cache_path, namespace='snapshots', ttl=60))
+                        for _ in range(2))
+    try:
+        assert leader._acquire_leadership()
+        assert not follower._acquire_leadership()
+        leader.refresh_all()
+        results, _ = follower.latest('SOL', 10000, 0.0005, 0.0003)
+        assert [opportunity.profit for opportunity in results] == [10000]
+        assert follower.latest_pairs('SOL')[0][0].pool_address == 'P1'
+
+        leader.stop()
+        assert follower._acquire_leadership()
+        assert follower.stats()['leader'] and not leader.stats()['leader']
+    finally:
+        follower.stop()
+
+
+def test_poller_snapshots_default_to_a_shared_cache(tmp_path, caplog) -> None:
+    """Snapshots go to a cache every worker reads; a process-local one is warned about when polling starts."""
+    if 'POLLER_CACHE_BACKEND' not in os.environ:
+        assert not isinstance(poller_module.poller.store, TTLCache)
+    local = MarketPoller(watchlist=[], lock_path=str(tmp_path / 'poller.lock'), store=TTLCache(ttl=60))
+    local.start()
+    local.stop()
+    assert 'only the worker holding the poller lock' in caplog.text
@@ -0,0 +1,87 @@
+import os
+import subprocess
+import sys
+
+import pytest
+from utils.rate_limiter import RateLimitExceeded, SQLiteBucketState, TokenBucket, priority_scope
+
+
+class FakeTime:
+    """Clock that only moves when the limiter sleeps."""
+    def __init__(self) -> None:
+        self.now = 1000.0
+
+    def clock(self) -> float:
+        return self.now
+
+    def sleep(self, seconds: float) -> None:
+        self.now += seconds
+
+
+def make_bucket(fake: FakeTime, **kwargs) -> TokenBucket:
+    kwargs.setdefault('reserves', {'high': 0.0, 'normal': 0.0, 'low': 0.5})
+    return TokenBucket(rate_per_minute=60, burst=4, clock=fake.clock, sleep=fake.sleep, **kwargs)
+
+
+def test_bucket_allows_burst_then_waits_for_refill() -> None:
+    """The burst is served immediately, the next call waits one refill interval."""
+    fake = FakeTime()
+    bucket = make_bucket(fake)
+    assert [bucket.acquire() for _ in range(4)] == [0.0] * 4
+    assert bucket.acquire() == pytest.approx(1.0)
+    stats = bucket.stats()['priorities']['normal']
+    assert (stats['acquired'], stats['waits']) == (5, 1)
+
+
+def test_bucket_fails_fast_when_asked() -> None:
+    """Non-blocking and bounded callers get RateLimitExceeded instead of sleeping."""
+    fake = FakeTime()
+    bucket = make_bucket(fake)
+    for _ in range(4):
+        bucket.acquire()
+    with pytest.raises(RateLimitExceeded):
+        bucket.acquire(block=False)
+    with pytest.raises(RateLimitExceeded):
+        bucket.acquire(timeout=0.5)
+    assert fake.now == 1000.0
+    assert bucket.stats()['priorities']['normal']['rejected'] == 2
+
+
+def test_low_priority_leaves_reserve_for_high_priority() -> None:
+    """Low priority stops at half the burst, high priority can still drain it."""
+    fake = FakeTime()
+    bucket = make_bucket(fake)
+    with priority_scope('low'):
+        bucket.acquire()
+        bucket.acquire()
+        with pytest.raises(RateLimitExceeded):
+            bucket.acquire(block=False)
+    bucket.acquire(priority='high', block=False)
+    bucket.acquire(priority='high', block=False)
+
+
+def test_sqlite_state_shares_budget(tmp_path) -> None:
+    """Two buckets on the same state file draw from one budget."""
+    fake = FakeTime()
+    path = str(tmp_path / 'limiter.sqlite3')
+    first = make_bucket(fake, state=SQLiteBucketState(4, path))
+    second = make_bucket(fake, state=SQLiteBucketState(4, path))
+    first.acquire()
+    first.acquire()
+    second.acquire()
+    second.acquire()
+    with pytest.raises(RateLimitExceeded):
+        first.acquire(block=False)
+
+
+def test_gunicorn_config_shares_the_bucket_between_workers(tmp_path) -> None:
+    """Under the gunicorn config every worker process draws from the SQLite bucket unless told otherwise."""
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    probe = ("import runpy, json; runpy.run_path('gunicorn.conf.py'); "
+             "from utils.rate_limiter import TokenBucket; "
+             "print(json.dumps(TokenBucket.from_env().stats()['shared']))")
+    env = {name: value for name, value in os.environ.items() if name != 'RATE_LIMIT_STATE_PATH'}
+    env['TMPDIR'] = str(tmp_path)
+    output = subprocess.run([sys.executable, '-c', probe], cwd=root, env=env, capture_output=True,
+                            text=True, check=True).stdout
+    assert output.strip().splitlines()[-1] == 'true'
@@ -0,0 +1,61 @@
+import json
+
+import pytest
+from dexscreener.models import TokenPair
+
+import utils.main_utils as main_utils
+from tests.test_fetcher import pair_payload
+from utils.replay import ReplayFetcher, read_jsonl_snapshots, replay, write_jsonl_snapshot
+
+
+def deep_pair(address: str, base: str, quote: str, price: float) -> TokenPair:
+    """A pool holding a million base tokens and the quote tokens matching its price."""
+    payload = pair_payload(address, base, quote, price)
+    payload['liquidity'] = {'usd': 50000.0, 'base': 1e6, 'quote': 1e6 * price}
+    return TokenPair(**payload)
+
+
+def market(price_ab: float) -> list:
+    """A token A traded against B and C on two pools each, closed by a B/C pool."""
+    return [deep_pair(address, base, quote, price) for address, base, quote, price in [
+        ('AB-1', 'A', 'B', price_ab),
+        ('AB-2', 'A', 'B', 2.0),
+        ('AC-1', 'A', 'C', 4.0),
+        ('AC-2', 'A', 'C', 4.1),
+        ('BC-1', 'B', 'C', 2.0),
+    ]]
+
+
+def test_replay_fetcher_answers_from_recorded_market() -> None:
+    """Searches match addresses and symbols; later snapshots replace a pool's earlier state."""
+    fetcher = ReplayFetcher()
+    fetcher.update(market(2.0))
+    assert [pair.pair_address for pair in fetcher.search_pairs('A')] == ['AB-1', 'AB-2', 'AC-1', 'AC-2']
+    assert [pair.pair_address for pair in fetcher.search_pairs('b, AC-1')] == ['AB-1', 'AB-2', 'AC-1', 'BC-1']
+    fetcher.update(market(2.5)[:1])
+    assert fetcher.get_token_pairs('B')[0].price_native == 2.5
+    assert len(fetcher.pairs) == 5
+
+
+def test_replay_is_deterministic_and_offline(tmp_path, monkeypatch) -> None:
+    """A JSON lines recording replays to the same opportunities every run, never touching the live fetcher."""
+    recording = tmp_path / 'snapshots.jsonl'
+    with open(recording, 'w') as f:
+        for tick, price in enumerate([2.0, 2.6, 2.0]):
+            write_jsonl_snapshot(f, 1000.0 + tick, market(price))
+
+    live_fetcher = main_utils.fetcher
+    monkeypatch.setattr(live_fetcher, 'search_pairs', lambda query: pytest.fail('live search during replay'))
+    seen = []
+    first = replay(read_jsonl_snapshots(recording), 'A', limit=0,
+                   on_tick=lambda tick, timestamp, opportunities: seen.append((tick, timestamp)))
+    second = replay(read_jsonl_snapshots(recording), 'A', limit=0)
+
+    assert seen == [(0, 1000.0), (1, 1001.0), (2, 1002.0)]
+    assert first.snapshots == 3 and first.snapshots_per_second > 0
+    assert [[o.to_dict() for o in found] for _, found in first.ticks] == \
+           [[o.to_dict() for o in found] for _, found in second.ticks]
+    by_tick = [[o.to_dict() for o in found] for _, found in first.ticks]
+    assert by_tick[0] and by_tick[1] != by_tick[0] and by_tick[2] == by_tick[0]
+    assert json.loads(json.dumps(first.summary()))['snapshots'] == 3
+    assert main_utils.fetcher is live_fetcher
@@ -0,0 +1,91 @@
+import gzip
+import json
+
+import pytest
+from flask import Flask
+
+import utils.main_utils as main_utils
+import utils.serialization as serialization
+from src.models import ArbitrageOpportunity
+from tests.test_main_utils import make_pair_details
+from tests.test_replay import market
+from utils.replay import replay
+from utils.serialization import choose_encoding, dumps, json_response, opportunity_payload
+
+
+def triangle() -> ArbitrageOpportunity:
+    pool_a = make_pair_details('AB', 'A', 'B', 50000)
+    pool_b = make_pair_details('AC', 'A', 'C', 50000)
+    pool_a.price_usd, pool_a.price_native = 2.0, 4.0
+    pool_b.price_usd, pool_b.price_native = 2.2, 2.0
+    opportunity = main_utils.combine_opportunity_data(ArbitrageOpportunity(pool_a, pool_b, profit=1.5),
+                                                      make_pair_details('BC', 'B', 'C', 50000))
+    main_utils.calculate_usd_prices(opportunity)
+    main_utils.calculate_price_discrepancies(opportunity)
+    return opportunity
+
+
+def test_choose_encoding_prefers_brotli_and_honours_q_values(monkeypatch) -> None:
+    """br wins when this process can produce it; q=0 refuses a coding, a wildcard accepts the rest."""
+    monkeypatch.setattr(serialization, 'brotli', object())
+    assert choose_encoding('gzip, deflate, br') == 'br'
+    assert choose_encoding('br;q=0, gzip;q=0.5') == 'gzip'
+    assert choose_encoding('*;q=0.1') == 'br'
+    assert choose_encoding('gzip;q=1.0, br;q=0.1') == 'gzip'
+    assert choose_encoding('gzip;q=0.5, br;q=0.5') == 'br'
+    assert choose_encoding('identity, gzip;q=0.5') is None
+    assert choose_encoding('identity') is None
+    assert choose_encoding(None) is None
+    monkeypatch.setattr(serialization, 'brotli', None)
+    assert choose_encoding('br, gzip') == 'gzip'
+    assert choose_encoding('br') is None
+
+
+def test_lean_record_is_numeric_and_smaller_than_full() -> None:
+    """The lean record carries numbers, not formatted strings, and names each token once."""
+    opportunity = triangle()
+    record = json.loads(dumps(opportunity_payload([opportunity])))[0]
+    assert record['tokens'] == {'A': 'A', 'B': 'B', 'C': 'C'}
+    assert record['quote_prices_usd'] == [0.5, 1.1, 1.0]
+    assert record['profit'] == 1.5
+    assert [pool['address'] for pool in record['pools']] == ['AB', 'AC', 'BC']
+    assert not any(isinstance(value, str) for value in record['discrepancies'].values())
+    assert len(dumps([opportunity])) < len(dumps(opportunity_payload([opportunity], 'full')))
+
+
+def test_stdlib_fallback_encodes_the_same_document(monkeypatch) -> None:
+    """Without orjson the stdlib encoder produces an equivalent compact document, NaN included."""
+    opportunity = triangle()
+    key = next(iter(opportunity.discrepancies))
+    opportunity.discrepancies[key] = float('nan')
+    payload = opportunity_payload([opportunity])
+    fast = dumps(payload)
+    monkeypatch.setattr(serialization, 'orjson', None)
+    slow = dumps(payload)
+    assert json.loads(slow) == json.loads(fast)
+    assert json.loads(slow)[0]['discrepancies'][key] is None
+    with pytest.raises(ValueError):
+        dumps({'profit': float('inf')})
+
+
+def test_json_response_compresses_large_bodies_only(monkeypatch) -> None:
+    """Bodies past COMPRESS_MIN_SIZE are gzipped for a client that accepts it; all responses vary on it."""
+    monkeypatch.setattr(serialization, 'brotli', None)
+    app = Flask(__name__)
+    large = [triangle()] * 10
+    with app.test_request_context(headers={'Accept-Encoding': 'gzip'}):
+        response = json_response(large)
+        small = json_response({'count': 0})
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert 'Accept-Encoding' in response.headers['Vary']
+    assert json.loads(gzip.decompress(response.get_data())) == json.loads(dumps(large))
+    assert 'Content-Encoding' not in small.headers and small.get_data() == b'{"count":0}'
+
+
+def test_each_triangle_is_returned_once() -> None:
+    """A compatible triangle is yielded once, not again alongside its combined form."""
+    report = replay([(1000.0, market(2.6))], 'A', limit=0)
+    (_, found), = report.ticks
+    assert found
+    keys = [tuple(pool.pool_address for pool in opportunity.pools) for opportunity in found]
+    assert len(keys) == len(set(keys))
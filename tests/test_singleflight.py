@@ -0,0 +1,68 @@
+import threading
+import time
+
+import pytest
+from utils.singleflight import SingleFlight, single_flight
+
+
+def test_concurrent_identical_calls_share_one_execution() -> None:
+    """Callers arriving while the first call runs get its result without running it again."""
+    group = SingleFlight()
+    release = threading.Event()
+    calls = []
+
+    @single_flight(group, lambda address, investment: (address, investment))
+    def search(address, investment):
+        calls.append(address)
+        release.wait(5)
+        return [address, investment]
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(search('SOL', 10000))) for _ in range(5)]
+    for thread in threads:
+        thread.start()
+    while group.stats()['shared'] < 4:
+        time.sleep(0.01)
+    release.set()
+    for thread in threads:
+        thread.join()
+
+    assert calls == ['SOL']
+    assert results == [['SOL', 10000]] * 5
+    assert group.in_flight() == 0
+    assert search('SOL', 500) == ['SOL', 500]
+    assert calls == ['SOL', 'SOL']
+
+
+def test_waiters_receive_the_leaders_exception() -> None:
+    """A failure is raised to every caller that shared the execution."""
+    group = SingleFlight()
+    started = threading.Event()
+    release = threading.Event()
+
+    def failing():
+        started.set()
+        release.wait(5)
+        raise ValueError('upstream down')
+
+    errors = []
+
+    def call():
+        try:
+            group.do('key', failing)
+        except ValueError as e:
+            errors.append(str(e))
+
+    leader = threading.Thread(target=call)
+    leader.start()
+    started.wait(5)
+    follower = threading.Thread(target=call)
+    follower.start()
+    while group.stats()['shared'] < 1:
+        time.sleep(0.01)
+    release.set()
+    leader.join()
+    follower.join()
+    assert errors == ['upstream down', 'upstream down']
+    with pytest.raises(KeyError):
+        group.do('other', lambda: {}['missing'])
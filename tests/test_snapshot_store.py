@@ -0,0 +1,125 @@
+import copy
+import random
+
+import utils.main_utils as main_utils
+from utils.arbitrage import find_arbitrage_opportunities_indexed
+from utils.replay import ReplayFetcher, SimulatedClock, replay_environment
+from utils.snapshot_store import IncrementalScanner, PoolSnapshotStore, has_moved, pair_has_moved
+from tests.test_pair_matching import make_pairs
+from tests.test_replay import market
+
+
+def move_prices(pairs: list, share: float, scale: float, seed: int) -> list:
+    """Copy pairs, scaling price_native of a random `share` of them by up to `scale`."""
+    rng = random.Random(seed)
+    moved = []
+    for pair in pairs:
+        pair = copy.copy(pair)
+        if rng.random() < share:
+            pair.price_native *= 1 + rng.uniform(-scale, scale)
+        moved.append(pair)
+    return moved
+
+
+def test_has_moved_is_relative() -> None:
+    """Moves are measured relative to the price, so small and large prices share one threshold."""
+    assert not has_moved(100.0, 100.05, 0.001)
+    assert has_moved(100.0, 100.5, 0.001)
+    assert has_moved(0.0, 1e-9, 0.001)
+    assert not has_moved(None, 0.0, 0.001)
+
+
+def test_store_tracks_changes_and_query_details() -> None:
+    """Only unknown pools and pools moved past the threshold count as changed."""
+    store = PoolSnapshotStore(threshold=0.01)
+    assert store.is_changed('P0', 1.0, 5000.0)
+    assert store.details_for_query('Q') is None
+
+    store.record('P0', 1.0, 5000.0, {'pair_address': 'P0'})
+    store.record_query('Q', ['P0', 'P1'])
+    assert store.last_price('P0') == 1.0
+    assert not store.is_changed('P0', 1.005, 5010.0)
+    assert store.is_changed('P0', 1.02, 5000.0)
+    assert store.is_changed('P0', 1.0, 6000.0)
+    assert store.details_for_query('Q') == [{'pair_address': 'P0'}]
+
+
+def test_store_evicts_least_recently_used() -> None:
+    """Past maxsize the pool read or written longest ago is dropped."""
+    store = PoolSnapshotStore(maxsize=2)
+    store.record('P0', 1.0, 5000.0)
+    store.record('P1', 2.0, 5000.0)
+    assert store.last_price('P0') == 1.0
+    store.record('P2', 3.0, 5000.0)
+    assert len(store) == 2 and store.evictions == 1
+    assert store.last_price('P1') is None and store.last_price('P0') == 1.0
+    assert store.is_changed('P1', 2.0, 5000.0)
+
+
+def test_third_pair_lookup_rebuilds_only_moved_pools(monkeypatch) -> None:
+    """Repeated lookups reuse the details of unchanged pools and rebuild the ones that moved."""
+    fetcher = ReplayFetcher()
+    fetcher.update(market(2.0))
+    built = []
+    create_pair_details = main_utils.create_pair_details
+    monkeypatch.setattr(main_utils, 'create_pair_details',
+                        lambda pair: built.append(pair.pair_address) or create_pair_details(pair))
+    with replay_environment(fetcher, SimulatedClock()) as before_tick:
+        before_tick()
+        first, _ = main_utils.fetch_or_use_cached_data(['A'])
+        fetcher.update(market(2.6)[:1])
+        before_tick()
+        second, token_pair_index = main_utils.fetch_or_use_cached_data(['A'])
+    assert built == ['AB-1', 'AB-2', 'AC-1', 'AC-2', 'AB-1']
+    assert second['AC-1'] is first['AC-1'] and second['AB-1'].price_native == 2.6
+    assert second['AB-1'] in token_pair_index[main_utils.token_pair_key('solana', 'A', 'B')]
+
+
+def test_searches_keep_a_scanner_per_scenario() -> None:
+    """A repeated search re-evaluates only the pools that moved since the previous request."""
+    fetcher = ReplayFetcher()
+    fetcher.update(market(2.0))
+    with replay_environment(fetcher, SimulatedClock()) as before_tick:
+        before_tick()
+        main_utils.process_arbitrage_data(None, 10000, 0.0005, 0.0003, search_address='A')
+        fetcher.update(market(2.6)[:1])
+        before_tick()
+        main_utils.process_arbitrage_data(None, 10000, 0.0005, 0.0003, search_address='A')
+        scanner = main_utils.scanner_for('A', 0.0005, 0.0003, 10000)
+        assert scanner.last_changed == 1
+        assert scanner is main_utils.scanner_for('A', 0.0005, 0.0003, 10000)
+        assert scanner is not main_utils.scanner_for('A', 0.001, 0.0003, 10000)
+
+
+def test_incremental_scan_matches_full_scan() -> None:
+    """Across polls, the incremental result equals a full scan of the pools it last evaluated."""
+    scanner = IncrementalScanner(threshold=0.001)
+    pairs = make_pairs(120, 15)
+    assert scanner.scan(pairs, 0.0005, 0.0003, 10000.0) == find_arbitrage_opportunities_indexed(pairs, 0.0005, 0.0003, 10000.0)
+
+    effective = {pair.pool_address: pair for pair in pairs}
+    for seed in range(5):
+        # Mostly sub-threshold noise plus a few large moves, and one pool leaving and one joining
+        pairs = move_prices(pairs, 0.5, 0.0005, seed)
+        pairs = move_prices(pairs, 0.05, 0.2, seed + 100)
+        pairs = pairs[1:] + make_pairs(1, 15, seed=seed + 200)
+        pairs[-1].pool_address = f'NEW{seed}'
+
+        result = scanner.scan(pairs, 0.0005, 0.0003, 10000.0)
+        # Sub-threshold moves keep the values the pool was last evaluated with
+        effective = {pair.pool_address: (effective[pair.pool_address]
+                                         if pair.pool_address in effective
+                                         and not pair_has_moved(effective[pair.pool_address], pair, 0.001)
+                                         else pair) for pair in pairs}
+        expected = find_arbitrage_opportunities_indexed(list(effective.values()), 0.0005, 0.0003, 10000.0)
+        assert result == expected
+        assert scanner.last_changed < len(pairs) // 4
+
+
+def test_incremental_scan_rescans_on_new_parameters() -> None:
+    """Changing the scenario falls back to a full scan."""
+    scanner = IncrementalScanner()
+    pairs = make_pairs(60, 10)
+    scanner.scan(pairs, 0.0005, 0.0003, 10000.0)
+    assert scanner.scan(pairs, 0.001, 0.0003, 5000.0) == find_arbitrage_opportunities_indexed(pairs, 0.001, 0.0003, 5000.0)
+    assert scanner.last_evaluated is None
@@ -0,0 +1,116 @@
+import json
+import logging
+import threading
+
+import utils.main_utils as main_utils
+from tests.test_replay import market
+from utils.main_utils import stream_log_handler
+from utils.replay import ReplayFetcher, SimulatedClock, replay_environment
+from utils.singleflight import SingleFlight
+from utils.streaming import format_event, replay_events, stream_events
+
+
+def parse_frames(frames) -> list:
+    """(event, data) for each server-sent event frame, skipping keepalive comments."""
+    events = []
+    for frame in frames:
+        if frame.startswith(':'):
+            continue
+        event_line, data_line = frame.strip().split('\n')
+        events.append((event_line[len('event: '):], json.loads(data_line[len('data: '):])))
+    return events
+
+
+def test_stream_yields_events_as_they_are_emitted() -> None:
+    """Each opportunity reaches the client before the run returns, followed by 'done'."""
+    assert stream_log_handler in logging.getLogger().handlers
+    release = threading.Event()
+
+    def run(emit=None):
+        emit('progress', {'stage': 'search'})
+        emit('opportunity', {'pair1': 'A/B', 'int_profit': 5.0})
+        release.wait(5)
+        logging.warning('Streamed log line')
+        emit('opportunity', {'pair1': 'B/C', 'int_profit': 7.0})
+        return ['first', 'second']
+
+    frames = stream_events(run, keepalive=0.05)
+    first = parse_frames([next(frames), next(frames)])
+    assert first == [('progress', {'stage': 'search'}), ('opportunity', {'pair1': 'A/B', 'int_profit': 5.0})]
+
+    # Nothing further is ready, so the stream keeps the connection alive
+    assert next(frames) == ': keepalive\n\n'
+    release.set()
+    events = parse_frames(frames)
+    assert any(event == 'log' and data.endswith('Streamed log line') for event, data in events)
+    assert events[-2:] == [('opportunity', {'pair1': 'B/C', 'int_profit': 7.0}), ('done', {'count': 2})]
+
+
+def test_stream_reports_failures() -> None:
+    """An exception in the run ends the stream with an 'error' event."""
+    def run(emit=None):
+        raise ValueError('upstream down')
+
+    assert parse_frames(stream_events(run))[-1] == ('error', {'error': 'upstream down'})
+
+
+def test_replay_events_for_cached_results() -> None:
+    """Precomputed results stream as opportunities followed by 'done'."""
+    events = parse_frames(replay_events([{'int_profit': 1}], snapshot_age=2.0))
+    assert events == [('opportunity', {'int_profit': 1}), ('done', {'snapshot_age': 2.0, 'count': 1})]
+    assert format_event('done', {'count': 0}) == 'event: done\ndata: {"count":0}\n\n'
+
+
+def test_identical_streams_share_one_run() -> None:
+    """A stream joining a running search gets every event of that run; it is not run again."""
+    release = threading.Event()
+    calls = []
+
+    def run(emit=None):
+        calls.append(emit)
+        emit('opportunity', {'int_profit': 5.0})
+        release.wait(5)
+        return ['first']
+
+    first = stream_events(run, key='search', keepalive=0.05)
+    assert parse_frames([next(first)]) == [('opportunity', {'int_profit': 5.0})]
+    second = stream_events(run, key='search', keepalive=0.05)
+    assert parse_frames([next(second)]) == [('opportunity', {'int_profit': 5.0})]
+    release.set()
+    assert parse_frames(first) == parse_frames(second) == [('done', {'count': 1})]
+    assert len(calls) == 1
+
+
+def test_stream_follows_an_unstreamed_run_of_the_same_search() -> None:
+    """When the single-flight group is already running the search, its results are streamed once it returns."""
+    group = SingleFlight()
+    started, release = threading.Event(), threading.Event()
+
+    def run(emit=None):
+        started.set()
+        release.wait(5)
+        return [{'int_profit': 5.0}]
+
+    runner = threading.Thread(target=group.do, args=('search', run))
+    runner.start()
+    started.wait(5)
+    frames = stream_events(run, key='search', group=group, keepalive=0.05)
+    assert next(frames) == ': keepalive\n\n'
+    release.set()
+    runner.join()
+    assert parse_frames(frames) == [('opportunity', {'int_profit': 5.0}), ('done', {'count': 1})]
+    assert group.stats()['shared'] == 1
+
+
+def test_opportunities_are_emitted_before_they_are_yielded() -> None:
+    """Each streamed opportunity event is out before the pipeline hands the opportunity on."""
+    fetcher = ReplayFetcher()
+    fetcher.update(market(2.6))
+    emitted = []
+    with replay_environment(fetcher, SimulatedClock()):
+        found = 0
+        for opportunity in main_utils.iter_arbitrage_data(None, 10000, 0.0005, 0.0003, search_address='A',
+                                                          emit=lambda event, data: emitted.append(data)):
+            assert emitted[-1] is opportunity
+            found += 1
+    assert found
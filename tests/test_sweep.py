@@ -0,0 +1,38 @@
+import utils.main_utils as main_utils
+from benchmarks.synthetic import synthetic_market
+from utils.replay import ReplayFetcher, SimulatedClock, replay_environment
+from utils.sweep import Scenario, process_arbitrage_sweep, scenario_grid
+
+SEARCH = 'TOKEN000001'
+
+
+def market_fetcher() -> ReplayFetcher:
+    fetcher = ReplayFetcher()
+    fetcher.update(synthetic_market(400, token_count=25, liquidity='uniform', spread=0.05, seed=11))
+    return fetcher
+
+
+def test_scenario_grid_is_the_cartesian_product() -> None:
+    grid = scenario_grid([1000, 10000], [0.0005], [0.0003, 0.003])
+    assert grid == [Scenario(1000.0, 0.0005, 0.0003), Scenario(1000.0, 0.0005, 0.003),
+                    Scenario(10000.0, 0.0005, 0.0003), Scenario(10000.0, 0.0005, 0.003)]
+
+
+def test_sweep_matches_single_searches_for_the_cost_of_about_one() -> None:
+    """Each scenario gets what its own search returns; the whole grid fetches about what one search does."""
+    grid = scenario_grid([1000, 10000, 100000], [0.0005, 0.005], [0.0003, 0.003])
+    expected, most_requests, total_requests = [], 0, 0
+    for scenario in grid:
+        fetcher = market_fetcher()
+        with replay_environment(fetcher, SimulatedClock()):
+            expected.append([o.to_dict() for o in main_utils.process_arbitrage_data(
+                None, *scenario, search_address=SEARCH, limit=0)])
+        most_requests = max(most_requests, fetcher.requests)
+        total_requests += fetcher.requests
+
+    fetcher = market_fetcher()
+    with replay_environment(fetcher, SimulatedClock()):
+        results = process_arbitrage_sweep(None, grid, search_address=SEARCH, limit=0)
+    assert [[o.to_dict() for o in found] for found in results] == expected
+    assert fetcher.requests < 2 * most_requests < total_requests
+    assert any(expected)
@@ -0,0 +1,123 @@
+from collections import namedtuple
+from itertools import permutations
+
+import numpy as np
+
+# A sized cycle: the token it starts and ends in, the pools in trade order, and the
+# profit-maximizing input with its profit (token units, then USD)
+CycleTrade = namedtuple('CycleTrade', 'start_token pools amount_in profit amount_in_usd profit_usd')
+
+
+def swap_output(amount_in, reserve_in, reserve_out, fee_rate=0.0, keep=1.0):
+    """
+    Output of selling `amount_in` into a constant-product (x·y=k) pool holding
+    `reserve_in` / `reserve_out`, with the fee taken from the input and `keep`
+    the share of the output left after slippage.
+
+    Works on floats and on numpy arrays alike.
+    """
+    amount_in_with_fee = amount_in * (1 - fee_rate)
+    return keep * reserve_out * amount_in_with_fee / (reserve_in + amount_in_with_fee)
+
+
+def route_coefficients(hops, fee_rate=0.0, keep=1.0):
+    """
+    (k, l, m) such that selling x through `hops`, a sequence of (reserve_in, reserve_out),
+    returns k·x / (l + m·x).
+
+    Each swap is a Möbius map of the same shape, so a route of any length folds
+    into three numbers.
+    """
+    gamma = 1 - fee_rate
+    k, l, m = 1.0, 1.0, 0.0
+    for reserve_in, reserve_out in hops:
+        k, l, m = keep * gamma * reserve_out * k, reserve_in * l, reserve_in * m + gamma * k
+    return k, l, m
+
+
+def route_output(amount_in, coefficients):
+    k, l, m = coefficients
+    return k * amount_in / (l + m * amount_in)
+
+
+def optimal_input(coefficients):
+    """
+    The input maximizing route_output(x) - x: sqrt(k·l) - l over m, or 0 when
+    even the first unit loses (k <= l).
+    """
+    k, l, m = coefficients
+    return np.maximum(np.sqrt(k * l) - l, 0.0) / m
+
+
+def optimal_trade(hops, fee_rate=0.0, keep=1.0):
+    """(amount_in, profit) of the best-sized trade through `hops`, in units of the input token."""
+    coefficients = route_coefficients(hops, fee_rate, keep)
+    amount_in = optimal_input(coefficients)
+    return amount_in, route_output(amount_in, coefficients) - amount_in
+
+
+def cycle_hops(pools, start_token):
+    """
+    The (reserve_in, reserve_out) of each swap taking `start_token` through `pools`
+    in order, or None when the pools do not chain back to `start_token`.
+    """
+    hops = []
+    token = start_token
+    for pool in pools:
+        if token == pool.base_token:
+            hops.append((pool.liquidity_base, pool.liquidity_quote))
+            token = pool.quote_token
+        elif token == pool.quote_token:
+            hops.append((pool.liquidity_quote, pool.liquidity_base))
+            token = pool.base_token
+        else:
+            return None
+    return hops if token == start_token else None
+
+
+def token_price_usd(pool, token):
+    """USD price of one of the pool's tokens, from the pool's base USD and native prices."""
+    if token == pool.base_token:
+        return pool.price_usd
+    return pool.price_usd / pool.price_native if pool.price_native else 0.0
+
+
+def best_cycle_trade(pools, fee_rate=0.0, keep=1.0):
+    """
+    The most profitable, in USD, best-sized trade around the cycle the pools form,
+    over every direction and starting token; None when they form no cycle.
+    """
+    best = None
+    # Rotations of a cycle are the same trades, so the first pool stays first
+    for rest in permutations(pools[1:]):
+        ordered = (pools[0],) + rest
+        for start_token in (ordered[0].base_token, ordered[0].quote_token):
+            trade = size_cycle(ordered, start_token, fee_rate, keep)
+            if trade is not None and (best is None or trade.profit_usd > best.profit_usd):
+                best = trade
+    return best
+
+
+def size_cycle(pools, start_token, fee_rate=0.0, keep=1.0):
+    """
+    The best-sized CycleTrade taking `start_token` through `pools` in order, or None
+    when they do not chain back to it or a reserve is empty.
+    """
+    hops = cycle_hops(pools, start_token)
+    if hops is None or any(reserve <= 0 for hop in hops for reserve in hop):
+        return None
+    amount_in, profit = optimal_trade(hops, fee_rate, keep)
+    price_usd = token_price_usd(pools[0], start_token)
+    return CycleTrade(start_token, list(pools), float(amount_in), float(profit),
+                      float(amount_in * price_usd), float(profit * price_usd))
+
+
+def cycle_profit_usd(trade, investment_usd, fee_rate=0.0, keep=1.0):
+    """USD profit of putting `investment_usd` through the route of a CycleTrade, swap by swap."""
+    price_usd = token_price_usd(trade.pools[0], trade.start_token)
+    if not price_usd:
+        return -investment_usd
+    amount = investment_usd / price_usd
+    for reserve_in, reserve_out in cycle_hops(trade.pools, trade.start_token):
+        amount = swap_output(amount, reserve_in, reserve_out, fee_rate, keep)
+    return amount * price_usd - investment_usd
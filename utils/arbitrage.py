@@ -0,0 +1,204 @@
+import logging
+from collections import defaultdict
+
+from src.models import ArbitrageOpportunity
+from utils.amm import optimal_trade, swap_output, token_price_usd
+from utils.metrics import metrics
+
+# Pools at or below this USD liquidity are never considered for a two-pool trade
+MIN_LIQUIDITY_USD = 10000
+
+# How the two pools of a candidate share a token, in the order they are tested
+SHARED_BASE = 0        # pair1 base == pair2 base
+BASE_IS_QUOTE = 1      # pair1 base == pair2 quote
+QUOTE_IS_BASE = 2      # pair1 quote == pair2 base
+
+
+def two_pool_hops(relation, liquidity_base1, liquidity_quote1, liquidity_base2, liquidity_quote2):
+    """
+    Constant-product reserves, as (reserve_in, reserve_out), of the two swaps of a
+    candidate: pair1's other token into the shared token on the entry pool, then
+    the shared token into pair2's other token on the exit pool. Taken from each
+    pool's own base and quote liquidity.
+    """
+    entry_hop = ((liquidity_base1, liquidity_quote1) if relation == QUOTE_IS_BASE
+                 else (liquidity_quote1, liquidity_base1))
+    exit_hop = ((liquidity_quote2, liquidity_base2) if relation == BASE_IS_QUOTE
+                else (liquidity_base2, liquidity_quote2))
+    return entry_hop, exit_hop
+
+
+def calculate_arbitrage_profit(investment_amount, entry_hop, exit_hop, slippage_rate, fee_rate, entry_usd, exit_usd):
+    """
+    Net USD profit of trading `investment_amount` USD through the two swaps, each
+    priced on the x·y=k curve of its pool with its fee, and `slippage_rate` taken
+    off what each swap returns. entry_usd and exit_usd are the USD prices of the
+    token going in and of the token coming out.
+    """
+    keep = 1 - slippage_rate
+
+    entry_position = swap_output(investment_amount / entry_usd, *entry_hop, fee_rate, keep)
+    final_amount = swap_output(entry_position, *exit_hop, fee_rate, keep)
+
+    return final_amount * exit_usd - investment_amount
+
+
+def optimal_arbitrage_trade(entry_hop, exit_hop, slippage_rate, fee_rate, entry_usd, exit_usd):
+    """
+    (optimal_input, achievable_profit) in USD of the candidate priced by
+    `calculate_arbitrage_profit`: the investment earning the most, and what it earns.
+    """
+    # Output scales with reserve_out, so this values what comes out in units of what goes in
+    reserve_in, reserve_out = exit_hop
+    amount_in, profit = optimal_trade((entry_hop, (reserve_in, reserve_out * exit_usd / entry_usd)),
+                                      fee_rate, 1 - slippage_rate)
+    return amount_in * entry_usd, profit * entry_usd
+
+
+def index_pairs_by_token(parsed_pairs):
+    """Map every token address to the positions of the pools holding it as base and as quote."""
+    by_base = defaultdict(list)
+    by_quote = defaultdict(list)
+    for position, pair in enumerate(parsed_pairs):
+        by_base[pair.base_token].append(position)
+        by_quote[pair.quote_token].append(position)
+    return by_base, by_quote
+
+
+def iter_candidate_positions(parsed_pairs, by_base, by_quote):
+    """
+    Yield (i, j) for every ordered couple of pairs sharing a token the way the
+    two-pool scan expects, in the same i-then-j order as a full nested loop.
+    """
+    for i, pair1 in enumerate(parsed_pairs):
+        candidates = set(by_base.get(pair1.base_token, ()))
+        candidates.update(by_quote.get(pair1.base_token, ()))
+        candidates.update(by_base.get(pair1.quote_token, ()))
+        candidates.discard(i)
+        for j in sorted(candidates):
+            yield i, j
+
+
+def iter_touching_positions(parsed_pairs, by_base, by_quote, positions):
+    """Yield each (i, j) candidate, in no particular order, where i or j is one of `positions`."""
+    seen = set()
+    for position in positions:
+        pair = parsed_pairs[position]
+        # The token-sharing test is the same set of lookups whichever side the pair is on
+        neighbours = set(by_base.get(pair.base_token, ()))
+        neighbours.update(by_quote.get(pair.base_token, ()))
+        neighbours.update(by_base.get(pair.quote_token, ()))
+        neighbours.discard(position)
+        for other in neighbours:
+            for couple in ((position, other), (other, position)):
+                if couple not in seen:
+                    seen.add(couple)
+                    yield couple
+
+
+def evaluate_candidate(pair1, pair2, slippage, fee_percentage, initial_investment):
+    """
+    Price a pair of liquid pools sharing a token.
+
+    Returns (price_diff, profit, base_liquidity, optimal_input, achievable_profit),
+    the last three in USD, when the trade is profitable, otherwise None.
+    """
+    if pair1.base_token == pair2.base_token:
+        relation = SHARED_BASE
+        pair1_price = pair1.price_native
+        pair2_price = pair2.price_native
+    elif pair1.base_token == pair2.quote_token:
+        relation = BASE_IS_QUOTE
+        pair1_price = pair1.price_native
+        pair2_price = 1 / pair2.price_native  # Invert price since we're comparing base to quote
+    else:
+        relation = QUOTE_IS_BASE
+        pair1_price = 1 / pair1.price_native  # Invert price since we're comparing quote to base
+        pair2_price = pair2.price_native
+
+    price_diff = pair2_price - pair1_price
+    if price_diff <= 0:
+        return None
+
+    # We use the liquidity of the token common in both pairs for base liquidity
+    if relation == SHARED_BASE:
+        base_liquidity = min(pair1.liquidity_base, pair2.liquidity_base)
+    elif relation == BASE_IS_QUOTE:
+        base_liquidity = min(pair1.liquidity_base, pair2.liquidity_quote)
+    else:
+        base_liquidity = min(pair1.liquidity_quote, pair2.liquidity_base)
+
+    # Valued in USD so all candidates rank with each other and with triangles; a round
+    # trip back to the token it started from is valued at one price
+    token_in = pair1.base_token if relation == QUOTE_IS_BASE else pair1.quote_token
+    token_out = pair2.base_token if relation == BASE_IS_QUOTE else pair2.quote_token
+    entry_usd = token_price_usd(pair1, token_in)
+    exit_usd = entry_usd if token_out == token_in else token_price_usd(pair2, token_out)
+    if entry_usd <= 0 or exit_usd <= 0:
+        return None
+    entry_hop, exit_hop = two_pool_hops(relation, pair1.liquidity_base, pair1.liquidity_quote,
+                                        pair2.liquidity_base, pair2.liquidity_quote)
+
+    profit = calculate_arbitrage_profit(initial_investment, entry_hop, exit_hop, slippage, fee_percentage,
+                                        entry_usd, exit_usd)
+    if profit <= 0:
+        return None
+    optimal_input, achievable_profit = optimal_arbitrage_trade(entry_hop, exit_hop, slippage, fee_percentage,
+                                                               entry_usd, exit_usd)
+    return price_diff, profit, base_liquidity, float(optimal_input), float(achievable_profit)
+
+
+def format_opportunity(pair1, pair2, price_diff, liquidity_diff, profit, base_liquidity,
+                       optimal_input=None, achievable_profit=None):
+    """The opportunity record for a profitable two-pool trade."""
+    return ArbitrageOpportunity(pair1, pair2, price_diff=price_diff, liquidity_diff=liquidity_diff,
+                                profit=profit, base_liquidity=base_liquidity,
+                                optimal_input=optimal_input, achievable_profit=achievable_profit)
+
+
+def opportunity_for(pair1, pair2, slippage, fee_percentage, initial_investment):
+    """The opportunity for two liquid pools, or None when it is not profitable."""
+    result = evaluate_candidate(pair1, pair2, slippage, fee_percentage, initial_investment)
+    if result is None:
+        return None
+    price_diff, profit, base_liquidity, optimal_input, achievable_profit = result
+    return format_opportunity(pair1, pair2, price_diff, pair1.liquidity_usd - pair2.liquidity_usd,
+                              profit, base_liquidity, optimal_input, achievable_profit)
+
+
+def liquid_pairs(token_pairs):
+    """
+    The pools that clear the liquidity floor and quote a price, keeping their
+    input order; a zero price_native could not be inverted.
+    """
+    return [pair for pair in token_pairs if pair.liquidity_usd > MIN_LIQUIDITY_USD and pair.price_native > 0]
+
+
+def iter_arbitrage_opportunities_indexed(token_pairs, slippage, fee_percentage, initial_investment):
+    """
+    Two-pool arbitrage scan that only visits pairs sharing a token, yielding
+    each opportunity as it is found.
+
+    Yields the same opportunities, in the same order, as comparing every
+    pair against every other pair.
+    """
+    parsed = liquid_pairs(token_pairs)
+    by_base, by_quote = index_pairs_by_token(parsed)
+
+    total_pairs_checked = 0
+    total_found = 0
+    for i, j in iter_candidate_positions(parsed, by_base, by_quote):
+        total_pairs_checked += 1
+        opportunity = opportunity_for(parsed[i], parsed[j], slippage, fee_percentage, initial_investment)
+        if opportunity is not None:
+            total_found += 1
+            yield opportunity
+
+    logging.info(f'Checked {total_pairs_checked} pair combinations. Found {total_found} arbitrage opportunities.')
+    metrics.inc('arbscreener_pair_combinations_total', total_pairs_checked, scan='indexed')
+    metrics.inc('arbscreener_opportunities_total', total_found, stage='pair_scan')
+
+
+def find_arbitrage_opportunities_indexed(token_pairs, slippage, fee_percentage, initial_investment):
+    """List form of `iter_arbitrage_opportunities_indexed`."""
+    return list(iter_arbitrage_opportunities_indexed(token_pairs, slippage, fee_percentage, initial_investment))
@@ -0,0 +1,117 @@
+import logging
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from itertools import repeat
+
+import utils.main_utils as main_utils
+from utils.metrics import metrics
+
+# Processes sharing the CPU-bound half of a batch, one per core by default; 1 runs everything in the calling process
+BATCH_MAX_WORKERS = int(os.getenv('BATCH_MAX_WORKERS') or os.cpu_count() or 1)
+# Most addresses accepted in one batch request
+BATCH_MAX_ADDRESSES = int(os.getenv('BATCH_MAX_ADDRESSES', 500))
+
+
+class InlineExecutor:
+    """Executor stand-in running map() in the calling process."""
+
+    def map(self, func, *iterables):
+        return map(func, *iterables)
+
+
+# Long-lived process pools by size, started on first use
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def process_pool(max_workers):
+    """
+    The shared pool of max_workers processes. Its processes are started by a
+    forkserver (spawned where there is none), never forked from this one, so
+    they do not inherit locks held by the poller, fetcher or stream threads.
+    """
+    with _pools_lock:
+        pool = _pools.get(max_workers)
+        if pool is None:
+            method = 'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+            pool = _pools[max_workers] = ProcessPoolExecutor(max_workers=max_workers,
+                                                             mp_context=multiprocessing.get_context(method))
+        return pool
+
+
+def shutdown_pools():
+    with _pools_lock:
+        pools = list(_pools.values())
+        _pools.clear()
+    for pool in pools:
+        pool.shutdown()
+
+
+@contextmanager
+def batch_executor(max_workers, tasks):
+    """The shared process pool of max_workers, or InlineExecutor when a pool would not pay for itself."""
+    if max_workers <= 1 or tasks <= 1:
+        yield InlineExecutor()
+        return
+    yield process_pool(max_workers)
+
+
+def scan_pools(pools, slippage, fee_percentage, initial_investment):
+    """Pair scan of one address's search results, run in a pool process."""
+    return main_utils.find_arbitrage_opportunities(pools, slippage, fee_percentage, initial_investment, None)
+
+
+def complete_top(arbitrage_opportunities, token_pair_index, initial_investment, slippage, fee_percentage, limit):
+    """Triangle completion and ranking of one address's candidates, run in a pool process."""
+    return main_utils.top_opportunities(
+        main_utils.complete_opportunities(arbitrage_opportunities, token_pair_index,
+                                          initial_investment, slippage, fee_percentage),
+        limit
+    )
+
+
+def process_arbitrage_batch(addresses, initial_investment, slippage, fee_percentage,
+                            limit=main_utils.RESULT_LIMIT, max_workers=None):
+    """
+    process_arbitrage_data for many search addresses at once, as {address: opportunities}
+    in input order.
+
+    Upstream lookups are made in the calling process. They are grouped by phase
+    (searches, token lookups, third-pair searches), and the union of each phase
+    is fetched once through the shared pair cache, so addresses that touch the
+    same pools share the fetch. The pair scans and triangle completions run on
+    a process pool of max_workers (BATCH_MAX_WORKERS by default), one task per address.
+    """
+    addresses = list(dict.fromkeys(address for address in addresses if address))
+    if not addresses:
+        return {}
+    if max_workers is None:
+        max_workers = BATCH_MAX_WORKERS
+
+    with metrics.timer('arbscreener_stage_duration_seconds', stage='batch'), \
+            batch_executor(max_workers, len(addresses)) as pool:
+        searches = main_utils.fetch_many_pairs(addresses)
+        pools = [main_utils.process_token_pairs(search) if search else [] for search in searches]
+        candidates = list(pool.map(scan_pools, pools, repeat(slippage), repeat(fee_percentage),
+                                   repeat(initial_investment)))
+
+        prepared = [main_utils.filter_and_process_opportunities(found) for found in candidates]
+        tokens = sorted({quote_pair[0] for quote_pairs, _ in prepared for quote_pair in quote_pairs})
+        main_utils.fetcher.map(main_utils.fetch_token_pairs, tokens)
+        # Served from the pair cache filled above
+        pair_addresses = [main_utils.matching_pair_addresses(found, quote_pairs, pair_chains) if found else []
+                          for found, (quote_pairs, pair_chains) in zip(candidates, prepared)]
+        main_utils.fetch_many_pairs(sorted(set().union(*pair_addresses)))
+        token_pair_indexes = [main_utils.fetch_or_use_cached_data(unique)[1] if unique else {}
+                              for unique in pair_addresses]
+
+        results = list(pool.map(complete_top, candidates, token_pair_indexes, repeat(initial_investment),
+                                repeat(slippage), repeat(fee_percentage), repeat(limit)))
+
+    logging.info(f'Batch of {len(addresses)} addresses: {len(tokens)} token lookups, '
+                 f'{len(set().union(*pair_addresses))} third-pair searches, '
+                 f'{sum(len(found) for found in results)} opportunities.')
+    return dict(zip(addresses, results))
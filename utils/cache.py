@@ -0,0 +1,349 @@
+import os
+import pickle
+import sqlite3
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+
+from utils.metrics import metrics
+
+PAIR_CACHE_TTL = float(os.getenv('PAIR_CACHE_TTL', 30))
+PAIR_CACHE_MAXSIZE = int(os.getenv('PAIR_CACHE_MAXSIZE', 2048))
+RESULT_CACHE_TTL = float(os.getenv('RESULT_CACHE_TTL', 15))
+CACHE_BACKEND = os.getenv('CACHE_BACKEND', 'memory')
+CACHE_SQLITE_PATH = os.getenv('CACHE_SQLITE_PATH', os.path.join(tempfile.gettempdir(), 'arbscreener-cache.sqlite3'))
+CACHE_REDIS_URL = os.getenv('CACHE_REDIS_URL', 'redis://localhost:6379/0')
+
+_MISSING = object()
+
+
+def record_lookup(namespace, hit):
+    metrics.inc('arbscreener_cache_requests_total', cache=namespace, result='hit' if hit else 'miss')
+
+
+class TTLCache:
+    """
+    Thread-safe, size-bounded LRU cache whose entries expire `ttl` seconds
+    after they were stored. Counts hits, misses, expirations and evictions.
+    """
+
+    def __init__(self, maxsize=PAIR_CACHE_MAXSIZE, ttl=PAIR_CACHE_TTL, clock=time.monotonic, namespace='pairs'):
+        self.namespace = namespace
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.clock = clock
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.expirations = 0
+        self.evictions = 0
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._entries.get(key, _MISSING)
+            if entry is _MISSING:
+                self.misses += 1
+                record_lookup(self.namespace, False)
+                return default
+            expires_at, value = entry
+            if expires_at <= self.clock():
+                del self._entries[key]
+                self.expirations += 1
+                self.misses += 1
+                record_lookup(self.namespace, False)
+                return default
+            self._entries.move_to_end(key)
+            self.hits += 1
+            record_lookup(self.namespace, True)
+            return value
+
+    def set(self, key, value, ttl=None):
+        ttl = self.ttl if ttl is None else ttl
+        with self._lock:
+            self._entries[key] = (self.clock() + ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self._entries),
+                'backend': 'memory',
+                'maxsize': self.maxsize,
+                'ttl': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'expirations': self.expirations,
+                'evictions': self.evictions,
+            }
+
+
+def cached(cache, key_func):
+    """
+    Decorator serving results from `cache` under key_func(*args, **kwargs).
+    None results (failed lookups) are never stored.
+    """
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            key = key_func(*args, **kwargs)
+            result = cache.get(key, _MISSING)
+            if result is not _MISSING:
+                return result
+            result = func(*args, **kwargs)
+            if result is not None:
+                cache.set(key, result)
+            return result
+        wrapper.cache = cache
+        return wrapper
+    return decorator
+
+
+
+def key_string(key):
+    """Flatten a cache key into the string form stored by the shared backends."""
+    if isinstance(key, tuple):
+        return ':'.join(str(part) for part in key)
+    return str(key)
+
+
+class SQLiteCache:
+    """
+    TTL cache in a SQLite file, shared by every process on the host.
+
+    Each thread (and each forked worker) opens its own connection. Values are
+    pickled; once the table outgrows `maxsize` the least recently read rows are
+    dropped. Hit/miss counters are kept per process.
+    """
+
+    def __init__(self, path=CACHE_SQLITE_PATH, namespace='pairs', maxsize=PAIR_CACHE_MAXSIZE, ttl=PAIR_CACHE_TTL):
+        self.path = path
+        self.namespace = namespace
+        self.table = f'cache_{namespace}'
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._local = threading.local()
+        self._counter_lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.expirations = 0
+        self.evictions = 0
+        self._sets = 0
+
+    def _connection(self):
+        connection = getattr(self._local, 'connection', None)
+        if connection is None or self._local.pid != os.getpid():
+            connection = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=NORMAL')
+            connection.execute(
+                f'CREATE TABLE IF NOT EXISTS {self.table} ('
+                'key TEXT PRIMARY KEY, value BLOB NOT NULL, expires_at REAL NOT NULL, accessed_at REAL NOT NULL)'
+            )
+            connection.execute(f'CREATE INDEX IF NOT EXISTS {self.table}_accessed ON {self.table} (accessed_at)')
+            self._local.connection = connection
+            self._local.pid = os.getpid()
+        return connection
+
+    def _count(self, **increments):
+        with self._counter_lock:
+            for name, amount in increments.items():
+                setattr(self, name, getattr(self, name) + amount)
+
+    def get(self, key, default=None):
+        key = key_string(key)
+        connection = self._connection()
+        row = connection.execute(f'SELECT value, expires_at FROM {self.table} WHERE key = ?', (key,)).fetchone()
+        now = time.time()
+        if row is None:
+            self._count(misses=1)
+            record_lookup(self.namespace, False)
+            return default
+        if row[1] <= now:
+            connection.execute(f'DELETE FROM {self.table} WHERE key = ? AND expires_at <= ?', (key, now))
+            self._count(misses=1, expirations=1)
+            record_lookup(self.namespace, False)
+            return default
+        connection.execute(f'UPDATE {self.table} SET accessed_at = ? WHERE key = ?', (now, key))
+        self._count(hits=1)
+        record_lookup(self.namespace, True)
+        return pickle.loads(row[0])
+
+    def set(self, key, value, ttl=None):
+        ttl = self.ttl if ttl is None else ttl
+        now = time.time()
+        connection = self._connection()
+        connection.execute(
+            f'INSERT OR REPLACE INTO {self.table} (key, value, expires_at, accessed_at) VALUES (?, ?, ?, ?)',
+            (key_string(key), sqlite3.Binary(pickle.dumps(value, pickle.HIGHEST_PROTOCOL)), now + ttl, now)
+        )
+        self._count(_sets=1)
+        # Trim periodically rather than on every write
+        if self._sets % 64 == 0:
+            self._trim(connection, now)
+
+    def _trim(self, connection, now):
+        connection.execute(f'DELETE FROM {self.table} WHERE expires_at <= ?', (now,))
+        overflow = connection.execute(f'SELECT COUNT(*) FROM {self.table}').fetchone()[0] - self.maxsize
+        if overflow > 0:
+            connection.execute(
+                f'DELETE FROM {self.table} WHERE key IN '
+                f'(SELECT key FROM {self.table} ORDER BY accessed_at LIMIT ?)', (overflow,)
+            )
+            self._count(evictions=overflow)
+
+    def delete(self, key):
+        self._connection().execute(f'DELETE FROM {self.table} WHERE key = ?', (key_string(key),))
+
+    def clear(self):
+        self._connection().execute(f'DELETE FROM {self.table}')
+
+    def __len__(self):
+        return self._connection().execute(f'SELECT COUNT(*) FROM {self.table}').fetchone()[0]
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            'backend': 'sqlite',
+            'size': len(self),
+            'maxsize': self.maxsize,
+            'ttl': self.ttl,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+            'expirations': self.expirations,
+            'evictions': self.evictions,
+        }
+
+
+class RedisCache:
+    """
+    TTL cache on any Redis-protocol server (Redis, Valkey, KeyDB, ...).
+
+    Expiry uses the server's own key TTLs. Keys are also ranked by last read
+    in a sorted set, and once it outgrows `maxsize` the least recently read
+    keys are deleted, as SQLiteCache does; a server-wide `maxmemory-policy`
+    of allkeys-lru remains the backstop. Hit/miss counters are kept per process.
+    """
+
+    def __init__(self, url=CACHE_REDIS_URL, namespace='pairs', maxsize=PAIR_CACHE_MAXSIZE, ttl=PAIR_CACHE_TTL,
+                 client=None):
+        if client is None:
+            import redis  # Only needed when this backend is selected
+
+            client = redis.Redis.from_url(url)
+        self.client = client
+        self.namespace = namespace
+        self.prefix = f'arbscreener:{namespace}:'
+        # Sorted set of this namespace's keys scored by their last access
+        self.index = f'arbscreener-index:{namespace}'
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._counter_lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._sets = 0
+
+    def get(self, key, default=None):
+        key = self.prefix + key_string(key)
+        pipeline = self.client.pipeline(transaction=False)
+        pipeline.get(key)
+        pipeline.zadd(self.index, {key: time.time()}, xx=True)
+        value = pipeline.execute()[0]
+        with self._counter_lock:
+            if value is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        record_lookup(self.namespace, value is not None)
+        return default if value is None else pickle.loads(value)
+
+    def set(self, key, value, ttl=None):
+        ttl = self.ttl if ttl is None else ttl
+        key = self.prefix + key_string(key)
+        pipeline = self.client.pipeline(transaction=False)
+        pipeline.set(key, pickle.dumps(value, pickle.HIGHEST_PROTOCOL), px=max(int(ttl * 1000), 1))
+        pipeline.zadd(self.index, {key: time.time()})
+        pipeline.execute()
+        with self._counter_lock:
+            self._sets += 1
+            trim = self._sets % 64 == 0
+        # Trim periodically rather than on every write
+        if trim:
+            self._trim()
+
+    def _trim(self):
+        overflow = self.client.zcard(self.index) - self.maxsize
+        if overflow <= 0:
+            return
+        # Expired keys linger in the index until they are the least recently read
+        keys = self.client.zrange(self.index, 0, overflow - 1)
+        if keys:
+            self.client.delete(*keys)
+            self.client.zrem(self.index, *keys)
+            with self._counter_lock:
+                self.evictions += len(keys)
+
+    def delete(self, key):
+        key = self.prefix + key_string(key)
+        self.client.delete(key)
+        self.client.zrem(self.index, key)
+
+    def clear(self):
+        keys = list(self.client.scan_iter(match=self.prefix + '*'))
+        if keys:
+            self.client.delete(*keys)
+        self.client.delete(self.index)
+
+    def __len__(self):
+        return self.client.zcard(self.index)
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            'backend': 'redis',
+            'size': len(self),
+            'maxsize': self.maxsize,
+            'ttl': self.ttl,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+            'evictions': self.evictions,
+        }
+
+
+def make_cache(namespace, backend=None, maxsize=PAIR_CACHE_MAXSIZE, ttl=PAIR_CACHE_TTL):
+    """
+    Build the cache for a namespace on the configured backend.
+
+    CACHE_BACKEND selects 'memory' (per process, the default), 'sqlite'
+    (CACHE_SQLITE_PATH, shared by processes on one host) or 'redis'
+    (CACHE_REDIS_URL).
+    """
+    backend = backend or CACHE_BACKEND
+    if backend == 'memory':
+        return TTLCache(maxsize=maxsize, ttl=ttl, namespace=namespace)
+    if backend == 'sqlite':
+        return SQLiteCache(namespace=namespace, maxsize=maxsize, ttl=ttl)
+    if backend == 'redis':
+        return RedisCache(namespace=namespace, maxsize=maxsize, ttl=ttl)
+    raise ValueError(f'Unknown CACHE_BACKEND: {backend}')
@@ -0,0 +1,131 @@
+import contextvars
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+
+# Lowest level of the records kept for clients
+CLIENT_LOG_LEVEL = os.getenv('CLIENT_LOG_LEVEL', 'INFO').upper()
+# Messages kept per channel; older ones are overwritten
+CLIENT_LOG_BUFFER = int(os.getenv('CLIENT_LOG_BUFFER', 500))
+# Channels kept per process, least recently read dropped first
+CLIENT_LOG_CHANNELS = int(os.getenv('CLIENT_LOG_CHANNELS', 256))
+# A channel nobody has read for this many seconds stops recording, so its records are never formatted
+CLIENT_LOG_IDLE = float(os.getenv('CLIENT_LOG_IDLE', 300))
+
+# Channel of the records not logged inside a client's run (poller, startup, ...)
+SHARED_CHANNEL = 'shared'
+MAX_CHANNEL_NAME = 64
+
+# The channel of the client whose run is executing on this thread (and the fetch threads it fans out to)
+current_log_channel = contextvars.ContextVar('current_log_channel', default=None)
+
+
+class LogChannel:
+    """Ring buffer of formatted messages, each numbered with an increasing sequence number."""
+
+    def __init__(self, maxlen=CLIENT_LOG_BUFFER, clock=time.monotonic):
+        self._entries = deque(maxlen=maxlen)
+        self._lock = threading.Lock()
+        self._next_sequence = 0
+        self.clock = clock
+        self.last_read = clock()
+
+    def append(self, message):
+        with self._lock:
+            self._entries.append((self._next_sequence, message))
+            self._next_sequence += 1
+
+    def listening(self, idle=CLIENT_LOG_IDLE):
+        return self.clock() - self.last_read < idle
+
+    def read(self, after=-1):
+        """
+        Messages numbered above `after`, without removing them: {'logs', 'cursor', 'missed'}.
+        Pass the returned cursor as `after` next time; `missed` counts messages
+        overwritten before this reader got to them.
+        """
+        with self._lock:
+            self.last_read = self.clock()
+            oldest = self._entries[0][0] if self._entries else self._next_sequence
+            logs = [message for sequence, message in self._entries if sequence > after]
+            return {
+                'logs': logs,
+                'cursor': self._next_sequence - 1,
+                'missed': max(0, oldest - after - 1),
+            }
+
+
+class ClientLogChannels(logging.Handler):
+    """
+    Log records for clients, routed to the channel of the run that logged them
+    (see `scope`) or to the shared channel, and read with sequence cursors so
+    any number of readers can follow a channel.
+
+    Records for a channel nobody is reading are dropped before any filter or
+    formatting runs.
+    """
+
+    def __init__(self, level=CLIENT_LOG_LEVEL, buffer_size=CLIENT_LOG_BUFFER, max_channels=CLIENT_LOG_CHANNELS,
+                 idle=CLIENT_LOG_IDLE, clock=time.monotonic):
+        super().__init__(level=level)
+        self.buffer_size = buffer_size
+        self.max_channels = max_channels
+        self.idle = idle
+        self.clock = clock
+        self._channels = OrderedDict()
+        self._channels_lock = threading.Lock()
+
+    def channel(self, name):
+        """The channel called `name`, created if needed; the least recently used one goes past max_channels."""
+        with self._channels_lock:
+            channel = self._channels.get(name)
+            if channel is None:
+                channel = self._channels[name] = LogChannel(self.buffer_size, self.clock)
+                while len(self._channels) > self.max_channels:
+                    self._channels.popitem(last=False)
+            self._channels.move_to_end(name)
+            return channel
+
+    def _target(self, record):
+        channel = self._channels.get(current_log_channel.get() or SHARED_CHANNEL)
+        if channel is None or not channel.listening(self.idle):
+            return None
+        return channel
+
+    def handle(self, record):
+        # Checked ahead of the filters, which already pay for getMessage()
+        if self._target(record) is None:
+            return False
+        return super().handle(record)
+
+    def emit(self, record):
+        channel = self._target(record)
+        if channel is None:
+            return
+        try:
+            channel.append(self.format(record))
+        except Exception:
+            self.handleError(record)
+
+    def read(self, name=SHARED_CHANNEL, after=-1):
+        return self.channel(name).read(after)
+
+    @contextmanager
+    def scope(self, name):
+        """Route the records logged inside the block (and the threads it fans out to) to channel `name`."""
+        if not name:
+            yield
+            return
+        self.channel(name)
+        token = current_log_channel.set(name)
+        try:
+            yield
+        finally:
+            current_log_channel.reset(token)
+
+
+def valid_channel_name(name):
+    return bool(name) and len(name) <= MAX_CHANNEL_NAME and all(c.isalnum() or c in '-_' for c in name)
@@ -0,0 +1,85 @@
+import contextvars
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Iterable, List, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+from dexscreener.models import TokenPair
+
+from utils.metrics import metrics
+
+DEXSCREENER_URL = os.getenv('DEXSCREENER_URL', 'https://api.dexscreener.com/latest')
+FETCH_MAX_WORKERS = int(os.getenv('FETCH_MAX_WORKERS', 8))
+FETCH_TIMEOUT = float(os.getenv('FETCH_TIMEOUT', 10))
+
+
+class DexscreenerFetcher:
+    """
+    Dexscreener lookups over one pooled HTTP session, fanned out on a bounded
+    thread pool. `before_request` is called ahead of every upstream request,
+    which is where callers plug in their request budget.
+    """
+
+    def __init__(self, base_url: str = DEXSCREENER_URL, max_workers: int = FETCH_MAX_WORKERS,
+                 timeout: float = FETCH_TIMEOUT, before_request: Optional[Callable[[], None]] = None) -> None:
+        self.base_url = base_url.rstrip('/')
+        self.max_workers = max_workers
+        self.timeout = timeout
+        self.before_request = before_request
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=2, pool_maxsize=max_workers)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+        self._executor = None
+        self._executor_lock = threading.Lock()
+
+    @property
+    def executor(self) -> ThreadPoolExecutor:
+        # Created on first use so the pool threads belong to the process that uses them
+        if self._executor is None:
+            with self._executor_lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(max_workers=self.max_workers,
+                                                        thread_name_prefix='dexscreener-fetch')
+        return self._executor
+
+    def _get_pairs(self, path: str, params: Optional[dict] = None) -> List[TokenPair]:
+        if self.before_request is not None:
+            self.before_request()
+        endpoint = path.split('/')[1]  # 'search' or 'tokens', without the address
+        try:
+            with metrics.timer('arbscreener_upstream_request_duration_seconds', endpoint=endpoint):
+                response = self.session.get(f"{self.base_url}/{path}", params=params, timeout=self.timeout)
+        except requests.RequestException:
+            metrics.inc('arbscreener_upstream_requests_total', endpoint=endpoint, status='error')
+            raise
+        metrics.inc('arbscreener_upstream_requests_total', endpoint=endpoint, status=str(response.status_code))
+        response.raise_for_status()
+        return [TokenPair(**pair) for pair in response.json().get('pairs') or []]
+
+    def search_pairs(self, search_query: str) -> List[TokenPair]:
+        """Same lookup as `DexscreenerClient.search_pairs`."""
+        return self._get_pairs('dex/search', params={'q': search_query})
+
+    def get_token_pairs(self, address: str) -> List[TokenPair]:
+        """Same lookup as `DexscreenerClient.get_token_pairs`."""
+        return self._get_pairs(f'dex/tokens/{address}')
+
+    def map(self, func: Callable, items: Iterable) -> list:
+        """
+        Run func over items on the fetch pool, returning results in input order.
+        Each call runs in a copy of the caller's context (e.g. its rate-limit priority).
+        """
+        items = list(items)
+        if len(items) <= 1:
+            return [func(item) for item in items]
+        futures = [self.executor.submit(contextvars.copy_context().run, func, item) for item in items]
+        return [future.result() for future in futures]
+
+    def close(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+        self.session.close()
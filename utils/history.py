@@ -0,0 +1,191 @@
+import atexit
+import itertools
+import logging
+import os
+import threading
+import time
+from datetime import datetime, timezone
+
+# Root directory of the Parquet pool history; unset disables recording
+HISTORY_PATH = os.getenv('HISTORY_PATH')
+# Buffered rows are written out once this many are pending, or FLUSH_INTERVAL seconds after the last write
+HISTORY_FLUSH_ROWS = int(os.getenv('HISTORY_FLUSH_ROWS', 5000))
+HISTORY_FLUSH_INTERVAL = float(os.getenv('HISTORY_FLUSH_INTERVAL', 60))
+
+HISTORY_COLUMNS = (
+    'fetched_at', 'chain_id', 'dex_id', 'pool_address', 'base_token', 'quote_token',
+    'price_native', 'price_usd', 'liquidity_usd', 'liquidity_base', 'liquidity_quote',
+)
+
+
+def file_schema():
+    """Columns stored in each Parquet file; chain_id and date come from the directory names."""
+    import pyarrow as pa  # Only needed when history is recorded or read
+
+    return pa.schema([
+        ('fetched_at', pa.timestamp('ms', tz='UTC')),
+        ('dex_id', pa.string()),
+        ('pool_address', pa.string()),
+        ('base_token', pa.string()),
+        ('quote_token', pa.string()),
+        ('price_native', pa.float64()),
+        ('price_usd', pa.float64()),
+        ('liquidity_usd', pa.float64()),
+        ('liquidity_base', pa.float64()),
+        ('liquidity_quote', pa.float64()),
+    ])
+
+
+def partition_schema():
+    import pyarrow as pa
+
+    return pa.schema([('chain_id', pa.string()), ('date', pa.string())])
+
+
+def dataset_schema():
+    import pyarrow as pa
+
+    return pa.unify_schemas([file_schema(), partition_schema()])
+
+
+def utc_day(seconds):
+    return datetime.fromtimestamp(seconds, tz=timezone.utc).strftime('%Y-%m-%d')
+
+
+def partition_dir(root, chain_id, fetched_at):
+    """Hive-style directory holding a chain's snapshots for the UTC day of `fetched_at`."""
+    return os.path.join(root, f'chain_id={chain_id}', f'date={utc_day(fetched_at)}')
+
+
+class PoolHistoryStore:
+    """
+    Append-only Parquet history of every pool snapshot fetched, partitioned by
+    chain and UTC date (root/chain_id=solana/date=2025-01-31/part-*.parquet).
+
+    Rows are buffered and written as new files, never rewritten, so several
+    workers can record into the same root. Reads go through pyarrow.dataset
+    with memory-mapped files and prune partitions by chain and date.
+    """
+
+    def __init__(self, root=HISTORY_PATH, flush_rows=HISTORY_FLUSH_ROWS, flush_interval=HISTORY_FLUSH_INTERVAL,
+                 clock=time.time):
+        self.root = root
+        self.flush_rows = flush_rows
+        self.flush_interval = flush_interval
+        self.clock = clock
+        self._lock = threading.Lock()
+        self._rows = []
+        self._last_flush = clock()
+        self._sequence = itertools.count()
+        self.rows_written = 0
+        self.files_written = 0
+
+    def append(self, pools, fetched_at=None):
+        """Buffer one fetch's LiquidityPool records, all stamped with the same fetch time."""
+        fetched_at = self.clock() if fetched_at is None else fetched_at
+        rows = [(fetched_at, pool.chain_id, pool.dex_id, pool.pool_address, pool.base_token, pool.quote_token,
+                 pool.price_native, pool.price_usd, pool.liquidity_usd, pool.liquidity_base, pool.liquidity_quote)
+                for pool in pools]
+        with self._lock:
+            self._rows.extend(rows)
+            due = (len(self._rows) >= self.flush_rows
+                   or self.clock() - self._last_flush >= self.flush_interval)
+        if due:
+            self.flush()
+
+    def flush(self):
+        """Write the buffered rows as one Parquet file per (chain, date) partition."""
+        with self._lock:
+            rows, self._rows = self._rows, []
+            self._last_flush = self.clock()
+        if not rows:
+            return
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        schema = file_schema()
+        partitions = {}
+        for row in rows:
+            partitions.setdefault(partition_dir(self.root, row[1], row[0]), []).append(row)
+        for directory, partition_rows in partitions.items():
+            columns = list(zip(*partition_rows))
+            arrays = [pa.array([int(t * 1000) for t in columns[0]], type=schema.field('fetched_at').type)]
+            arrays += [pa.array(values, type=field.type) for values, field in zip(columns[2:], list(schema)[1:])]
+            os.makedirs(directory, exist_ok=True)
+            name = f'part-{int(time.time() * 1000)}-{os.getpid()}-{next(self._sequence)}.parquet'
+            # Written under a dot-prefixed name first, which dataset discovery skips, so readers never see a partial file
+            pq.write_table(pa.Table.from_arrays(arrays, schema=schema), os.path.join(directory, '.' + name),
+                           compression='zstd')
+            os.replace(os.path.join(directory, '.' + name), os.path.join(directory, name))
+            self.rows_written += len(partition_rows)
+            self.files_written += 1
+        logging.debug(f'Wrote {len(rows)} pool snapshots to {self.root}')
+
+    def dataset(self):
+        """The whole history as a memory-mapped pyarrow dataset."""
+        import pyarrow.dataset as ds
+        from pyarrow import fs
+
+        return ds.dataset(self.root, format='parquet', filesystem=fs.LocalFileSystem(use_mmap=True),
+                          schema=dataset_schema(),
+                          partitioning=ds.partitioning(partition_schema(), flavor='hive'))
+
+    def scan(self, chain_id=None, start=None, end=None, columns=None):
+        """
+        A pyarrow Table of the snapshots on `chain_id` fetched between `start`
+        and `end` (unix seconds, inclusive), ordered by fetch time.
+        """
+        import pyarrow as pa
+        import pyarrow.dataset as ds
+
+        columns = list(columns or HISTORY_COLUMNS)
+        if not os.path.isdir(self.root):
+            schema = dataset_schema()
+            return pa.schema([schema.field(name) for name in columns]).empty_table()
+
+        # The chain and date conditions prune whole directories before any file is opened
+        conditions = []
+        if chain_id is not None:
+            conditions.append(ds.field('chain_id') == chain_id)
+        if start is not None:
+            conditions.append(ds.field('date') >= utc_day(start))
+            conditions.append(ds.field('fetched_at') >= _timestamp(start))
+        if end is not None:
+            conditions.append(ds.field('date') <= utc_day(end))
+            conditions.append(ds.field('fetched_at') <= _timestamp(end))
+        expression = None
+        for condition in conditions:
+            expression = condition if expression is None else expression & condition
+
+        table = self.dataset().to_table(columns=columns, filter=expression)
+        if 'fetched_at' in columns:
+            table = table.sort_by('fetched_at')
+        return table
+
+    def stats(self):
+        return {
+            'path': self.root,
+            'pending_rows': len(self._rows),
+            'rows_written': self.rows_written,
+            'files_written': self.files_written,
+        }
+
+
+def _timestamp(seconds):
+    import pyarrow as pa
+
+    return pa.scalar(int(seconds * 1000), type=pa.timestamp('ms', tz='UTC'))
+
+
+def make_history_store(root=HISTORY_PATH):
+    """The recording store when HISTORY_PATH is set and pyarrow is installed, otherwise None."""
+    if not root:
+        return None
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        logging.warning('HISTORY_PATH is set but pyarrow is not installed; pool history is not recorded')
+        return None
+    store = PoolHistoryStore(root)
+    atexit.register(store.flush)
+    return store
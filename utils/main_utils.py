@@ -1,23 +1,26 @@
-from flask_sqlalchemy import SQLAlchemy
-from flask_login import UserMixin
 from collections import Counter, defaultdict
-from sqlalchemy.orm import sessionmaker
-from utils.models import Contracts, User, Purchase  # Ensure these are correctly imported
-from dexscreener import DexscreenerClient
+from utils.amm import best_cycle_trade, cycle_profit_usd, size_cycle
+from utils.arbitrage import iter_arbitrage_opportunities_indexed
+from utils.vectorized import iter_arbitrage_opportunities_vectorized
+from src.controllers import ArbitrageController
+from src.models import ArbitrageOpportunity, LiquidityPool
+from utils.fetcher import DexscreenerFetcher
+from utils.cache import TTLCache, cached, make_cache
+from utils.rate_limiter import TokenBucket
+from utils.singleflight import SingleFlight, single_flight
+from utils.snapshot_store import IncrementalScanner, PoolSnapshotStore
+from utils.history import make_history_store
+from utils.persistence import PERSIST_TABLES, make_pool_repository
+from utils.metrics import metrics
+import heapq
+import os
 import time
-from functools import wraps, lru_cache
-from typing import Union, List, Dict
+from typing import Union, List
 import random
 import requests
-from flask import Flask, current_app
-
-client = DexscreenerClient()
 
 api_call_counter = Counter()
 
-requests_this_minute = 0
-last_reset_time = 0
-
 
 def safe_get(obj, attr, default=None):
     """Helper function to safely access an attribute or return a default value."""
@@ -47,44 +50,64 @@ def retry_with_backoff(func, max_retries=3, initial_delay=1, backoff_factor=2):
     return wrapper
 
 
-@retry_with_backoff
-def rate_limited(max_calls_per_minute):
-    def decorator(func):
-        def wrapper(*args, **kwargs):
-            global requests_this_minute, last_reset_time
-            current_time = time.time()
-            
-            # Reset counter if a minute has passed
-            if current_time - last_reset_time >= 60:
-                requests_this_minute = 0
-                last_reset_time = current_time
-            
-            # Increment counter and check limit
-            requests_this_minute += 1
-            if requests_this_minute > max_calls_per_minute:
-                # If limit is exceeded, wait until the next minute
-                sleep_time = 60 - (current_time - last_reset_time)
-                time.sleep(sleep_time)
-                requests_this_minute = 1
-                last_reset_time = time.time()
-            
-            return func(*args, **kwargs)
-        return wrapper
-    return decorator
+# Token bucket every upstream Dexscreener request draws from; see RATE_LIMIT_* settings
+upstream_limiter = TokenBucket.from_env()
+
+# One pooled session for every Dexscreener lookup; each upstream request spends the shared budget
+fetcher = DexscreenerFetcher(before_request=upstream_limiter)
+
+# Upstream pair lookups, keyed by query; see PAIR_CACHE_TTL / PAIR_CACHE_MAXSIZE and CACHE_BACKEND
+pair_cache = make_cache('pairs')
+# Concurrent identical lookups and searches share one execution
+inflight = SingleFlight()
+# Last-seen price and liquidity of every third-pair pool; see PRICE_CHANGE_THRESHOLD
+pool_snapshots = PoolSnapshotStore()
+# IncrementalScanner per (search address, scenario) for requests that bring none, see scanner_for
+SCANNER_CACHE_MAXSIZE = int(os.getenv('SCANNER_CACHE_MAXSIZE', 256))
+SCANNER_CACHE_TTL = float(os.getenv('SCANNER_CACHE_TTL', 600))
+search_scanners = TTLCache(maxsize=SCANNER_CACHE_MAXSIZE, ttl=SCANNER_CACHE_TTL, namespace='scanners')
+# Parquet history of every upstream fetch when HISTORY_PATH is set, see utils.history
+history = make_history_store()
+# Latest price per pool in the contracts and lake tables when DATABASE_URL is set, see utils.persistence
+pool_repository = make_pool_repository()
+
+def persist_pools(pools):
+    """Upsert one fetch's pools into PERSIST_TABLES in one transaction; a database error never fails the scan."""
+    if pool_repository is None or not pools:
+        return
+    try:
+        pool_repository.upsert_pools(pools, PERSIST_TABLES)
+    except Exception as e:
+        pool_repository.failures += 1
+        logging.warning(f'Could not persist {len(pools)} pools: {e}')
+
+def record_history(dex_pairs):
+    if history is not None and dex_pairs:
+        history.append(process_token_pairs(dex_pairs))
+
+def search_query_for(contract):
+    if isinstance(contract, list):
+        return ", ".join(contract)
+    return contract
 
 @retry_with_backoff
-@rate_limited(60)  # Adjust rate limiting as needed
+def search_pairs_with_retry(search_query):
+    return fetcher.search_pairs(search_query)
+
+@cached(pair_cache, lambda contract: ('search', search_query_for(contract)))
+@single_flight(inflight, lambda contract: ('search', search_query_for(contract)))
 def fetch_and_cache_pairs(contract: Union[str, List[str]]):
     """
     Fetch pairs with rate limiting, caching, and address checking.
     """
-    if isinstance(contract, list):
-        search_query = ", ".join(contract)
-    else:
-        search_query = contract
+    search_query = search_query_for(contract)
 
     try:
-        search_results = client.search_pairs(search_query)
+        with metrics.timer('arbscreener_fetch_duration_seconds', operation='search'):
+            search_results = search_pairs_with_retry(search_query)
+        if search_results is None:
+            metrics.inc('arbscreener_fetch_errors_total', operation='search')
+        record_history(search_results)
         if search_results:
             for pair in search_results:
                 contract_address = pair.pair_address      
@@ -92,437 +115,346 @@ def fetch_and_cache_pairs(contract: Union[str, List[str]]):
             return search_results
     except Exception as e:
         # Removed logging to database
+        metrics.inc('arbscreener_fetch_errors_total', operation='search')
         return None
-    
-def process_token_pairs(dex_pairs):
-    formatted_pairs = []
-    for pair in dex_pairs:        
-        liquidity_data = safe_get(pair, 'liquidity', {})
-        
-        formatted_pairs.append({
-            'pair': safe_get(pair.base_token, 'name', 'N/A') + '/' + safe_get(pair.quote_token, 'name', 'N/A'),
-            'pool_address': safe_get(pair, 'pair_address', 'N/A'),
-            'pool_url': safe_get(pair, 'url', 'N/A'),
-            'price_usd': safe_get(pair, 'price_usd', 0.0),
-            'price_native': safe_get(pair, 'price_native', 0.0),
-            'liquidity_usd': safe_get(liquidity_data, 'usd', 0.0),
-            'liquidity_base': safe_get(liquidity_data, 'base', 0.0),
-            'liquidity_quote': safe_get(liquidity_data, 'quote', 0.0),
-            'baseToken_address': safe_get(pair.base_token, 'address', 'N/A'),
-            'quoteToken_address': safe_get(pair.quote_token, 'address', 'N/A'),
-            'chain_id': safe_get(pair, 'chain_id', 'N/A'),
-            'dex_id': safe_get(pair, 'dex_id', 'N/A'),
-            'baseToken_name': safe_get(pair.base_token, 'name', 'N/A'),
-            'quoteToken_name': safe_get(pair.quote_token, 'name', 'N/A')
-        })
-    return formatted_pairs
-
-def calculate_arbitrage_profit(
-    investment_amount,
-    entry_price,
-    exit_price,
-    slippage_rate,
-    fee_rate,
-    entry_liquidity,
-    exit_liquidity
-):
-    # Convert investment to entry position
-    entry_position = investment_amount / entry_price
-    
-    def apply_slippage(position_size, liquidity_pool, slippage_rate):
-        return position_size * (1 - slippage_rate * (position_size / float(liquidity_pool)))
 
-    adjusted_entry = apply_slippage(entry_position, entry_liquidity, slippage_rate)
-    exit_value = adjusted_entry * exit_price
-    final_amount = apply_slippage(exit_value, exit_liquidity, slippage_rate)
-    
-    # Calculate total transaction fees
-    total_fees = investment_amount * fee_rate * 2  # Two trades
-    
-    # Calculate net profit
-    net_profit = final_amount - investment_amount - total_fees
+def fetch_many_pairs(contracts):
+    """fetch_and_cache_pairs for several contracts at once, results in input order."""
+    return fetcher.map(fetch_and_cache_pairs, contracts)
+
+@cached(pair_cache, lambda address: ('tokens', address))
+@single_flight(inflight, lambda address: ('tokens', address))
+def fetch_token_pairs(address):
+    """All pairs trading a token, or None if the lookup fails."""
+    try:
+        with metrics.timer('arbscreener_fetch_duration_seconds', operation='token_pairs'):
+            token_pairs = fetcher.get_token_pairs(address)
+        record_history(token_pairs)
+        return token_pairs
+    except Exception as e:
+        metrics.inc('arbscreener_fetch_errors_total', operation='token_pairs')
+        logging.warning(f'Token pair lookup failed for {address}: {e}')
+        return None
     
-    return net_profit
+def pool_from_pair(pair):
+    """The LiquidityPool record of a Dexscreener TokenPair, numbers parsed once."""
+    liquidity_data = safe_get(pair, 'liquidity', {})
+    base_name = safe_get(pair.base_token, 'name', 'N/A')
+    quote_name = safe_get(pair.quote_token, 'name', 'N/A')
+    return LiquidityPool(
+        base_token=safe_get(pair.base_token, 'address', 'N/A'),
+        quote_token=safe_get(pair.quote_token, 'address', 'N/A'),
+        price_native=float(safe_get(pair, 'price_native', 0.0) or 0.0),
+        pool_address=safe_get(pair, 'pair_address', 'N/A'),
+        name=f"{base_name}/{quote_name}",
+        url=safe_get(pair, 'url', 'N/A'),
+        price_usd=float(safe_get(pair, 'price_usd', 0.0) or 0.0),
+        liquidity_usd=float(safe_get(liquidity_data, 'usd', 0.0) or 0.0),
+        liquidity_base=float(safe_get(liquidity_data, 'base', 0.0) or 0.0),
+        liquidity_quote=float(safe_get(liquidity_data, 'quote', 0.0) or 0.0),
+        chain_id=safe_get(pair, 'chain_id', 'N/A'),
+        dex_id=safe_get(pair, 'dex_id', 'N/A'),
+        base_name=base_name,
+        quote_name=quote_name,
+    )
+
+def process_token_pairs(dex_pairs):
+    return [pool_from_pair(pair) for pair in dex_pairs]
 
 import logging
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
-def find_arbitrage_opportunities(token_pairs, slippage, fee_percentage, initial_investment, user_purchases):
-    # logging.info('Starting arbitrage opportunity detection')
-    arbitrage_opportunities = []
-    total_pairs_checked = 0
-    
-    for i, pair1 in enumerate(token_pairs):
-        for j, pair2 in enumerate(token_pairs):
-            if i != j:  # Ensure pairs are different
-                total_pairs_checked += 1
-                # Check if pairs share a common token
-                if (pair1['baseToken_address'] == pair2['baseToken_address'] or 
-                    pair1['baseToken_address'] == pair2['quoteToken_address'] or 
-                    pair1['quoteToken_address'] == pair2['baseToken_address']):
-                    
-                    logging.debug(f'Checking pair combination: {pair1["pair"]} and {pair2["pair"]}')
-                    
-                    # Determine price for comparison based on token matching
-                    if pair1['baseToken_address'] == pair2['baseToken_address']:
-                        pair1_price = float(pair1['price_native'])
-                        pair2_price = float(pair2['price_native'])
-                    elif pair1['baseToken_address'] == pair2['quoteToken_address']:
-                        pair1_price = float(pair1['price_native'])
-                        pair2_price = 1 / float(pair2['price_native'])  # Invert price since we're comparing base to quote
-                    elif pair1['quoteToken_address'] == pair2['baseToken_address']:
-                        pair1_price = 1 / float(pair1['price_native'])  # Invert price since we're comparing quote to base
-                        pair2_price = float(pair2['price_native'])
-                    else:
-                        logging.debug(f'Skipping pair combination as no common token found for {pair1["pair"]} and {pair2["pair"]}')
-                        continue  # This shouldn't happen due to our condition above, but added for robustness
-
-                    # Check for sufficient liquidity
-                    if float(pair1['liquidity_usd']) > 10000 and float(pair2['liquidity_usd']) > 10000:
-                        
-                        price_diff = pair2_price - pair1_price
-                        liquidity_diff = float(pair1['liquidity_usd']) - float(pair2['liquidity_usd'])
-
-                        # Determine which liquidity to use based on the direction of the arbitrage
-                        if price_diff > 0:
-                            # We use the liquidity of the token common in both pairs for base liquidity
-                            if pair1['baseToken_address'] == pair2['baseToken_address']:
-                                base_liquidity = min(float(pair1['liquidity_base']), float(pair2['liquidity_base']))
-                            elif pair1['baseToken_address'] == pair2['quoteToken_address']:
-                                base_liquidity = min(float(pair1['liquidity_base']), float(pair2['liquidity_quote']))
-                            else:  # pair1['quoteToken_address'] == pair2['baseToken_address']
-                                base_liquidity = min(float(pair1['liquidity_quote']), float(pair2['liquidity_base']))
-                            
-                            profit = calculate_arbitrage_profit(initial_investment, 
-                                                                pair1_price, 
-                                                                pair2_price, 
-                                                                slippage,                                                                 
-                                                                fee_percentage,
-                                                                float(pair1['liquidity_base']) if pair1['baseToken_address'] in [pair2['baseToken_address'], pair2['quoteToken_address']] else float(pair1['liquidity_quote']),
-                                                                float(pair2['liquidity_base']) if pair2['baseToken_address'] in [pair1['baseToken_address'], pair1['quoteToken_address']] else float(pair2['liquidity_quote']))
-                            
-                            if profit > 0:  # Only consider positive profit opportunities
-                                # logging.info(f'Found potential arbitrage opportunity: {pair1["pair"]} and {pair2["pair"]}')
-                                int_profit = int(profit * 10**8) / 10**8
-                                
-                                opportunity = {
-                                    'pair1': pair1['pair'],
-                                    'pair1_price': pair1['price_usd'],
-                                    'pair1_price_round': f"{round(pair1['price_usd'], 8)}",
-                                    'pair1_liquidity': f"${pair1['liquidity_usd']:,.2f}",
-                                    'pair1_liquidity_base': f"{pair1['liquidity_base']:,.2f}",
-                                    'pair1_liquidity_quote': f"{pair1['liquidity_quote']:,.2f}",
-                                    'pool_pair1_address': pair1['pool_address'],
-                                    'pair1_baseToken_address': pair1['baseToken_address'],
-                                    'pair1_quoteToken_address': pair1['quoteToken_address'],
-                                    'pool_pair1_url': pair1['pool_url'],
-                                    'pair2': pair2['pair'],
-                                    'pair2_price': pair2['price_usd'],
-                                    'pair2_price_round': f"{round(pair2['price_usd'], 8)}",
-                                    'pair2_liquidity': f"${pair2['liquidity_usd']:,.2f}",
-                                    'pair2_liquidity_base': f"{pair2['liquidity_base']:,.2f}",
-                                    'pair2_liquidity_quote': f"{pair2['liquidity_quote']:,.2f}",
-                                    'pool_pair2_address': pair2['pool_address'],  
-                                    'pair2_baseToken_address': pair2['baseToken_address'],
-                                    'pair2_quoteToken_address': pair2['quoteToken_address'],
-                                    'pool_pair2_url': pair2['pool_url'],
-                                    'price_diff': f"${price_diff:,.2f}",
-                                    'liquidity_diff': f"${liquidity_diff:,.2f}",
-                                    'profit': f"${profit:,.2f}",
-                                    'int_profit': int_profit,
-                                    'potential_profit': f"${base_liquidity * price_diff:,.2f}",
-                                    'pair1_chain_id': pair1['chain_id'],
-                                    'pair1_dex_id': pair1['dex_id'], 
-                                    'pair2_chain_id': pair2['chain_id'],
-                                    'pair2_dex_id': pair2['dex_id'],
-                                    'pair1_priceNative': pair1['price_native'],
-                                    'pair2_priceNative': pair2['price_native'],
-                                    'pair1_priceNative_round': f"{round(pair1['price_native'], 8)}",
-                                    'pair2_priceNative_round': f"{round(pair2['price_native'], 8)}",
-                                    'nativePrice_difference': price_diff,
-                                }
-                                
-                                arbitrage_opportunities.append(opportunity)
-                            else:
-                                logging.debug(f'No profit for pairs {pair1["pair"]} and {pair2["pair"]}: Profit = ${profit:.2f}')
-                        else:
-                            logging.debug(f'Price difference not positive for {pair1["pair"]} and {pair2["pair"]}: {price_diff}')
-                    else:
-                        logging.debug(f'Insufficient liquidity for pair1: {pair1["pair"]} or pair2: {pair2["pair"]}')
-
-    logging.info(f'Checked {total_pairs_checked} pair combinations. Found {len(arbitrage_opportunities)} arbitrage opportunities.')
-    return arbitrage_opportunities
-
-
-def find_third_contract_data(unique_pair_addresses, arbitrage_opportunities, initial_investment, slippage, fee_percentage):
-    # logging.info('Starting to find third contract data')
-    third_pair_index = {}  # This will hold either new or cached data
-    combined_opportunities = []
-    seen_combined_opportunities = set()
+# Searches with at least this many pairs are priced in batched numpy passes
+VECTORIZE_MIN_PAIRS = 500
+# Most profitable results kept by process_arbitrage_data; unset or 0 keeps them all
+RESULT_LIMIT = int(os.getenv('RESULT_LIMIT')) if os.getenv('RESULT_LIMIT') else None
+# Longest route process_cycle_data searches for, and the best-rated edges it follows out of each token
+CYCLE_MAX_HOPS = int(os.getenv('CYCLE_MAX_HOPS', 4))
+CYCLE_MAX_EDGES = int(os.getenv('CYCLE_MAX_EDGES', 8))
+
+def iter_arbitrage_opportunities(token_pairs, slippage, fee_percentage, initial_investment, user_purchases, vectorized=None):
+    # Only pairs sharing a token are compared, see utils.arbitrage and utils.vectorized
+    if vectorized is None:
+        vectorized = len(token_pairs) >= VECTORIZE_MIN_PAIRS
+    if vectorized:
+        return iter_arbitrage_opportunities_vectorized(token_pairs, slippage, fee_percentage, initial_investment)
+    return iter_arbitrage_opportunities_indexed(token_pairs, slippage, fee_percentage, initial_investment)
+
+def find_arbitrage_opportunities(token_pairs, slippage, fee_percentage, initial_investment, user_purchases, vectorized=None):
+    return list(iter_arbitrage_opportunities(token_pairs, slippage, fee_percentage, initial_investment, user_purchases, vectorized))
+
+def find_cycle_opportunities(token_pairs, slippage, fee_percentage, max_hops=CYCLE_MAX_HOPS, max_edges=CYCLE_MAX_EDGES):
+    """
+    Profitable trade cycles of 3 up to max_hops pools among token_pairs, found on the
+    token graph shared with src.controllers and sized on the pools' x·y=k curves.
+    Cycles the curves do not confirm are dropped; most achievable USD profit first.
+    """
+    cycles = ArbitrageController(max_hops, fee_percentage, max_edges).find_cycles(token_pairs)
+    found = []
+    for cycle in cycles:
+        trade = size_cycle(cycle.pools, cycle.tokens[0], fee_percentage, 1 - slippage)
+        if trade is None or trade.profit_usd <= 0:
+            continue
+        found.append({
+            'hops': cycle.hops,
+            'tokens': list(cycle.tokens),
+            'pool_addresses': [pool.pool_address for pool in cycle.pools],
+            'rate': cycle.rate,
+            'optimal_input': trade.amount_in_usd,
+            'achievable_profit': trade.profit_usd,
+        })
+    found.sort(key=lambda record: record['achievable_profit'], reverse=True)
+    logging.info(f'Found {len(found)} profitable cycles of up to {max_hops} hops among {len(cycles)} candidates.')
+    return found
 
+def gather_cycle_pools(search_address):
+    """
+    The pools a search returns plus every pool trading one of their other tokens,
+    so cycles can close through pools the search itself does not return.
+    """
+    search = fetch_and_cache_pairs(search_address)
+    if not search:
+        return []
+    pools = {pool.pool_address: pool for pool in process_token_pairs(search)}
+    tokens = sorted({token for pool in pools.values() for token in (pool.base_token, pool.quote_token)} - {search_address})
+    for token_pairs in fetcher.map(fetch_token_pairs, tokens):
+        for pool in process_token_pairs(token_pairs or []):
+            pools.setdefault(pool.pool_address, pool)
+    return list(pools.values())
+
+def process_cycle_data(search_address, slippage, fee_percentage, limit=RESULT_LIMIT, max_hops=CYCLE_MAX_HOPS):
+    """find_cycle_opportunities over gather_cycle_pools(search_address), the `limit` best (all when None or 0)."""
+    with metrics.timer('arbscreener_stage_duration_seconds', stage='cycles'):
+        found = find_cycle_opportunities(gather_cycle_pools(search_address), slippage, fee_percentage, max_hops)
+    return found[:limit] if limit else found
+
+def find_third_contract_data(unique_pair_addresses, arbitrage_opportunities, initial_investment, slippage, fee_percentage, emit=None):
+    return list(iter_third_contract_data(unique_pair_addresses, arbitrage_opportunities, initial_investment, slippage, fee_percentage, emit))
+
+def iter_third_contract_data(unique_pair_addresses, arbitrage_opportunities, initial_investment, slippage, fee_percentage, emit=None):
+    """
+    Complete each opportunity with a third pool, yielding each distinct combined
+    opportunity once, as it is built. emit('opportunity', opportunity) is called
+    for each one just before it is yielded.
+    """
+    # logging.info('Starting to find third contract data')
     # Fetch or use cached data for third pair
-    third_pair_index = fetch_or_use_cached_data(unique_pair_addresses)
-    
-    # logging.info(f'Indexed {len(third_pair_index)} third contracts')
+    _, token_pair_index = fetch_or_use_cached_data(unique_pair_addresses)
+    yield from complete_opportunities(arbitrage_opportunities, token_pair_index, initial_investment, slippage, fee_percentage, emit)
+
+def complete_opportunities(arbitrage_opportunities, token_pair_index, initial_investment, slippage, fee_percentage, emit=None):
+    """The CPU half of iter_third_contract_data, over an already built token_pair_index; makes no lookups."""
+    seen_combined_opportunities = set()
 
     for opportunity in arbitrage_opportunities:
-        logging.debug(f'Processing opportunity for pair1: {opportunity["pair1"]}, pair2: {opportunity["pair2"]}')
-        matched_pair = find_matching_third_pair(opportunity, third_pair_index)
+        logging.debug('Processing opportunity for pair1: %s, pair2: %s', opportunity.pool_a.name, opportunity.pool_b.name)
+        matched_pair = find_matching_third_pair(opportunity, token_pair_index)
         
         if matched_pair:
             combined_opportunity = combine_opportunity_data(opportunity, matched_pair)
             calculate_usd_prices(combined_opportunity)
             calculate_price_discrepancies(combined_opportunity)
+            size_triangle(combined_opportunity, slippage, fee_percentage)
 
-            opportunity_key = tuple(sorted([combined_opportunity['pair1'], combined_opportunity['pair2'], combined_opportunity['pair3']]))
+            # Keyed by address, as parallel pools between the same tokens share a name
+            opportunity_key = tuple(sorted(pool.pool_address for pool in combined_opportunity.pools))
             if opportunity_key not in seen_combined_opportunities:
                 seen_combined_opportunities.add(opportunity_key)
-                combined_opportunities.append(combined_opportunity)
-                # logging.info(f'Added opportunity: {combined_opportunity}')
-                
-                if check_price_compatibility(combined_opportunity, initial_investment, slippage, fee_percentage):
-                    combined_opportunities.append(combined_opportunity)
-                    # logging.info(f'Added opportunity: {combined_opportunity}')
-                else:
-                    logging.debug(f'Skipped opportunity due to incompatible price: {combined_opportunity}')
+                # Returned either way, ranked by its sized profit; the check only annotates the debug log
+                if logging.getLogger().isEnabledFor(logging.DEBUG) and \
+                        not check_price_compatibility(combined_opportunity, initial_investment, slippage, fee_percentage):
+                    logging.debug('Opportunity with incompatible price: %s', combined_opportunity)
+                # Emitted first, so the event goes out before the consumer asks for the next one
+                if emit is not None:
+                    emit('opportunity', combined_opportunity)
+                yield combined_opportunity
             else:
-                logging.debug(f'Skipped duplicate opportunity: {combined_opportunity}')
+                logging.debug('Skipped duplicate opportunity: %s', combined_opportunity)
         else:
-            logging.warning(f"No third pair matched for opportunity: {opportunity["pair1"], opportunity["pair2"]}")
-
-    # logging.info(f'Final number of arbitrage opportunities with third pair: {len(combined_opportunities)}')
-    return combined_opportunities
+            logging.debug("No third pair matched for opportunity: %s", (opportunity.pool_a.name, opportunity.pool_b.name))
 
 def fetch_or_use_cached_data(unique_pair_addresses):
+    """
+    Returns (third_pair_index, token_pair_index): pair details keyed by pair
+    address, and the same details grouped under token_pair_key(chain, token, token).
+
+    Pools that have not moved past PRICE_CHANGE_THRESHOLD since they were last
+    recorded reuse their stored details; only new and moved pools are rebuilt
+    and persisted. A contract whose search fails falls back to the pools it last returned.
+    """
     third_pair_index = {}
-    should_fetch_new_data = check_for_price_change(unique_pair_addresses)
+    changed_pools = []
+    for contract, search in zip(unique_pair_addresses, fetch_many_pairs(unique_pair_addresses)):
+        if not search:
+            logging.debug('No search results for contract %s', contract)
+            for pair_details in pool_snapshots.details_for_query(contract) or []:
+                third_pair_index[pair_details.pool_address] = pair_details
+            continue
+        pool_addresses = []
+        for pair in search:
+            liquidity_data = safe_get(pair, 'liquidity', {})
+            if not (hasattr(liquidity_data, 'usd') and liquidity_data.usd > 1):
+                continue
+            pair_details = pool_snapshots.unchanged_details(pair.pair_address, safe_get(pair, 'price_native', 0.0),
+                                                            liquidity_data.usd)
+            if pair_details is None:
+                pair_details = create_pair_details(pair)
+                pool_snapshots.record(pair_details.pool_address, pair_details.price_native,
+                                      pair_details.liquidity_usd, pair_details)
+                changed_pools.append(pair_details)
+                logging.debug("Added to third_pair_index: %s", pair_details)
+            third_pair_index[pair_details.pool_address] = pair_details
+            pool_addresses.append(pair_details.pool_address)
+        pool_snapshots.record_query(contract, pool_addresses)
+    logging.debug('%d of %d third-pair pools changed', len(changed_pools), len(third_pair_index))
+    metrics.inc('arbscreener_pools_changed_total', len(changed_pools))
+    persist_pools(changed_pools)
+
+    token_pair_index = defaultdict(list)
+    for pair_details in third_pair_index.values():
+        token_pair_index[token_pair_key(pair_details.chain_id,
+                                        pair_details.base_token,
+                                        pair_details.quote_token)].append(pair_details)
     
-    if should_fetch_new_data:
-        for contract in unique_pair_addresses:
-            search = fetch_and_cache_pairs(contract)
-            if search:
-                for pair in search:
-                    liquidity_data = safe_get(pair, 'liquidity', {})
-                    if hasattr(liquidity_data, 'usd') and liquidity_data.usd > 1:
-                        pair_details = create_pair_details(pair)
-                        third_pair_index[pair_details['pair_address']] = pair_details
-                        # Removed database update
-                        logging.debug(f"Added to third_pair_index: {pair_details}")
-            else:
-                logging.debug(f'No search results for contract {contract}')
-    else:
-        for contract in unique_pair_addresses:
-            # Removed database retrieval
-            logging.warning(f'No stored data for contract address: {contract}')
-    
-    return third_pair_index
-
-def check_for_price_change(unique_pair_addresses):
-    for contract in unique_pair_addresses:
-        last_known_price = get_last_known_price(contract)
-        if last_known_price is None:
-            return True
-        search = fetch_and_cache_pairs(contract)
-        if search and any(float(safe_get(pair, 'price_native', 0.0)) != last_known_price for pair in search if safe_get(pair, 'pair_address') == contract):
-            return True
-    return False
-
-def get_last_known_price(contract_address):
-    # Removed database retrieval
-    logging.debug(f"No stored data for contract address: {contract_address}")
-    return None
+    return third_pair_index, token_pair_index
+
+def token_pair_key(chain_id, token_a, token_b):
+    """Hash key for a pool between two tokens on a chain, independent of base/quote order."""
+    return (chain_id,) + ((token_a, token_b) if token_a <= token_b else (token_b, token_a))
 
 def create_pair_details(pair):
-    liquidity_data = safe_get(pair, 'liquidity', {})
-    return {
-        'baseToken_address': safe_get(pair.base_token, 'address', 'N/A'),
-        'quoteToken_address': safe_get(pair.quote_token, 'address', 'N/A'),
-        'pair_address': safe_get(pair, 'pair_address', 'N/A'),
-        'pair': f"{safe_get(pair.base_token, 'name', 'N/A')}/{safe_get(pair.quote_token, 'name', 'N/A')}",
-        'price_usd': float(safe_get(pair, 'price_usd', 0.0)),
-        'price_native': float(safe_get(pair, 'price_native', 0.0)),
-        'liquidity': liquidity_data,
-        'url': safe_get(pair, 'url', 'N/A'),
-        'chain_id': safe_get(pair, 'chain_id', 'N/A'),
-        'dex_id': safe_get(pair, 'dex_id', 'N/A')
-    }
-
-def find_matching_third_pair(opportunity, third_pair_index):
-    addresses = [
-        opportunity['pair1_baseToken_address'],
-        opportunity['pair1_quoteToken_address'],
-        opportunity['pair2_baseToken_address'],
-        opportunity['pair2_quoteToken_address']
-    ]
-    
-    counter = Counter(addresses)
+    return pool_from_pair(pair)
+
+def third_pair_tokens(opportunity):
+    """The two tokens a third pool must trade to close the opportunity's triangle, or None."""
+    counter = Counter(opportunity_token_addresses(opportunity))
     unique_tokens = [addr for addr, count in counter.items() if count == 1]
     shared_tokens = [addr for addr, count in counter.items() if count > 1]
 
     if len(unique_tokens) == 2:
-        unique_token1, unique_token2 = sorted(unique_tokens)
-        for pair_address, pair_data in third_pair_index.items():
-            if (pair_data['baseToken_address'] == unique_token1 and pair_data['quoteToken_address'] == unique_token2) or \
-               (pair_data['baseToken_address'] == unique_token2 and pair_data['quoteToken_address'] == unique_token1):
-                return pair_data
+        return unique_tokens[0], unique_tokens[1]
     elif len(unique_tokens) == 1 and len(shared_tokens) == 1:
-        unique_token = unique_tokens[0]
-        shared_token = shared_tokens[0]
-        for pair_address, pair_data in third_pair_index.items():
-            if (pair_data['baseToken_address'] == unique_token and pair_data['quoteToken_address'] == shared_token) or \
-               (pair_data['baseToken_address'] == shared_token and pair_data['quoteToken_address'] == unique_token):
-                return pair_data
+        return unique_tokens[0], shared_tokens[0]
     elif len(shared_tokens) == 2:
-        shared_token1, shared_token2 = sorted(shared_tokens)
-        for pair_address, pair_data in third_pair_index.items():
-            if (pair_data['baseToken_address'] == shared_token1 and pair_data['quoteToken_address'] == shared_token2) or \
-               (pair_data['baseToken_address'] == shared_token2 and pair_data['quoteToken_address'] == shared_token1):
-                return pair_data
-    
+        return shared_tokens[0], shared_tokens[1]
     return None
 
+def find_matching_third_pairs(opportunity, token_pair_index):
+    """Every indexed pool that closes the triangle on the opportunity's chains, deepest liquidity first."""
+    tokens = third_pair_tokens(opportunity)
+    if tokens is None:
+        return []
+
+    candidates = []
+    for chain_id in dict.fromkeys([opportunity.pool_a.chain_id, opportunity.pool_b.chain_id]):
+        candidates.extend(token_pair_index.get(token_pair_key(chain_id, *tokens), ()))
+    candidates.sort(key=lambda pair_data: pair_data.liquidity_usd, reverse=True)
+    return candidates
+
+def find_matching_third_pair(opportunity, token_pair_index):
+    """The deepest pool closing the opportunity's triangle, or None."""
+    candidates = find_matching_third_pairs(opportunity, token_pair_index)
+    return candidates[0] if candidates else None
+
 def combine_opportunity_data(opportunity, matched_pair):
-    combined_opportunity = opportunity.copy()
-    combined_opportunity.update({
-        'pair3': matched_pair['pair'],
-        'pair3_price': matched_pair['price_usd'],
-        'pair3_priceNative_round': f"{round(float(matched_pair['price_native']), 8)}",
-        'pair3_liquidity': f"${safe_get(matched_pair['liquidity'], 'usd', 0.0):,.2f}",
-        'pair3_liquidity_base': f"{safe_get(matched_pair['liquidity'], 'base', 0.0):,.2f}",
-        'pair3_liquidity_quote': f"{safe_get(matched_pair['liquidity'], 'quote', 0.0):,.2f}",
-        'pool_pair3_address': matched_pair['pair_address'],
-        'pair3_baseToken_address': matched_pair['baseToken_address'],
-        'pair3_quoteToken_address': matched_pair['quoteToken_address'],
-        'pool_pair3_url': matched_pair['url'],
-        'pair3_chain_id': matched_pair['chain_id'],
-        'pair3_dex_id': matched_pair['dex_id']
-    })
-    return combined_opportunity
+    return opportunity.with_third_pool(matched_pair)
+
+def quote_price_usd(pool, usd_quote_is_one=True):
+    """USD price of the pool's quote token, implied by its base USD and native prices."""
+    if usd_quote_is_one and pool.quote_token.lower() == 'usd':
+        return 1.0
+    return pool.price_usd / pool.price_native
 
 def calculate_usd_prices(combined_opportunity):
-    quote_price_usd_1 = float(combined_opportunity['pair1_price']) / float(combined_opportunity['pair1_priceNative_round'])
-    quote_price_usd_2 = 1.0 if combined_opportunity['pair2_quoteToken_address'].lower() == 'usd' else float(combined_opportunity['pair2_price']) / float(combined_opportunity['pair2_priceNative_round'])
-    quote_price_usd_3 = 1.0 if combined_opportunity['pair3_quoteToken_address'].lower() == 'usd' else float(combined_opportunity['pair3_price']) / float(combined_opportunity['pair3_priceNative_round'])
-    
-    combined_opportunity['quote_price_usd_1'] = f"${quote_price_usd_1:.2f}"
-    combined_opportunity['quote_price_usd_2'] = f"${quote_price_usd_2:.2f}"
-    combined_opportunity['quote_price_usd_3'] = f"${quote_price_usd_3:.2f}"
+    combined_opportunity.quote_prices_usd = (
+        quote_price_usd(combined_opportunity.pool_a, usd_quote_is_one=False),
+        quote_price_usd(combined_opportunity.pool_b),
+        quote_price_usd(combined_opportunity.pool_c),
+    )
 
 def calculate_price_discrepancies(combined_opportunity):
-    # print('COMBINED_OPPORTUNITY~~~~~', combined_opportunity)
-    
-    # Extract prices for all pairs
-    base_price_usd_1 = float(combined_opportunity['pair1_price'])
-    base_price_usd_2 = float(combined_opportunity['pair2_price'])
-    base_price_usd_3 = float(combined_opportunity['pair3_price']) if 'pair3_price' in combined_opportunity else None
-
-    # Extract quote prices for all pairs
-    quote_price_usd_1 = float(combined_opportunity['quote_price_usd_1'][1:])
-    quote_price_usd_2 = float(combined_opportunity['quote_price_usd_2'][1:])
-    quote_price_usd_3 = float(combined_opportunity['quote_price_usd_3'][1:]) if 'quote_price_usd_3' in combined_opportunity else None
+    """
+    Percentage differences of each token's USD price between the pools that trade it, keyed
+    '{base,quote}Token_difference_{ij}'. None stands for a zero reference price; pool
+    couples not sharing the token are 0.0.
+    """
+    pools = combined_opportunity.pools
+    quote_prices = combined_opportunity.quote_prices_usd
 
     # Helper function to calculate percentage difference
     def calculate_difference(price1, price2):
         if price1 != 0:
-            return f"{(price1 - price2) / price1 * 100:.2f}%"
+            return (price1 - price2) / price1 * 100
         else:
-            return 'N/A'
-
-    # Function to get the price of a token from another pair
-    def get_price_from_pair(token_address, pair_number):
-        for token_key, price in [
-            ('pair{0}_baseToken_address'.format(pair_number), 'pair{0}_price'.format(pair_number)),
-            ('pair{0}_quoteToken_address'.format(pair_number), 'quote_price_usd_{0}'.format(pair_number))
-        ]:
-            if combined_opportunity.get(token_key) == token_address:
-                return float(combined_opportunity[price][1:]) if 'quote' in token_key else float(combined_opportunity[price])
+            return None
+
+    # Function to get the price of a token from another pool
+    def get_price_from_pair(token_address, index):
+        if pools[index].base_token == token_address:
+            return pools[index].price_usd
+        if pools[index].quote_token == token_address:
+            return quote_prices[index]
         return None
 
-    # Calculate discrepancies for each token across all pairs
-    pairs = ['1', '2', '3']  # Assuming these are the pair numbers you're working with
-
     # Dictionary to store calculated discrepancies
     discrepancies = {}
 
-    for pair_number in pairs:
-        base_token_address = combined_opportunity[f'pair{pair_number}_baseToken_address']
-        quote_token_address = combined_opportunity[f'pair{pair_number}_quoteToken_address']
-        base_price = float(combined_opportunity[f'pair{pair_number}_price'])
-        quote_price = float(combined_opportunity[f'quote_price_usd_{pair_number}'][1:])
-
-        # For base token
-        for compare_pair in pairs:
-            if pair_number != compare_pair:
-                compare_price = get_price_from_pair(base_token_address, compare_pair)
-                if compare_price is not None:
-                    pair1 = int(pair_number)
-                    pair2 = int(compare_pair)
-                    discrepancy_key = f'baseToken_difference_{min(pair1, pair2)}{max(pair1, pair2)}'
-                    if discrepancy_key not in discrepancies:
-                        discrepancies[discrepancy_key] = calculate_difference(base_price, compare_price)
-                        print(f"Discrepancy for {discrepancy_key}: {discrepancies[discrepancy_key]}")
-
-        # For quote token
-        for compare_pair in pairs:
-            if pair_number != compare_pair:
-                compare_price = get_price_from_pair(quote_token_address, compare_pair)
-                if compare_price is not None:
-                    pair1 = int(pair_number)
-                    pair2 = int(compare_pair)
-                    discrepancy_key = f'quoteToken_difference_{min(pair1, pair2)}{max(pair1, pair2)}'
-                    if discrepancy_key not in discrepancies:
-                        discrepancies[discrepancy_key] = calculate_difference(quote_price, compare_price)
-                        print(f"Discrepancy for {discrepancy_key}: {discrepancies[discrepancy_key]}")
-
-    # Merge discrepancies into combined_opportunity
-    combined_opportunity.update(discrepancies)
+    for index, pool in enumerate(pools):
+        for side, token_address, price in (('baseToken', pool.base_token, pool.price_usd),
+                                           ('quoteToken', pool.quote_token, quote_prices[index])):
+            for compare_index in range(len(pools)):
+                if compare_index != index:
+                    compare_price = get_price_from_pair(token_address, compare_index)
+                    if compare_price is not None:
+                        first, second = sorted((index + 1, compare_index + 1))
+                        discrepancy_key = f'{side}_difference_{first}{second}'
+                        if discrepancy_key not in discrepancies:
+                            discrepancies[discrepancy_key] = calculate_difference(price, compare_price)
+                            logging.debug("Discrepancy for %s: %s", discrepancy_key, discrepancies[discrepancy_key])
 
     # Ensure all expected discrepancies are present
     expected_discrepancies = [
         'baseToken_difference_12', 'baseToken_difference_13', 'baseToken_difference_23',
         'quoteToken_difference_12', 'quoteToken_difference_13', 'quoteToken_difference_23'
     ]
-
     for key in expected_discrepancies:
-        if key not in combined_opportunity:
-            combined_opportunity[key] = '0.00%'  # or any default value you prefer
-            print(f"Added missing discrepancy: {key}")
+        discrepancies.setdefault(key, 0.0)
+
+    combined_opportunity.discrepancies = discrepancies
 
-    # print("FINAL COMBINED_OPPORTUNITY~~~~~", combined_opportunity)
+def size_triangle(combined_opportunity, slippage, fee_percentage):
+    """
+    Size the best trade around the opportunity's three pools on their x·y=k curves,
+    setting its optimal_input and achievable_profit in USD; both stay None when the
+    pools do not form a cycle.
+    """
+    trade = best_cycle_trade(combined_opportunity.pools, fee_percentage, 1 - slippage)
+    if trade is not None:
+        combined_opportunity.optimal_input = trade.amount_in_usd
+        combined_opportunity.achievable_profit = trade.profit_usd
+    return trade
 
-def check_price_compatibility(opportunity: Dict[str, Union[str, float]], initial_investment: float, slippage: float, fee_percentage: float) -> bool:
+def check_price_compatibility(opportunity: ArbitrageOpportunity, initial_investment: float, slippage: float, fee_percentage: float) -> bool:
     """
     Check if the third pair's price fits into the arbitrage chain to make a profit.
+
+    The investment goes around the triangle in its most profitable direction, each
+    swap priced on the pool's x·y=k curve from its base and quote liquidity.
     
-    :param opportunity: Dictionary containing details of the three pairs in the arbitrage opportunity
+    :param opportunity: The arbitrage opportunity, closed by its third pool
     :param initial_investment: The amount of USD to invest in the arbitrage
-    :param slippage, slippage: Expected slippage for each trade
-    :param fee_percentage: Trading fee percentage
+    :param slippage, slippage: Expected slippage for each trade, taken off what it returns
+    :param fee_percentage: Trading fee percentage, taken off what each trade is given
     :return: Boolean indicating if the third pair's price would result in a profit
     """
-    # Convert initial investment to the first token
-    initial_amount = initial_investment / float(opportunity['pair1_price'])
-    logging.debug(f"Initial amount after conversion: {initial_amount}")
-
-    # Now simulate trades through all three pairs
-    # This is a simplified model; real implementation would need to account for complex price dynamics
-    amount_after_first_trade = initial_amount / (1 + slippage)
-    logging.debug(f"Amount after first trade: {amount_after_first_trade}")
-    price_first_to_second = float(opportunity['pair2_price'])
-    amount_after_second_trade = (amount_after_first_trade * price_first_to_second) / (1 + slippage)
-    logging.debug(f"Amount after second trade: {amount_after_second_trade}")
-    price_second_to_third = float(opportunity['pair3_price'])
-    final_amount = amount_after_second_trade / price_second_to_third
-    logging.debug(f"Final amount after third trade: {final_amount}")
-
-    # Fees calculation
-    total_fees = initial_investment * fee_percentage * 3  # Assuming three trades, one for each pair
-    logging.debug(f"Total fees for three trades: {total_fees}")
-
-    # Profit calculation
-    profit = (final_amount * float(opportunity['pair1_price'])) - initial_investment - total_fees
-    logging.debug(f"Calculated profit: {profit}")
+    trade = best_cycle_trade(opportunity.pools, fee_percentage, 1 - slippage)
+    if trade is None:
+        logging.debug("The three pools do not form a cycle: %s", opportunity)
+        return False
+
+    profit = cycle_profit_usd(trade, initial_investment, fee_percentage, 1 - slippage)
+    logging.debug("Calculated profit: %s, starting from %s", profit, trade.start_token)
 
     return profit > 0
 
@@ -542,15 +474,16 @@ def gather_token_pairs_from_purchases(purchases):
 
     baseToken_addresses = [purchase.baseToken_address for purchase in purchases if purchase.baseToken_address]
     all_token_pairs = []
-    for address in baseToken_addresses:
-        search = fetch_and_cache_pairs(address)
+    for search in fetch_many_pairs(baseToken_addresses):
         if search:
             all_token_pairs.extend(process_token_pairs(search))
     return all_token_pairs
 
-def find_arbitrage_opportunities_for_user(token_pairs, purchases, slippage, fee_percentage, initial_investment, search_address):
+def find_arbitrage_opportunities_for_user(token_pairs, purchases, slippage, fee_percentage, initial_investment, search_address, scanner=None):
     """
     Find arbitrage opportunities based on either user's token pairs or a provided address.
+    A utils.snapshot_store.IncrementalScanner only re-evaluates the pools that moved since its last scan;
+    searches by address without one use the scanner kept for that address and scenario.
     """
     if not token_pairs:  # If no user data, use the search_address
         search = fetch_and_cache_pairs(search_address)
@@ -559,8 +492,22 @@ def find_arbitrage_opportunities_for_user(token_pairs, purchases, slippage, fee_
         else:
             logging.warning("No token pairs found for the given address.")
             return []
-
-    return find_arbitrage_opportunities(token_pairs, slippage, fee_percentage, initial_investment, purchases)
+        if scanner is None:
+            scanner = scanner_for(search_address, slippage, fee_percentage, initial_investment)
+
+    with metrics.timer('arbscreener_stage_duration_seconds', stage='pair_scan'):
+        if scanner is not None:
+            return scanner.scan(token_pairs, slippage, fee_percentage, initial_investment)
+        return find_arbitrage_opportunities(token_pairs, slippage, fee_percentage, initial_investment, purchases)
+
+def scanner_for(search_address, slippage, fee_percentage, initial_investment):
+    """The IncrementalScanner kept in search_scanners for one search and scenario, created on first use."""
+    key = (search_address, slippage, fee_percentage, initial_investment)
+    scanner = search_scanners.get(key)
+    if scanner is None:
+        scanner = IncrementalScanner()
+        search_scanners.set(key, scanner)
+    return scanner
 
 def filter_and_process_opportunities(opportunities):
     """
@@ -570,78 +517,129 @@ def filter_and_process_opportunities(opportunities):
     pair_chains = []
 
     for opportunity in opportunities:
-        addresses = [
-            opportunity['pair1_baseToken_address'],
-            opportunity['pair1_quoteToken_address'],
-            opportunity['pair2_baseToken_address'],
-            opportunity['pair2_quoteToken_address']
-        ]
-        if opportunity['pair1_chain_id'] == opportunity['pair2_chain_id']:
+        addresses = opportunity_token_addresses(opportunity)
+        if opportunity.pool_a.chain_id == opportunity.pool_b.chain_id:
             counter = Counter(addresses)
             repeated_item = next(item for item, count in counter.items() if count > 1)
             unique_items = tuple(item for item in addresses if item != repeated_item)
             quote_pairs.append(unique_items)
-            pair_chains.append(opportunity['pair1_chain_id'])
+            pair_chains.append(opportunity.pool_a.chain_id)
     
     return quote_pairs, pair_chains
 
-def match_pairs_with_opportunities(opportunities, quote_pairs, pair_chains):
+def find_matching_pairs(quote_pairs, pair_chains):
     """
-    Match the arbitrage opportunities with corresponding token pairs from the Dexscreener data.
+    Dexscreener pairs trading each (token, token) left over by filter_and_process_opportunities,
+    at most one per (chain, first token).
     """
-    seen_searches = defaultdict(bool)
-    matching_pairs = []
     combined_data = list(zip(quote_pairs, pair_chains))
 
+    # One token lookup per (chain, token), all issued together
+    searches = {}
+    for item in combined_data:
+        searches.setdefault(f"{item[1]}_{item[0][0]}", item[0][0])
+    results = dict(zip(searches, fetcher.map(fetch_token_pairs, searches.values())))
+
+    seen_searches = defaultdict(bool)
+    matching_pairs = []
     for item in combined_data:
         address1, address2, chain_id = item[0][0], item[0][1], item[1]
         search_key = f"{chain_id}_{address1}"
         if not seen_searches[search_key]:
             seen_searches[search_key] = True
-            search = client.get_token_pairs(address1)
-            for pair in search:
+            for pair in results[search_key] or []:
                 if pair.quote_token.address == address2 or pair.base_token.address == address2:
                     matching_pairs.append(pair)
                     break
-            if item != combined_data[-1]:
-                time.sleep(3)  # Delay to avoid rate limiting
+    return matching_pairs
+
+def opportunity_token_addresses(opportunity):
+    return (opportunity.pool_a.base_token, opportunity.pool_a.quote_token,
+            opportunity.pool_b.base_token, opportunity.pool_b.quote_token)
+
+def match_pairs_with_opportunities(opportunities, quote_pairs, pair_chains):
+    """
+    Match the arbitrage opportunities with corresponding token pairs from the Dexscreener data,
+    as (opportunity, matching_pairs) tuples.
+    """
+    matching_pairs = find_matching_pairs(quote_pairs, pair_chains)
 
     opportunities_with_pairs = []
     for opportunity in opportunities:
-        new_opportunity = opportunity.copy()
-        new_opportunity['matching_pairs'] = [pair for pair in matching_pairs if 
-            pair.base_token.address in [opportunity['pair1_baseToken_address'], opportunity['pair1_quoteToken_address'], opportunity['pair2_baseToken_address'], opportunity['pair2_quoteToken_address']] or
-            pair.quote_token.address in [opportunity['pair1_baseToken_address'], opportunity['pair1_quoteToken_address'], opportunity['pair2_baseToken_address'], opportunity['pair2_quoteToken_address']]
-        ]
-        opportunities_with_pairs.append(new_opportunity)
+        addresses = opportunity_token_addresses(opportunity)
+        opportunities_with_pairs.append((opportunity, [pair for pair in matching_pairs
+                                                       if pair.base_token.address in addresses or pair.quote_token.address in addresses]))
 
     return opportunities_with_pairs
 
+def matching_pair_addresses(opportunities, quote_pairs, pair_chains):
+    """
+    Sorted addresses of the matched pairs touching any opportunity, the same set
+    match_pairs_with_opportunities attaches, without copying the opportunities.
+    """
+    matching_pairs = find_matching_pairs(quote_pairs, pair_chains)
+    tokens = set()
+    for opportunity in opportunities:
+        tokens.update(opportunity_token_addresses(opportunity))
+    return sorted(set(pair.pair_address for pair in matching_pairs
+                      if pair.base_token.address in tokens or pair.quote_token.address in tokens))
 
-def process_arbitrage_data(user_purchases, initial_investment, slippage, fee_percentage, search_address=None):
+def top_opportunities(opportunities, limit=RESULT_LIMIT):
     """
-    Process arbitrage data, using either user's purchase history or a provided search address.
+    The `limit` opportunities with the most achievable profit, best first, as sorting
+    the whole iterable would give them. Keeps a heap of `limit` entries instead of the full set.
     """
-    token_pairs = gather_token_pairs_from_purchases(user_purchases)
-    
-    logging.info('Finding arbitrage opportunities')
-    arbitrage_opportunities = find_arbitrage_opportunities_for_user(token_pairs, user_purchases, slippage, fee_percentage, initial_investment, search_address)
+    if not limit:
+        return sorted(opportunities, key=lambda x: x.rank_profit, reverse=True)
+    return heapq.nlargest(limit, opportunities, key=lambda x: x.rank_profit)
+
+def iter_arbitrage_data(user_purchases, initial_investment, slippage, fee_percentage, search_address=None, scanner=None, emit=None):
+    """
+    The process_arbitrage_data pipeline, yielding three-pool opportunities as
+    each is completed, in no particular order.
+
+    Candidates are gathered once, since their tokens decide the third-pair
+    lookups; nothing downstream of them is held in full.
+    """
+    emit = emit or (lambda event, data: None)
+    emit('progress', {'stage': 'search', 'search': search_address})
+    with metrics.timer('arbscreener_stage_duration_seconds', stage='candidates'):
+        token_pairs = gather_token_pairs_from_purchases(user_purchases)
+
+        logging.info('Finding arbitrage opportunities')
+        arbitrage_opportunities = find_arbitrage_opportunities_for_user(token_pairs, user_purchases, slippage, fee_percentage, initial_investment, search_address, scanner)
     # logging.info(f'Found {len(arbitrage_opportunities)} initial arbitrage opportunities.')
 
     # Continue with the rest of the function logic, ensuring to handle if opportunities are empty
+    emit('progress', {'stage': 'candidates', 'count': len(arbitrage_opportunities or [])})
     if not arbitrage_opportunities:
         logging.info('No arbitrage opportunities found.')
-        return []
-
-    quote_pairs, pair_chains = filter_and_process_opportunities(arbitrage_opportunities)
-    opportunities_with_pairs = match_pairs_with_opportunities(arbitrage_opportunities, quote_pairs, pair_chains)
+        return
 
-    unique_pair_addresses = sorted(set(p.pair_address for o in opportunities_with_pairs for p in o['matching_pairs']))
+    with metrics.timer('arbscreener_stage_duration_seconds', stage='matching_pairs'):
+        quote_pairs, pair_chains = filter_and_process_opportunities(arbitrage_opportunities)
+        unique_pair_addresses = matching_pair_addresses(arbitrage_opportunities, quote_pairs, pair_chains)
 
     logging.info('Finding third contract')
-    all_three_contracts = find_third_contract_data(unique_pair_addresses, arbitrage_opportunities, initial_investment, slippage, fee_percentage)
-
-    sorted_opportunities = sorted(all_three_contracts, key=lambda x: x['int_profit'], reverse=True)
+    emit('progress', {'stage': 'third_contract', 'count': len(unique_pair_addresses)})
+    completed = 0
+    with metrics.timer('arbscreener_stage_duration_seconds', stage='third_contract'):
+        for opportunity in iter_third_contract_data(unique_pair_addresses, arbitrage_opportunities, initial_investment, slippage, fee_percentage, emit):
+            completed += 1
+            yield opportunity
+    metrics.inc('arbscreener_opportunities_total', completed, stage='third_contract')
+
+def process_arbitrage_data(user_purchases, initial_investment, slippage, fee_percentage, search_address=None, scanner=None, emit=None, limit=RESULT_LIMIT):
+    """
+    Process arbitrage data, using either user's purchase history or a provided search address.
+    emit(event, data), when given, receives 'progress' events per stage and each confirmed 'opportunity'.
+    Returns the `limit` most profitable opportunities (all of them when limit is None or 0), best first.
+    """
+    with metrics.timer('arbscreener_stage_duration_seconds', stage='total'):
+        sorted_opportunities = top_opportunities(
+            iter_arbitrage_data(user_purchases, initial_investment, slippage, fee_percentage, search_address, scanner, emit),
+            limit
+        )
     logging.info(f'Total arbitrage opportunities: {len(sorted_opportunities)}')
 
     return sorted_opportunities
@@ -671,23 +669,14 @@ class HeartbeatFilter(Filter):
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger()
 
-# Create a custom handler for client logs
-class ClientLoggingHandler(logging.Handler):
-    def __init__(self):
-        super().__init__()
-        self.logs: List[str] = []
-        # Add the heartbeat filter
-        self.addFilter(HeartbeatFilter())
-
-    def emit(self, record: logging.LogRecord) -> None:
-        log_entry = self.format(record)
-        self.logs.append(log_entry)
-
-    def get_logs(self) -> List[str]:
-        logs = self.logs.copy()
-        self.logs.clear()  # Clear after retrieval
-        return logs
-
-# Create and configure the logger
-client_handler = ClientLoggingHandler()
-logger.addHandler(client_handler)
+# Per-client log channels read by /get_logs, see utils.client_logs
+from utils.client_logs import ClientLogChannels
+client_logs = ClientLogChannels()
+client_logs.addFilter(HeartbeatFilter())
+logger.addHandler(client_logs)
+
+# Logs of streamed runs go out with their events, see utils.streaming
+from utils.streaming import StreamLogHandler
+stream_log_handler = StreamLogHandler(level=logging.INFO)
+stream_log_handler.addFilter(HeartbeatFilter())
+logger.addHandler(stream_log_handler)
@@ -0,0 +1,206 @@
+import atexit
+import bisect
+import json
+import logging
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+
+# SQLite file every worker process publishes its metrics to, so /metrics on any worker reports them all;
+# set it empty to report each process on its own
+METRICS_PATH = os.getenv('METRICS_PATH', os.path.join(tempfile.gettempdir(), 'arbscreener-metrics.sqlite3'))
+# Seconds between a process's writes of its changed metrics to METRICS_PATH
+METRICS_FLUSH_INTERVAL = float(os.getenv('METRICS_FLUSH_INTERVAL', 5))
+
+# Upper bounds, in seconds, of the latency histogram buckets
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+METRICS = {
+    'arbscreener_stage_duration_seconds': ('histogram', 'Time spent in each process_arbitrage_data stage.'),
+    'arbscreener_pair_combinations_total': ('counter', 'Pool couples compared by the pair scan.'),
+    'arbscreener_opportunities_total': ('counter', 'Opportunities produced, by stage.'),
+    'arbscreener_pools_changed_total': ('counter', 'Third-pair pools rebuilt because they were new or had moved.'),
+    'arbscreener_fetch_duration_seconds': ('histogram', 'Uncached pair lookups, retries and rate-limit waits included.'),
+    'arbscreener_fetch_errors_total': ('counter', 'Pair lookups that failed after retries.'),
+    'arbscreener_upstream_requests_total': ('counter', 'Dexscreener HTTP requests by endpoint and status.'),
+    'arbscreener_upstream_request_duration_seconds': ('histogram', 'Dexscreener HTTP request latency.'),
+    'arbscreener_cache_requests_total': ('counter', 'Cache lookups by cache and result (hit or miss).'),
+    'arbscreener_rate_limit_wait_seconds': ('histogram', 'Time callers waited for an upstream rate-limit token.'),
+    'arbscreener_rate_limit_rejections_total': ('counter', 'Upstream calls refused by the rate limiter.'),
+}
+
+
+class Metrics:
+    """
+    Counters and latency histograms for the hot paths, exported in the
+    Prometheus text format.
+
+    Each process records in memory. Changed series are written to the shared
+    SQLite file every `flush_interval` seconds, one row per process and series.
+    `render` sums every process's rows, so any worker answers /metrics for all
+    of them. A forked child starts from zero.
+    """
+
+    def __init__(self, path=METRICS_PATH, flush_interval=METRICS_FLUSH_INTERVAL, buckets=LATENCY_BUCKETS):
+        self.path = path or None
+        self.flush_interval = flush_interval
+        self.buckets = tuple(buckets)
+        self._reset()
+        if hasattr(os, 'register_at_fork'):
+            os.register_at_fork(after_in_child=self._reset)
+
+    def _reset(self):
+        self._lock = threading.Lock()
+        self._db_lock = threading.Lock()
+        self._values = {}
+        self._dirty = set()
+        self._process = f'{os.getpid()}-{time.time_ns()}'
+        self._connection = None
+        self._flusher = None
+
+    def _series(self, name, labels):
+        if name not in METRICS:
+            raise KeyError(f'Unknown metric: {name}')
+        return name, tuple(sorted(labels.items()))
+
+    def inc(self, name, amount=1, **labels):
+        key = self._series(name, labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+            self._dirty.add(key)
+        self._start_flusher()
+
+    def observe(self, name, value, **labels):
+        key = self._series(name, labels)
+        with self._lock:
+            # Per-bucket counts with the +Inf bucket last, then the sum and the count
+            histogram = self._values.get(key)
+            if histogram is None:
+                histogram = self._values[key] = [0] * (len(self.buckets) + 1) + [0.0, 0]
+            histogram[bisect.bisect_left(self.buckets, value)] += 1
+            histogram[-2] += value
+            histogram[-1] += 1
+            self._dirty.add(key)
+        self._start_flusher()
+
+    @contextmanager
+    def timer(self, name, **labels):
+        """Observe the seconds the enclosed block took, even when it raises."""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - started, **labels)
+
+    def _start_flusher(self):
+        if self.path is None or self._flusher is not None:
+            return
+        with self._lock:
+            if self._flusher is not None:
+                return
+            self._flusher = threading.Thread(target=self._flush_loop, name='metrics-flush', daemon=True)
+            self._flusher.start()
+            atexit.register(self.flush)
+
+    def _flush_loop(self):
+        flusher = self._flusher
+        while self._flusher is flusher:
+            time.sleep(self.flush_interval)
+            try:
+                self.flush()
+            except sqlite3.Error as e:
+                logging.warning(f'Could not publish metrics to {self.path}: {e}')
+
+    def _db(self):
+        if self._connection is None:
+            connection = sqlite3.connect(self.path, timeout=30, isolation_level=None, check_same_thread=False)
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute(
+                'CREATE TABLE IF NOT EXISTS metric_series '
+                '(process TEXT NOT NULL, name TEXT NOT NULL, labels TEXT NOT NULL, value TEXT NOT NULL, '
+                'PRIMARY KEY (process, name, labels))'
+            )
+            self._connection = connection
+        return self._connection
+
+    def flush(self):
+        """Write this process's changed series to the shared file."""
+        if self.path is None:
+            return
+        # Held from snapshot to commit, so a slower concurrent flush never writes older values last
+        with self._db_lock:
+            with self._lock:
+                rows = [(self._process, name, json.dumps(labels), json.dumps(self._values[(name, labels)]))
+                        for name, labels in self._dirty]
+                self._dirty = set()
+            if not rows:
+                return
+            connection = self._db()
+            connection.execute('BEGIN IMMEDIATE')
+            try:
+                connection.executemany(
+                    'INSERT OR REPLACE INTO metric_series (process, name, labels, value) VALUES (?, ?, ?, ?)', rows)
+                connection.execute('COMMIT')
+            except BaseException:
+                connection.execute('ROLLBACK')
+                raise
+
+    def collect(self):
+        """Every series summed over all processes, {(name, labels): counter value or histogram list}."""
+        if self.path is None:
+            with self._lock:
+                return {key: list(value) if isinstance(value, list) else value for key, value in self._values.items()}
+        self.flush()
+        with self._db_lock:
+            rows = self._db().execute('SELECT name, labels, value FROM metric_series').fetchall()
+        totals = {}
+        for name, labels, value in rows:
+            key = (name, tuple(tuple(label) for label in json.loads(labels)))
+            value = json.loads(value)
+            if key not in totals:
+                totals[key] = value
+            elif isinstance(value, list):
+                totals[key] = [a + b for a, b in zip(totals[key], value)]
+            else:
+                totals[key] += value
+        return totals
+
+    def render(self):
+        """All series in the Prometheus text exposition format (version 0.0.4)."""
+        series = self.collect()
+        lines = []
+        for name, (kind, help_text) in METRICS.items():
+            lines.append(f'# HELP {name} {help_text}')
+            lines.append(f'# TYPE {name} {kind}')
+            for (series_name, labels), value in sorted(series.items()):
+                if series_name != name:
+                    continue
+                if kind == 'counter':
+                    lines.append(f'{name}{_labels(labels)} {_number(value)}')
+                    continue
+                cumulative = 0
+                for bound, count in zip(self.buckets + (float('inf'),), value):
+                    cumulative += count
+                    le = '+Inf' if bound == float('inf') else _number(bound)
+                    lines.append(f'{name}_bucket{_labels(labels + (("le", le),))} {cumulative}')
+                lines.append(f'{name}_sum{_labels(labels)} {_number(value[-2])}')
+                lines.append(f'{name}_count{_labels(labels)} {value[-1]}')
+        return '\n'.join(lines) + '\n'
+
+
+def _number(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def _labels(labels):
+    if not labels:
+        return ''
+    escaped = (str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, value in labels)
+    return '{' + ','.join(f'{name}="{value}"' for (name, _), value in zip(labels, escaped)) + '}'
+
+
+# Process-wide registry the instrumented code records into
+metrics = Metrics()
@@ -48,6 +48,7 @@ class Contracts(db.Model):
     last_updated = db.Column(db.DateTime)
     price_native = db.Column(db.Float)
     price_usd = db.Column(db.Float)
+    liquidity_usd = db.Column(db.Float)
 
     def __repr__(self):
         return f'<Contract {self.contract_address}>'
@@ -63,6 +64,7 @@ class ContractLake(db.Model):
     last_updated = db.Column(db.DateTime)
     price_native = db.Column(db.Float)
     price_usd = db.Column(db.Float)  # I just added this
+    liquidity_usd = db.Column(db.Float)
 
     def __repr__(self):
         return f'<Contract {self.contract_address}>'
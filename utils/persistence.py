@@ -0,0 +1,171 @@
+import logging
+import os
+import threading
+from datetime import datetime
+
+# SQLAlchemy URL of the pool tables (postgresql://... in production, sqlite:///... locally); unset disables persistence
+DATABASE_URL = os.getenv('DATABASE_URL')
+# Rows per INSERT statement, keeps SQLite under its bound-parameter limit
+UPSERT_BATCH_SIZE = int(os.getenv('UPSERT_BATCH_SIZE', 500))
+# Tables every fetch's pools are upserted into: the latest state in contracts, mirrored to lake
+PERSIST_TABLES = ('contracts', 'lake')
+
+
+def normalize_database_url(url):
+    # Heroku/Railway style URLs use the scheme SQLAlchemy 1.4 dropped
+    if url and url.startswith('postgres://'):
+        return 'postgresql://' + url[len('postgres://'):]
+    return url
+
+
+def pool_row(pool, updated_at):
+    return {
+        'contract_address': pool.pool_address,
+        'base_token_address': pool.base_token,
+        'quote_token_address': pool.quote_token,
+        'chain_id': pool.chain_id,
+        'dex_id': pool.dex_id,
+        'last_updated': updated_at,
+        'price_native': pool.price_native,
+        'price_usd': pool.price_usd,
+        'liquidity_usd': pool.liquidity_usd,
+    }
+
+
+class PoolRepository:
+    """
+    Latest price and liquidity per pool in the `contracts` and `lake` tables.
+
+    A whole fetch is written with one INSERT ... ON CONFLICT (contract_address)
+    DO UPDATE per UPSERT_BATCH_SIZE rows, on PostgreSQL and SQLite alike.
+    Works on a plain SQLAlchemy engine, outside any Flask app context.
+    """
+
+    def __init__(self, url=DATABASE_URL, batch_size=UPSERT_BATCH_SIZE):
+        self.url = normalize_database_url(url)
+        self.batch_size = batch_size
+        self._engine = None
+        self._engine_lock = threading.Lock()
+        self.rows_upserted = 0
+        self.failures = 0
+
+    @property
+    def engine(self):
+        if self._engine is None:
+            with self._engine_lock:
+                if self._engine is None:
+                    from sqlalchemy import create_engine
+
+                    self._engine = create_engine(self.url, pool_pre_ping=True)
+        return self._engine
+
+    def _table(self, name):
+        from utils.models import ContractLake, Contracts
+
+        return {'contracts': Contracts, 'lake': ContractLake}[name].__table__
+
+    def create_tables(self):
+        """
+        Create the pool tables, and add the columns the models gained since a
+        deployed database created them (liquidity_usd), which create_all leaves out.
+        """
+        from utils.models import db
+
+        tables = [self._table('contracts'), self._table('lake')]
+        db.metadata.create_all(self.engine, tables=tables)
+        self.add_missing_columns(tables)
+
+    def add_missing_columns(self, tables):
+        """ALTER TABLE ... ADD COLUMN for each nullable model column a table lacks. Returns the columns added."""
+        from sqlalchemy import inspect
+
+        added = []
+        with self.engine.begin() as connection:
+            inspector = inspect(connection)
+            preparer = connection.dialect.identifier_preparer
+            # Workers starting together may race to add the same column
+            guard = 'IF NOT EXISTS ' if connection.dialect.name == 'postgresql' else ''
+            for table in tables:
+                existing = {column['name'] for column in inspector.get_columns(table.name)}
+                for column in table.columns:
+                    if column.name in existing or not column.nullable:
+                        continue
+                    connection.exec_driver_sql(
+                        f'ALTER TABLE {preparer.format_table(table)} ADD COLUMN {guard}'
+                        f'{preparer.format_column(column)} {column.type.compile(dialect=connection.dialect)}'
+                    )
+                    added.append(f'{table.name}.{column.name}')
+        if added:
+            logging.info(f'Added columns to the pool tables: {", ".join(added)}')
+        return added
+
+    def _insert(self, table):
+        if self.engine.dialect.name == 'postgresql':
+            from sqlalchemy.dialects.postgresql import insert
+        elif self.engine.dialect.name == 'sqlite':
+            from sqlalchemy.dialects.sqlite import insert
+        else:
+            raise ValueError(f'Bulk upsert is not supported on {self.engine.dialect.name}')
+        return insert(table)
+
+    def upsert_pools(self, pools, table='contracts', updated_at=None):
+        """
+        Insert or refresh one row per pool address in `table`, or in each of a sequence
+        of tables, all in one transaction; the last record of an address wins. Returns
+        the number of pools written.
+        """
+        updated_at = updated_at or datetime.utcnow()
+        # ON CONFLICT may not touch the same row twice in one statement
+        rows = list({pool.pool_address: pool_row(pool, updated_at) for pool in pools}.values())
+        if not rows:
+            return 0
+        tables = [self._table(name) for name in ((table,) if isinstance(table, str) else table)]
+        with self.engine.begin() as connection:
+            for table in tables:
+                for start in range(0, len(rows), self.batch_size):
+                    statement = self._insert(table).values(rows[start:start + self.batch_size])
+                    statement = statement.on_conflict_do_update(
+                        index_elements=[table.c.contract_address],
+                        set_={column: statement.excluded[column] for column in rows[0] if column != 'contract_address'},
+                    )
+                    connection.execute(statement)
+        self.rows_upserted += len(rows) * len(tables)
+        return len(rows)
+
+    def last_prices(self, addresses, table='contracts'):
+        """price_native per address for the addresses that have a row."""
+        from sqlalchemy import select
+
+        table = self._table(table)
+        addresses = list(addresses)
+        prices = {}
+        with self.engine.connect() as connection:
+            for start in range(0, len(addresses), self.batch_size):
+                query = select(table.c.contract_address, table.c.price_native).where(
+                    table.c.contract_address.in_(addresses[start:start + self.batch_size])
+                )
+                prices.update({address: price for address, price in connection.execute(query)})
+        return prices
+
+    def last_price(self, address, table='contracts'):
+        return self.last_prices([address], table).get(address)
+
+    def stats(self):
+        return {
+            'dialect': self.engine.dialect.name,
+            'rows_upserted': self.rows_upserted,
+            'failures': self.failures,
+        }
+
+
+def make_pool_repository(url=DATABASE_URL):
+    """The repository for DATABASE_URL with its tables created, or None when persistence is off or unreachable."""
+    if not url:
+        return None
+    repository = PoolRepository(url)
+    try:
+        repository.create_tables()
+    except Exception as e:
+        logging.warning(f'Pool persistence disabled, database unavailable: {e}')
+        return None
+    return repository
@@ -0,0 +1,155 @@
+import logging
+import os
+import tempfile
+import threading
+import time
+
+from utils.cache import CACHE_BACKEND, TTLCache, make_cache
+from utils.main_utils import fetch_and_cache_pairs, process_arbitrage_data, process_token_pairs
+from utils.rate_limiter import priority_scope
+from utils.snapshot_store import IncrementalScanner
+
+POLLER_ENABLED = os.getenv('POLLER_ENABLED', 'false').lower() in ('1', 'true', 'yes')
+# Comma-separated contract addresses kept warm by the poller
+WATCHLIST = [address.strip() for address in os.getenv('WATCHLIST', '7vfCXTUXx5WJV5JADk17DUJ4ksgau7utNKj4b963voxs').split(',') if address.strip()]
+POLL_INTERVAL = float(os.getenv('POLL_INTERVAL', 30))
+# Snapshots older than this are not served
+POLL_MAX_STALENESS = float(os.getenv('POLL_MAX_STALENESS', 3 * POLL_INTERVAL))
+POLLER_LOCK_PATH = os.getenv('POLLER_LOCK_PATH', os.path.join(tempfile.gettempdir(), 'arbscreener-poller.lock'))
+# Where snapshots are kept: the shared CACHE_BACKEND, or SQLite when that is the per-process memory cache,
+# since only the worker holding the lock polls and every worker serves what it stored
+POLLER_CACHE_BACKEND = os.getenv('POLLER_CACHE_BACKEND') or ('sqlite' if CACHE_BACKEND == 'memory' else CACHE_BACKEND)
+
+# (initial_investment, slippage, fee_percentage) scenarios precomputed for every watched address
+DEFAULT_SCENARIOS = [(10000.0, 0.0005, 0.0003)]
+
+
+def snapshot_key(address, initial_investment, slippage, fee_percentage):
+    return ('snapshot', address, float(initial_investment), float(slippage), float(fee_percentage))
+
+
+class MarketPoller:
+    """
+    Background thread refreshing a watchlist of contracts every `interval`
+    seconds. For each contract it stores the latest `process_token_pairs`
+    snapshot and the `process_arbitrage_data` results of each scenario in a
+    cache shared across workers (see POLLER_CACHE_BACKEND).
+
+    Each (contract, scenario) keeps an IncrementalScanner, so a refresh only
+    re-evaluates the pools whose prices moved since the previous one.
+
+    Only the worker holding the lock file polls; the others keep retrying the
+    lock so polling resumes if that worker exits.
+    """
+
+    def __init__(self, watchlist=None, interval=POLL_INTERVAL, scenarios=None,
+                 max_staleness=POLL_MAX_STALENESS, lock_path=POLLER_LOCK_PATH, store=None):
+        self.watchlist = list(WATCHLIST if watchlist is None else watchlist)
+        self.interval = interval
+        self.scenarios = list(DEFAULT_SCENARIOS if scenarios is None else scenarios)
+        self.max_staleness = max_staleness
+        self.lock_path = lock_path
+        self.store = store if store is not None else make_cache('snapshots', backend=POLLER_CACHE_BACKEND,
+                                                                ttl=max_staleness)
+        self._stop = threading.Event()
+        self._thread = None
+        self._lock_file = None
+        self._scanners = {}
+        self.refreshes = 0
+        self.failures = 0
+
+    def start(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        if isinstance(self.store, TTLCache) and self.lock_path is not None:
+            logging.warning('Market poller snapshots are kept in process memory: only the worker holding the '
+                            'poller lock will serve them. Set POLLER_CACHE_BACKEND to sqlite or redis.')
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name='market-poller', daemon=True)
+        self._thread.start()
+        logging.info(f'Market poller started for {len(self.watchlist)} contracts every {self.interval}s')
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.interval)
+        self._release_leadership()
+
+    def _acquire_leadership(self):
+        if self._lock_file is not None:
+            return True
+        if self.lock_path is None:
+            return True
+        import fcntl
+
+        lock_file = open(self.lock_path, 'a')
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            lock_file.close()
+            return False
+        self._lock_file = lock_file
+        return True
+
+    def _release_leadership(self):
+        if self._lock_file is not None:
+            self._lock_file.close()
+            self._lock_file = None
+
+    def _run(self):
+        while not self._stop.is_set():
+            if self._acquire_leadership():
+                self.refresh_all()
+            self._stop.wait(self.interval)
+
+    def refresh_all(self):
+        for address in self.watchlist:
+            if self._stop.is_set():
+                break
+            try:
+                self.refresh(address)
+            except Exception as e:
+                self.failures += 1
+                logging.error(f'Market poller failed to refresh {address}: {e}')
+
+    def refresh(self, address):
+        """Fetch one contract and precompute its scenarios, at low upstream priority."""
+        with priority_scope('low'):
+            fetched_at = time.time()
+            search = fetch_and_cache_pairs(address)
+            token_pairs = process_token_pairs(search) if search else []
+            self.store.set(('pairs', address), {'fetched_at': fetched_at, 'token_pairs': token_pairs})
+            for initial_investment, slippage, fee_percentage in self.scenarios:
+                scanner = self._scanners.setdefault((address, initial_investment, slippage, fee_percentage),
+                                                    IncrementalScanner())
+                results = process_arbitrage_data(None, initial_investment, slippage, fee_percentage,
+                                                 search_address=address, scanner=scanner)
+                self.store.set(snapshot_key(address, initial_investment, slippage, fee_percentage),
+                               {'fetched_at': fetched_at, 'results': results})
+        self.refreshes += 1
+
+    def latest(self, address, initial_investment, slippage, fee_percentage):
+        """The precomputed results and their fetch time, or None if missing or too stale."""
+        snapshot = self.store.get(snapshot_key(address, initial_investment, slippage, fee_percentage))
+        if snapshot is None or time.time() - snapshot['fetched_at'] > self.max_staleness:
+            return None
+        return snapshot['results'], snapshot['fetched_at']
+
+    def latest_pairs(self, address):
+        snapshot = self.store.get(('pairs', address))
+        if snapshot is None or time.time() - snapshot['fetched_at'] > self.max_staleness:
+            return None
+        return snapshot['token_pairs'], snapshot['fetched_at']
+
+    def stats(self):
+        return {
+            'enabled': self._thread is not None and self._thread.is_alive(),
+            'leader': self._lock_file is not None,
+            'watchlist': len(self.watchlist),
+            'interval': self.interval,
+            'refreshes': self.refreshes,
+            'failures': self.failures,
+        }
+
+
+poller = MarketPoller()
@@ -0,0 +1,194 @@
+import contextvars
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+from utils.metrics import metrics
+
+RATE_LIMIT_PER_MINUTE = float(os.getenv('RATE_LIMIT_PER_MINUTE', 60))
+RATE_LIMIT_BURST = float(os.getenv('RATE_LIMIT_BURST', 10))
+# Longest a caller waits for a token before RateLimitExceeded; unset waits as long as needed
+RATE_LIMIT_MAX_WAIT = float(os.getenv('RATE_LIMIT_MAX_WAIT')) if os.getenv('RATE_LIMIT_MAX_WAIT') else None
+# SQLite file holding the bucket, set it to share one budget between worker processes
+RATE_LIMIT_STATE_PATH = os.getenv('RATE_LIMIT_STATE_PATH')
+
+# Share of the burst capacity a priority class must leave in the bucket
+PRIORITY_RESERVES = {
+    'high': 0.0,
+    'normal': 0.2,
+    'low': 0.5,
+}
+
+request_priority = contextvars.ContextVar('request_priority', default='normal')
+
+
+class RateLimitExceeded(Exception):
+    """Raised when a token is not available within the caller's wait limit."""
+
+    def __init__(self, priority, wait):
+        super().__init__(f'Rate limit reached for {priority} priority, next token in {wait:.2f}s')
+        self.priority = priority
+        self.wait = wait
+
+
+@contextmanager
+def priority_scope(priority):
+    """Run the enclosed upstream calls under a priority class."""
+    token = request_priority.set(priority)
+    try:
+        yield
+    finally:
+        request_priority.reset(token)
+
+
+class MemoryBucketState:
+    """Bucket level for a single process."""
+
+    def __init__(self, capacity):
+        self._lock = threading.Lock()
+        self._tokens = capacity
+        self._updated_at = None
+
+    @contextmanager
+    def transaction(self):
+        with self._lock:
+            state = {'tokens': self._tokens, 'updated_at': self._updated_at}
+            yield state
+            self._tokens = state['tokens']
+            self._updated_at = state['updated_at']
+
+
+class SQLiteBucketState:
+    """Bucket level in a SQLite file, locked with BEGIN IMMEDIATE so processes share it."""
+
+    def __init__(self, capacity, path=RATE_LIMIT_STATE_PATH, name='dexscreener'):
+        self.capacity = capacity
+        self.path = path
+        self.name = name
+        self._local = threading.local()
+
+    def _connection(self):
+        connection = getattr(self._local, 'connection', None)
+        if connection is None or self._local.pid != os.getpid():
+            connection = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute(
+                'CREATE TABLE IF NOT EXISTS token_buckets '
+                '(name TEXT PRIMARY KEY, tokens REAL NOT NULL, updated_at REAL)'
+            )
+            connection.execute('INSERT OR IGNORE INTO token_buckets (name, tokens, updated_at) VALUES (?, ?, NULL)',
+                               (self.name, self.capacity))
+            self._local.connection = connection
+            self._local.pid = os.getpid()
+        return connection
+
+    @contextmanager
+    def transaction(self):
+        connection = self._connection()
+        connection.execute('BEGIN IMMEDIATE')
+        try:
+            tokens, updated_at = connection.execute(
+                'SELECT tokens, updated_at FROM token_buckets WHERE name = ?', (self.name,)
+            ).fetchone()
+            state = {'tokens': tokens, 'updated_at': updated_at}
+            yield state
+            connection.execute('UPDATE token_buckets SET tokens = ?, updated_at = ? WHERE name = ?',
+                               (state['tokens'], state['updated_at'], self.name))
+            connection.execute('COMMIT')
+        except BaseException:
+            connection.execute('ROLLBACK')
+            raise
+
+
+class TokenBucket:
+    """
+    Token-bucket limiter: `rate_per_minute` tokens refill continuously up to
+    `burst`. Lower priority classes must leave part of the burst in the bucket
+    (see PRIORITY_RESERVES), so interactive calls are served first when the
+    budget runs low. Waits and rejections are counted per priority.
+    """
+
+    def __init__(self, rate_per_minute=RATE_LIMIT_PER_MINUTE, burst=RATE_LIMIT_BURST, state=None,
+                 reserves=None, clock=time.time, sleep=time.sleep):
+        self.rate = rate_per_minute / 60.0
+        self.capacity = float(burst)
+        self.state = state if state is not None else MemoryBucketState(self.capacity)
+        self.reserves = dict(PRIORITY_RESERVES if reserves is None else reserves)
+        self.clock = clock
+        self.sleep = sleep
+        self._stats_lock = threading.Lock()
+        self._stats = {}
+
+    @classmethod
+    def from_env(cls):
+        """Bucket configured by the RATE_LIMIT_* settings, shared between processes when a state path is set."""
+        state = SQLiteBucketState(RATE_LIMIT_BURST, RATE_LIMIT_STATE_PATH) if RATE_LIMIT_STATE_PATH else None
+        return cls(RATE_LIMIT_PER_MINUTE, RATE_LIMIT_BURST, state=state)
+
+    def _try_take(self, tokens, priority):
+        """Take tokens if the class's reserve allows it; otherwise return the seconds until it would."""
+        floor = min(self.reserves.get(priority, 0.0) * self.capacity, self.capacity - tokens)
+        with self.state.transaction() as state:
+            now = self.clock()
+            level = state['tokens']
+            if state['updated_at'] is not None:
+                level = min(self.capacity, level + (now - state['updated_at']) * self.rate)
+            state['updated_at'] = now
+            state['tokens'] = level
+            if level - tokens >= floor - 1e-9:
+                state['tokens'] = level - tokens
+                return 0.0
+            return (tokens + floor - level) / self.rate
+
+    def acquire(self, tokens=1, priority=None, block=True, timeout=None):
+        """
+        Take tokens from the bucket and return the seconds spent waiting.
+
+        With block=False, or when the wait would exceed `timeout`, raises
+        RateLimitExceeded instead of waiting.
+        """
+        priority = priority or request_priority.get()
+        waited = 0.0
+        while True:
+            wait = self._try_take(tokens, priority)
+            if wait <= 0:
+                self._record(priority, waited=waited)
+                return waited
+            if not block or (timeout is not None and waited + wait > timeout):
+                self._record(priority, rejected=True)
+                raise RateLimitExceeded(priority, wait)
+            self.sleep(wait)
+            waited += wait
+
+    def __call__(self):
+        """Fetch hook: one token at the ambient priority, waiting up to RATE_LIMIT_MAX_WAIT."""
+        self.acquire(timeout=RATE_LIMIT_MAX_WAIT)
+
+    def _record(self, priority, waited=0.0, rejected=False):
+        if rejected:
+            metrics.inc('arbscreener_rate_limit_rejections_total', priority=priority)
+        else:
+            metrics.observe('arbscreener_rate_limit_wait_seconds', waited, priority=priority)
+        with self._stats_lock:
+            stats = self._stats.setdefault(priority, {
+                'acquired': 0, 'waits': 0, 'wait_seconds': 0.0, 'max_wait_seconds': 0.0, 'rejected': 0,
+            })
+            if rejected:
+                stats['rejected'] += 1
+                return
+            stats['acquired'] += 1
+            if waited > 0:
+                stats['waits'] += 1
+                stats['wait_seconds'] += waited
+                stats['max_wait_seconds'] = max(stats['max_wait_seconds'], waited)
+
+    def stats(self):
+        with self._stats_lock:
+            return {
+                'rate_per_minute': self.rate * 60,
+                'burst': self.capacity,
+                'shared': isinstance(self.state, SQLiteBucketState),
+                'priorities': {priority: dict(stats) for priority, stats in self._stats.items()},
+            }
@@ -0,0 +1,283 @@
+import argparse
+import contextlib
+import json
+import logging
+import sys
+import time
+from typing import Iterable, Iterator, List, Tuple
+
+from dexscreener.models import TokenPair
+
+from src.models import to_serializable
+
+# Snapshots closer together than this are merged into one tick when replaying the Parquet history
+REPLAY_TICK_INTERVAL = 60.0
+
+
+def read_jsonl_snapshots(path) -> Iterator[Tuple[float, List[TokenPair]]]:
+    """
+    (timestamp, pairs) per line of a JSON lines recording, where each line is
+    {"timestamp": <unix seconds>, "pairs": [<Dexscreener pair JSON>, ...]}.
+    """
+    with open(path) as f:
+        for number, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            snapshot = json.loads(line)
+            try:
+                yield float(snapshot['timestamp']), [TokenPair(**pair) for pair in snapshot['pairs']]
+            except (KeyError, TypeError, ValueError) as e:
+                raise ValueError(f'{path}:{number}: not a pair snapshot: {e}') from e
+
+
+def write_jsonl_snapshot(f, timestamp, pairs) -> None:
+    """Append one snapshot of TokenPairs to an open JSON lines recording."""
+    f.write(json.dumps({'timestamp': timestamp, 'pairs': [pair_json(pair) for pair in pairs]}) + '\n')
+
+
+def pair_json(pair: TokenPair) -> dict:
+    """The Dexscreener JSON of a TokenPair, on pydantic 1 or 2."""
+    if hasattr(pair, 'model_dump'):
+        return pair.model_dump(mode='json', by_alias=True)
+    return json.loads(pair.json(by_alias=True))
+
+
+def history_pair(row: dict) -> TokenPair:
+    """A TokenPair rebuilt from a utils.history row; token names fall back to their addresses."""
+    counts = {'buys': 0, 'sells': 0}
+    periods = {'m5': 0.0, 'h1': 0.0, 'h6': 0.0, 'h24': 0.0}
+    return TokenPair(**{
+        'chainId': row['chain_id'],
+        'dexId': row['dex_id'],
+        'url': f"https://dexscreener.com/{row['chain_id']}/{row['pool_address']}",
+        'pairAddress': row['pool_address'],
+        'baseToken': {'address': row['base_token'], 'name': row['base_token'], 'symbol': row['base_token']},
+        'quoteToken': {'address': row['quote_token'], 'name': row['quote_token'], 'symbol': row['quote_token']},
+        'priceNative': row['price_native'],
+        'priceUsd': row['price_usd'],
+        'txns': {'m5': counts, 'h1': counts, 'h6': counts, 'h24': counts},
+        'volume': periods,
+        'priceChange': periods,
+        'liquidity': {'usd': row['liquidity_usd'], 'base': row['liquidity_base'], 'quote': row['liquidity_quote']},
+    })
+
+
+def read_history_snapshots(root, chain_id=None, start=None, end=None,
+                           tick_interval=REPLAY_TICK_INTERVAL) -> Iterator[Tuple[float, List[TokenPair]]]:
+    """
+    (timestamp, pairs) from the Parquet pool history, one snapshot per
+    `tick_interval` seconds of fetches, stamped with the last fetch it holds.
+    """
+    from utils.history import PoolHistoryStore
+
+    table = PoolHistoryStore(root).scan(chain_id=chain_id, start=start, end=end)
+    tick_start, tick_end, pairs = None, None, []
+    for row in table.to_pylist():
+        fetched_at = row['fetched_at'].timestamp()
+        if tick_start is not None and fetched_at - tick_start >= tick_interval:
+            yield tick_end, pairs
+            tick_start, pairs = None, []
+        if tick_start is None:
+            tick_start = fetched_at
+        tick_end = fetched_at
+        pairs.append(history_pair(row))
+    if pairs:
+        yield tick_end, pairs
+
+
+def read_snapshots(path, **kwargs) -> Iterator[Tuple[float, List[TokenPair]]]:
+    """JSON lines recordings by their .jsonl/.json extension, anything else as a Parquet history root."""
+    if str(path).endswith(('.jsonl', '.json')):
+        return read_jsonl_snapshots(path)
+    return read_history_snapshots(path, **kwargs)
+
+
+class ReplayFetcher:
+    """
+    Offline stand-in for DexscreenerFetcher answering lookups from the market
+    as recorded so far. Every pool keeps its latest recorded state, so pools a
+    snapshot does not mention keep the values of an earlier one.
+
+    Searches match whole terms of the query (", " separated) against pair and
+    token addresses and token symbols or names, case-insensitively.
+    """
+
+    def __init__(self) -> None:
+        self.pairs = {}
+        self._by_term = {}
+        self._by_token = {}
+        self.requests = 0
+
+    def update(self, pairs: Iterable[TokenPair]) -> None:
+        for pair in pairs:
+            self.pairs[pair.pair_address] = pair
+            terms = {pair.pair_address, pair.base_token.address, pair.quote_token.address,
+                     pair.base_token.symbol, pair.quote_token.symbol, pair.base_token.name, pair.quote_token.name}
+            for term in terms:
+                self._by_term.setdefault(term.lower(), set()).add(pair.pair_address)
+            for token in (pair.base_token.address, pair.quote_token.address):
+                self._by_token.setdefault(token, set()).add(pair.pair_address)
+
+    def _lookup(self, addresses) -> List[TokenPair]:
+        # Sorted so that every replay of a recording sees pairs in the same order
+        return [self.pairs[address] for address in sorted(addresses)]
+
+    def search_pairs(self, search_query: str) -> List[TokenPair]:
+        self.requests += 1
+        matches = set()
+        for term in search_query.split(','):
+            matches |= self._by_term.get(term.strip().lower(), set())
+        return self._lookup(matches)
+
+    def get_token_pairs(self, address: str) -> List[TokenPair]:
+        self.requests += 1
+        return self._lookup(self._by_token.get(address, ()))
+
+    def map(self, func, items) -> list:
+        # In order on the calling thread, keeping replays deterministic
+        return [func(item) for item in items]
+
+    def close(self) -> None:
+        pass
+
+
+class SimulatedClock:
+    """A clock that only moves when the replay advances it to the next snapshot."""
+
+    def __init__(self, now: float = 0.0) -> None:
+        self.now = now
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@contextlib.contextmanager
+def replay_environment(replay_fetcher, clock, keep_cache=False):
+    """
+    Point utils.main_utils at `replay_fetcher` with fresh pool snapshots and
+    no history or database recording, restoring everything on exit.
+    The pair cache runs on the simulated clock; it is emptied before each
+    tick unless `keep_cache`, in which case it expires by PAIR_CACHE_TTL as it
+    would live.
+    """
+    import utils.main_utils as main_utils
+    from utils.cache import TTLCache
+    from utils.snapshot_store import PoolSnapshotStore
+
+    pair_cache = main_utils.pair_cache
+    if not isinstance(pair_cache, TTLCache):
+        raise ValueError('Replays need the in-memory pair cache, set CACHE_BACKEND=memory')
+    saved = {name: getattr(main_utils, name) for name in ('fetcher', 'pool_snapshots', 'history', 'pool_repository')}
+    saved_clock = pair_cache.clock
+    main_utils.fetcher = replay_fetcher
+    main_utils.pool_snapshots = PoolSnapshotStore()
+    main_utils.search_scanners.clear()
+    main_utils.history = None
+    main_utils.pool_repository = None
+    pair_cache.clock = clock
+    pair_cache.clear()
+
+    def before_tick():
+        if not keep_cache:
+            pair_cache.clear()
+
+    try:
+        yield before_tick
+    finally:
+        for name, value in saved.items():
+            setattr(main_utils, name, value)
+        pair_cache.clock = saved_clock
+        pair_cache.clear()
+        main_utils.search_scanners.clear()
+
+
+class ReplayReport:
+    """Opportunities found at each replayed tick, and how fast the ticks were processed."""
+
+    def __init__(self) -> None:
+        self.ticks = []
+        self.elapsed = 0.0
+
+    @property
+    def snapshots(self) -> int:
+        return len(self.ticks)
+
+    @property
+    def snapshots_per_second(self) -> float:
+        return self.snapshots / self.elapsed if self.elapsed else 0.0
+
+    def summary(self) -> dict:
+        return {
+            'snapshots': self.snapshots,
+            'opportunities': sum(len(opportunities) for _, opportunities in self.ticks),
+            'elapsed': round(self.elapsed, 6),
+            'snapshots_per_second': round(self.snapshots_per_second, 3),
+        }
+
+
+def replay(snapshots, search_address, initial_investment=10000, slippage=0.0005, fee_percentage=0.0003,
+           limit=None, keep_cache=False, on_tick=None) -> ReplayReport:
+    """
+    Run process_arbitrage_data for `search_address` once per (timestamp, pairs)
+    snapshot, on simulated time and without network access.
+    on_tick(tick, timestamp, opportunities) is called after each snapshot.
+    Only pipeline time counts towards throughput, not reading the recording.
+    """
+    from utils.main_utils import RESULT_LIMIT, process_arbitrage_data
+
+    limit = RESULT_LIMIT if limit is None else limit
+    replay_fetcher = ReplayFetcher()
+    clock = SimulatedClock()
+    report = ReplayReport()
+    with replay_environment(replay_fetcher, clock, keep_cache) as before_tick:
+        for tick, (timestamp, pairs) in enumerate(snapshots):
+            replay_fetcher.update(pairs)
+            clock.now = timestamp
+            before_tick()
+            started = time.perf_counter()
+            opportunities = process_arbitrage_data(None, initial_investment, slippage, fee_percentage,
+                                                   search_address=search_address, limit=limit)
+            report.elapsed += time.perf_counter() - started
+            report.ticks.append((timestamp, opportunities))
+            if on_tick is not None:
+                on_tick(tick, timestamp, opportunities)
+    return report
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(
+        description='Replay recorded pair snapshots through process_arbitrage_data, offline.')
+    parser.add_argument('snapshots', help='JSON lines recording (.jsonl) or HISTORY_PATH root of the Parquet history')
+    parser.add_argument('--search', required=True, help='contract address searched at every tick')
+    parser.add_argument('--investment', type=float, default=10000)
+    parser.add_argument('--slippage', type=float, default=0.0005)
+    parser.add_argument('--fee', type=float, default=0.0003)
+    parser.add_argument('--limit', type=int, default=None, help='opportunities kept per tick (default RESULT_LIMIT)')
+    parser.add_argument('--chain', default=None, help='Parquet history only: replay this chain')
+    parser.add_argument('--tick-interval', type=float, default=REPLAY_TICK_INTERVAL,
+                        help='Parquet history only: seconds of fetches merged into one tick')
+    parser.add_argument('--keep-cache', action='store_true',
+                        help='serve repeat lookups from the pair cache within PAIR_CACHE_TTL of simulated time')
+    parser.add_argument('--details', action='store_true', help='print every opportunity, not only the best')
+    args = parser.parse_args(argv)
+
+    logging.getLogger().setLevel(logging.WARNING)
+    kwargs = {} if str(args.snapshots).endswith(('.jsonl', '.json')) else {
+        'chain_id': args.chain, 'tick_interval': args.tick_interval}
+
+    def print_tick(tick, timestamp, opportunities):
+        line = {'tick': tick, 'timestamp': timestamp, 'opportunities': len(opportunities)}
+        if args.details:
+            line['results'] = opportunities
+        elif opportunities:
+            line['best'] = opportunities[0]
+        print(json.dumps(line, default=to_serializable))
+
+    report = replay(read_snapshots(args.snapshots, **kwargs), args.search, args.investment, args.slippage,
+                    args.fee, limit=args.limit, keep_cache=args.keep_cache, on_tick=print_tick)
+    print(json.dumps(report.summary()), file=sys.stderr)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
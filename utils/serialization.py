@@ -0,0 +1,99 @@
+import gzip
+import json
+import os
+
+from flask import Response, request
+
+from src.models import to_serializable
+
+try:
+    import orjson  # Several times faster than the stdlib encoder
+except ImportError:
+    orjson = None
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Response bodies shorter than this many bytes are sent uncompressed
+COMPRESS_MIN_SIZE = int(os.getenv('COMPRESS_MIN_SIZE', 1024))
+GZIP_LEVEL = int(os.getenv('GZIP_LEVEL', 6))
+# Brotli quality 0-11; 5 compresses JSON better than gzip -6 in about the same time
+BROTLI_QUALITY = int(os.getenv('BROTLI_QUALITY', 5))
+
+# Opportunity schemas clients can ask for with `schema=`: numbers (the default), or the preformatted flat dict
+SCHEMAS = ('lean', 'full')
+
+
+def dumps(value):
+    """
+    Compact JSON bytes of `value`; opportunity records go out in their lean form.
+    Without orjson a NaN or infinity outside a record raises ValueError rather than
+    producing invalid JSON.
+    """
+    if orjson is not None:
+        return orjson.dumps(value, default=to_serializable, option=orjson.OPT_SERIALIZE_NUMPY)
+    return json.dumps(value, default=to_serializable, separators=(',', ':'), allow_nan=False).encode()
+
+
+def opportunity_payload(opportunities, schema='lean'):
+    """The opportunities as served in `schema`; lean records are built by `dumps` itself."""
+    if schema == 'full':
+        return [opportunity.to_dict() for opportunity in opportunities]
+    return list(opportunities)
+
+
+def accepted_encodings(header):
+    """{coding: q} of an Accept-Encoding header."""
+    accepted = {}
+    for part in header.split(','):
+        coding, _, params = part.strip().partition(';')
+        if not coding:
+            continue
+        q = 1.0
+        for param in params.split(';'):
+            name, _, value = param.strip().partition('=')
+            if name == 'q':
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        accepted[coding.strip().lower()] = q
+    return accepted
+
+
+def choose_encoding(header):
+    """
+    'br', 'gzip' or None: of the codings this process can produce, the one the
+    client gives the highest q-value, br on a tie. None when the client prefers
+    identity over both.
+    """
+    accepted = accepted_encodings(header or '')
+    wildcard = accepted.get('*', 0.0)
+    codings = ('br', 'gzip') if brotli is not None else ('gzip',)
+    q, _, coding = max((accepted.get(coding, wildcard), coding == 'br', coding) for coding in codings)
+    if q <= 0 or accepted.get('identity', 0.0) > q:
+        return None
+    return coding
+
+
+def compress(body, coding):
+    if coding == 'br':
+        return brotli.compress(body, quality=BROTLI_QUALITY)
+    return gzip.compress(body, compresslevel=GZIP_LEVEL)
+
+
+def json_response(value, status=200, headers=None):
+    """
+    A JSON response of `value`, compressed with brotli or gzip when the request
+    accepts it and the body is worth it.
+    """
+    body = dumps(value)
+    response = Response(content_type='application/json', status=status, headers=headers)
+    response.vary.add('Accept-Encoding')
+    coding = choose_encoding(request.headers.get('Accept-Encoding')) if len(body) >= COMPRESS_MIN_SIZE else None
+    if coding is not None:
+        body = compress(body, coding)
+        response.headers['Content-Encoding'] = coding
+    response.set_data(body)
+    return response
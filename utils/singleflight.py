@@ -0,0 +1,73 @@
+import threading
+from functools import wraps
+
+
+class _Call:
+    __slots__ = ('done', 'result', 'error', 'waiters')
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.waiters = 0
+
+
+class SingleFlight:
+    """
+    Collapse concurrent calls sharing a key into one execution: the first
+    caller runs the function, callers arriving while it runs wait and get the
+    same result (or exception). Nothing is kept once the call finishes.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+        self.executions = 0
+        self.shared = 0
+
+    def do(self, key, func, *args, **kwargs):
+        with self._lock:
+            call = self._calls.get(key)
+            if call is None:
+                call = self._calls[key] = _Call()
+                self.executions += 1
+                leader = True
+            else:
+                call.waiters += 1
+                self.shared += 1
+                leader = False
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = func(*args, **kwargs)
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+    def in_flight(self):
+        with self._lock:
+            return len(self._calls)
+
+    def stats(self):
+        with self._lock:
+            return {'executions': self.executions, 'shared': self.shared, 'in_flight': len(self._calls)}
+
+
+def single_flight(group, key_func):
+    """Decorator running concurrent calls with the same key_func(*args, **kwargs) once through `group`."""
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            return group.do(key_func(*args, **kwargs), func, *args, **kwargs)
+        return wrapper
+    return decorator
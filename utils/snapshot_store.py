@@ -0,0 +1,197 @@
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from utils.arbitrage import (
+    find_arbitrage_opportunities_indexed,
+    index_pairs_by_token,
+    iter_touching_positions,
+    liquid_pairs,
+    opportunity_for,
+)
+from utils.metrics import metrics
+
+# Relative move in price_native or liquidity that counts as a change
+PRICE_CHANGE_THRESHOLD = float(os.getenv('PRICE_CHANGE_THRESHOLD', 0.001))
+# Most pools (and, separately, search queries) a PoolSnapshotStore keeps; the least recently used go first
+SNAPSHOT_STORE_MAXSIZE = int(os.getenv('SNAPSHOT_STORE_MAXSIZE', 50000))
+
+
+def has_moved(old, new, threshold=PRICE_CHANGE_THRESHOLD):
+    """True when new differs from old by more than `threshold`, relative to the larger of the two."""
+    old, new = float(old or 0.0), float(new or 0.0)
+    if old == new:
+        return False
+    return abs(new - old) / max(abs(old), abs(new)) > threshold
+
+
+def pair_has_moved(old_pair, new_pair, threshold=PRICE_CHANGE_THRESHOLD):
+    """Compare two `process_token_pairs` entries for the same pool."""
+    return any(has_moved(getattr(old_pair, key), getattr(new_pair, key), threshold)
+               for key in ('price_native', 'liquidity_usd', 'liquidity_base', 'liquidity_quote'))
+
+
+class PoolSnapshot:
+    __slots__ = ('price_native', 'liquidity_usd', 'details', 'updated_at')
+
+    def __init__(self, price_native, liquidity_usd, details, updated_at):
+        self.price_native = price_native
+        self.liquidity_usd = liquidity_usd
+        self.details = details
+        self.updated_at = updated_at
+
+
+class PoolSnapshotStore:
+    """
+    Last-seen price_native and liquidity of every pool, plus the pool
+    addresses each search query returned, so unchanged data can be reused.
+    Pools and queries are each bounded to `maxsize` entries, least recently used evicted first.
+    """
+
+    def __init__(self, threshold=PRICE_CHANGE_THRESHOLD, maxsize=SNAPSHOT_STORE_MAXSIZE):
+        self.threshold = threshold
+        self.maxsize = maxsize
+        self._lock = threading.Lock()
+        self._pools = OrderedDict()
+        self._queries = OrderedDict()
+        self.evictions = 0
+
+    def _put(self, entries, key, value):
+        entries[key] = value
+        entries.move_to_end(key)
+        while len(entries) > self.maxsize:
+            entries.popitem(last=False)
+            self.evictions += 1
+
+    def _snapshot(self, pool_address):
+        snapshot = self._pools.get(pool_address)
+        if snapshot is not None:
+            self._pools.move_to_end(pool_address)
+        return snapshot
+
+    def record(self, pool_address, price_native, liquidity_usd, details=None):
+        with self._lock:
+            self._put(self._pools, pool_address, PoolSnapshot(float(price_native or 0.0), float(liquidity_usd or 0.0),
+                                                              details, time.time()))
+
+    def record_query(self, query, pool_addresses):
+        with self._lock:
+            self._put(self._queries, query, list(pool_addresses))
+
+    def last_price(self, pool_address):
+        with self._lock:
+            snapshot = self._snapshot(pool_address)
+        return None if snapshot is None else snapshot.price_native
+
+    def _moved(self, snapshot, price_native, liquidity_usd):
+        if snapshot is None or has_moved(snapshot.price_native, price_native, self.threshold):
+            return True
+        return liquidity_usd is not None and has_moved(snapshot.liquidity_usd, liquidity_usd, self.threshold)
+
+    def is_changed(self, pool_address, price_native, liquidity_usd=None):
+        """True for unknown pools and pools that moved past the threshold since they were recorded."""
+        with self._lock:
+            return self._moved(self._snapshot(pool_address), price_native, liquidity_usd)
+
+    def unchanged_details(self, pool_address, price_native, liquidity_usd=None):
+        """The stored details of a pool that has not moved past the threshold, otherwise None."""
+        with self._lock:
+            snapshot = self._snapshot(pool_address)
+            if self._moved(snapshot, price_native, liquidity_usd):
+                return None
+            return snapshot.details
+
+    def details_for_query(self, query):
+        """Stored details of the pools a query last returned, or None if the query is unknown."""
+        with self._lock:
+            addresses = self._queries.get(query)
+            if addresses is None:
+                return None
+            self._queries.move_to_end(query)
+            snapshots = [self._snapshot(address) for address in addresses]
+            return [snapshot.details for snapshot in snapshots
+                    if snapshot is not None and snapshot.details is not None]
+
+    def __len__(self):
+        return len(self._pools)
+
+
+class IncrementalScanner:
+    """
+    Two-pool scan for repeated polls of the same search. Pools whose price
+    or liquidity moved past the threshold (or that are new) are re-evaluated
+    against their neighbours; opportunities between unchanged pools are
+    reused, so the work per poll follows the churn rather than the market size.
+
+    Unchanged pools keep the values they were last evaluated with, and the
+    result equals a full scan over those values. Concurrent scans take turns.
+    """
+
+    def __init__(self, threshold=PRICE_CHANGE_THRESHOLD):
+        self.threshold = threshold
+        self._lock = threading.Lock()
+        self._pairs = {}
+        self._opportunities = {}
+        self._params = None
+        self.last_changed = 0
+        self.last_evaluated = 0
+
+    def scan(self, token_pairs, slippage, fee_percentage, initial_investment):
+        with self._lock:
+            return self._scan(token_pairs, slippage, fee_percentage, initial_investment)
+
+    def _scan(self, token_pairs, slippage, fee_percentage, initial_investment):
+        params = (slippage, fee_percentage, initial_investment)
+        addresses = [pair.pool_address for pair in token_pairs]
+        if params != self._params or not self._pairs or len(set(addresses)) != len(addresses):
+            return self._full_scan(token_pairs, params)
+
+        effective_pairs = []
+        changed = set()
+        for pair in token_pairs:
+            previous = self._pairs.get(pair.pool_address)
+            if previous is None or pair_has_moved(previous, pair, self.threshold):
+                changed.add(pair.pool_address)
+                effective_pairs.append(pair)
+            else:
+                effective_pairs.append(previous)
+        stale = changed | (set(self._pairs) - set(addresses))
+
+        for key in [key for key in self._opportunities if key[0] in stale or key[1] in stale]:
+            del self._opportunities[key]
+
+        parsed = liquid_pairs(effective_pairs)
+        by_base, by_quote = index_pairs_by_token(parsed)
+        changed_positions = [n for n, pair in enumerate(parsed) if pair.pool_address in changed]
+        evaluated = 0
+        for i, j in iter_touching_positions(parsed, by_base, by_quote, changed_positions):
+            evaluated += 1
+            opportunity = opportunity_for(parsed[i], parsed[j], *params)
+            if opportunity is not None:
+                self._opportunities[(parsed[i].pool_address, parsed[j].pool_address)] = opportunity
+
+        self._pairs = {pair.pool_address: pair for pair in effective_pairs}
+        self.last_changed = len(changed)
+        self.last_evaluated = evaluated
+        logging.info(f'Incremental scan: {len(changed)} of {len(token_pairs)} pools changed, '
+                     f'{evaluated} pair combinations re-evaluated.')
+        metrics.inc('arbscreener_pair_combinations_total', evaluated, scan='incremental')
+
+        positions = {address: n for n, address in enumerate(addresses)}
+        keys = sorted(self._opportunities, key=lambda key: (positions[key[0]], positions[key[1]]))
+        return [self._opportunities[key] for key in keys]
+
+    def _full_scan(self, token_pairs, params):
+        slippage, fee_percentage, initial_investment = params
+        opportunities = find_arbitrage_opportunities_indexed(token_pairs, slippage, fee_percentage, initial_investment)
+        self._params = params
+        self._pairs = {pair.pool_address: pair for pair in token_pairs}
+        self._opportunities = {(o.pool_a.pool_address, o.pool_b.pool_address): o for o in opportunities}
+        if len(self._opportunities) != len(opportunities):
+            # Repeated pool addresses can't be tracked per pool, always rescan
+            self._pairs = {}
+        self.last_changed = len(token_pairs)
+        self.last_evaluated = None
+        return opportunities
@@ -0,0 +1,124 @@
+import contextvars
+import logging
+import queue
+import threading
+
+from utils.serialization import dumps
+
+# Seconds between keepalive comments while the pipeline is quiet, so proxies keep the connection open
+STREAM_KEEPALIVE = 15.0
+
+# The EventStream of the pipeline run on this thread (and the fetch threads it fans out to)
+current_stream = contextvars.ContextVar('current_stream', default=None)
+
+
+def format_event(event, data):
+    """One server-sent event frame; pool and opportunity records are sent in their client form."""
+    return f"event: {event}\ndata: {dumps(data).decode()}\n\n"
+
+
+class EventStream:
+    """
+    Events of one pipeline run, kept in order so every client following the
+    run gets all of them, including those emitted before it joined.
+    """
+
+    def __init__(self):
+        self._events = []
+        self._changed = threading.Condition()
+
+    def emit(self, event, data=None):
+        with self._changed:
+            self._events.append((event, data))
+            self._changed.notify_all()
+
+    def get(self, position, timeout=None):
+        """The event at `position`, waiting up to `timeout` seconds for it before raising queue.Empty."""
+        with self._changed:
+            if not self._changed.wait_for(lambda: position < len(self._events), timeout=timeout):
+                raise queue.Empty
+            return self._events[position]
+
+
+# Runs being streamed, by key, so identical concurrent requests follow the same one
+_shared_streams = {}
+_shared_streams_lock = threading.Lock()
+
+
+class StreamLogHandler(logging.Handler):
+    """Forwards log records to the EventStream of the run that logged them, if any."""
+
+    def emit(self, record):
+        stream = current_stream.get()
+        if stream is None:
+            return
+        try:
+            stream.emit('log', self.format(record))
+        except Exception:
+            self.handleError(record)
+
+
+def stream_events(func, *args, key=None, group=None, keepalive=STREAM_KEEPALIVE, **kwargs):
+    """
+    Run func(*args, emit=..., **kwargs) on a worker thread and yield its events
+    as server-sent event frames: 'progress', 'log' and 'opportunity' while it
+    runs, then 'done' with the number of results or 'error' with the message.
+
+    Requests with the same `key` made while a run is streaming follow that run
+    instead of starting their own. With `group`, a SingleFlight, the run is also
+    shared with unstreamed calls under `key`; when one of those is already
+    running, its results are sent as opportunities once it finishes.
+    """
+    with _shared_streams_lock:
+        stream = _shared_streams.get(key) if key is not None else None
+        leader = stream is None
+        if leader:
+            stream = EventStream()
+            if key is not None:
+                _shared_streams[key] = stream
+
+    # Set when this run executes func itself rather than joining another caller's run
+    executed = []
+
+    def call():
+        executed.append(True)
+        return func(*args, emit=stream.emit, **kwargs)
+
+    def run():
+        current_stream.set(stream)
+        try:
+            results = group.do(key, call) if group is not None else call()
+            if not executed:
+                for opportunity in results:
+                    stream.emit('opportunity', opportunity)
+            stream.emit('done', {'count': len(results)})
+        except Exception as e:
+            logging.error(f'Streamed run failed: {e}')
+            stream.emit('error', {'error': str(e)})
+        finally:
+            with _shared_streams_lock:
+                if _shared_streams.get(key) is stream:
+                    del _shared_streams[key]
+
+    if leader:
+        threading.Thread(target=contextvars.copy_context().run, args=(run,), name='event-stream',
+                         daemon=True).start()
+    # The run finishes (and fills the caches) even if every client disconnects
+    position = 0
+    while True:
+        try:
+            event, data = stream.get(position, timeout=keepalive)
+        except queue.Empty:
+            yield ': keepalive\n\n'
+            continue
+        position += 1
+        yield format_event(event, data)
+        if event in ('done', 'error'):
+            return
+
+
+def replay_events(results, **done_fields):
+    """Frames for results that are already computed: each opportunity, then 'done'."""
+    for opportunity in results:
+        yield format_event('opportunity', opportunity)
+    yield format_event('done', dict(done_fields, count=len(results)))
@@ -0,0 +1,74 @@
+import logging
+import os
+from collections import namedtuple
+from itertools import product
+
+import utils.main_utils as main_utils
+from utils.metrics import metrics
+from utils.vectorized import find_arbitrage_opportunities_grid
+
+# Most scenarios accepted in one sweep request
+SWEEP_MAX_SCENARIOS = int(os.getenv('SWEEP_MAX_SCENARIOS', 200))
+
+Scenario = namedtuple('Scenario', 'initial_investment slippage fee_percentage')
+
+
+def scenario_grid(initial_investments, slippages, fee_percentages):
+    """Every combination of the given values, investments varying slowest."""
+    return [Scenario(float(investment), float(slippage), float(fee))
+            for investment, slippage, fee in product(initial_investments, slippages, fee_percentages)]
+
+
+def process_arbitrage_sweep(user_purchases, scenarios, search_address=None, limit=main_utils.RESULT_LIMIT):
+    """
+    process_arbitrage_data for many Scenario parameter sets over the same search,
+    as one list of opportunities per scenario, in input order.
+
+    The search is fetched and its candidates built once; they are priced for
+    every scenario in one broadcast pass. The third-pair lookups of all
+    scenarios are fetched together, once, through the shared pair cache, and
+    scenarios finding the same candidates share their triangle index.
+    """
+    scenarios = [Scenario(*scenario) for scenario in scenarios]
+    if not scenarios:
+        return []
+
+    with metrics.timer('arbscreener_stage_duration_seconds', stage='sweep'):
+        token_pairs = main_utils.gather_token_pairs_from_purchases(user_purchases)
+        if not token_pairs:
+            search = main_utils.fetch_and_cache_pairs(search_address)
+            if not search:
+                logging.warning("No token pairs found for the given address.")
+                return [[] for _ in scenarios]
+            token_pairs = main_utils.process_token_pairs(search)
+
+        candidates = find_arbitrage_opportunities_grid(
+            token_pairs,
+            [scenario.slippage for scenario in scenarios],
+            [scenario.fee_percentage for scenario in scenarios],
+            [scenario.initial_investment for scenario in scenarios],
+        )
+
+        prepared = [main_utils.filter_and_process_opportunities(found) for found in candidates]
+        tokens = sorted({quote_pair[0] for quote_pairs, _ in prepared for quote_pair in quote_pairs})
+        main_utils.fetcher.map(main_utils.fetch_token_pairs, tokens)
+        # Served from the pair cache filled above
+        pair_addresses = [tuple(main_utils.matching_pair_addresses(found, quote_pairs, pair_chains)) if found else ()
+                          for found, (quote_pairs, pair_chains) in zip(candidates, prepared)]
+        main_utils.fetch_many_pairs(sorted(set().union(*pair_addresses)))
+
+        token_pair_indexes = {}
+        results = []
+        for scenario, found, unique in zip(scenarios, candidates, pair_addresses):
+            if unique not in token_pair_indexes:
+                token_pair_indexes[unique] = main_utils.fetch_or_use_cached_data(list(unique))[1] if unique else {}
+            results.append(main_utils.top_opportunities(
+                main_utils.complete_opportunities(found, token_pair_indexes[unique], scenario.initial_investment,
+                                                  scenario.slippage, scenario.fee_percentage),
+                limit
+            ))
+
+    logging.info(f'Sweep of {len(scenarios)} scenarios: {len(tokens)} token lookups, '
+                 f'{len(token_pair_indexes)} distinct triangle indexes, '
+                 f'{sum(len(found) for found in results)} opportunities.')
+    return results
@@ -0,0 +1,238 @@
+import logging
+import numpy as np
+
+from utils.arbitrage import (
+    SHARED_BASE,
+    BASE_IS_QUOTE,
+    QUOTE_IS_BASE,
+    calculate_arbitrage_profit,
+    format_opportunity,
+    liquid_pairs,
+    optimal_arbitrage_trade,
+)
+from utils.metrics import metrics
+
+# Candidates priced per array pass, bounds the size of the candidate arrays
+DEFAULT_BLOCK_CANDIDATES = 1 << 20
+
+
+class PairColumns:
+    """Column view of the liquid, priced `process_token_pairs` pools, as `utils.arbitrage.liquid_pairs` keeps them."""
+
+    def __init__(self, token_pairs):
+        self.sources = liquid_pairs(token_pairs)
+        token_codes = {}
+        self.base = np.array([token_codes.setdefault(pair.base_token, len(token_codes))
+                              for pair in self.sources], dtype=np.int64)
+        self.quote = np.array([token_codes.setdefault(pair.quote_token, len(token_codes))
+                               for pair in self.sources], dtype=np.int64)
+        self.price_native = self._column('price_native')
+        self.price_usd = self._column('price_usd')
+        self.liquidity_usd = self._column('liquidity_usd')
+        self.liquidity_base = self._column('liquidity_base')
+        self.liquidity_quote = self._column('liquidity_quote')
+
+    def _column(self, key):
+        return np.fromiter((getattr(pair, key) for pair in self.sources), dtype=np.float64, count=len(self.sources))
+
+    def __len__(self):
+        return len(self.sources)
+
+
+def _join(left_codes, right_codes, left_offset=0):
+    """Return (i, j) for every left row i and right row j holding the same token code."""
+    order = np.argsort(right_codes, kind='stable')
+    sorted_right = right_codes[order]
+    lo = np.searchsorted(sorted_right, left_codes, side='left')
+    hi = np.searchsorted(sorted_right, left_codes, side='right')
+    counts = hi - lo
+    total = int(counts.sum())
+    i = np.repeat(np.arange(len(left_codes)) + left_offset, counts)
+    offsets = np.arange(total) - np.repeat(np.cumsum(counts) - counts, counts)
+    j = order[np.repeat(lo, counts) + offsets]
+    return i, j
+
+
+def candidate_blocks(columns, max_candidates=DEFAULT_BLOCK_CANDIDATES):
+    """
+    Yield (start, stop) pair1 row ranges whose candidates number about
+    max_candidates at most, so a hub token shared by thousands of pools gets
+    small blocks. A single row's candidates always fit in its own block.
+    """
+    token_count = int(max(columns.base.max(initial=-1), columns.quote.max(initial=-1))) + 1
+    base_counts = np.bincount(columns.base, minlength=token_count)
+    quote_counts = np.bincount(columns.quote, minlength=token_count)
+    # Upper bound per row: the three joins of candidate_index_pairs before duplicates are dropped
+    row_counts = base_counts[columns.base] + quote_counts[columns.base] + base_counts[columns.quote]
+    ends = np.cumsum(row_counts)
+    start = 0
+    while start < len(columns):
+        before = int(ends[start - 1]) if start else 0
+        stop = max(start + 1, int(np.searchsorted(ends, before + max_candidates, side='right')))
+        yield start, stop
+        start = stop
+
+
+def candidate_index_pairs(columns, start=0, stop=None):
+    """
+    Build every (i, j, relation) candidate with pair1 rows in [start, stop).
+
+    A couple sharing tokens in several ways keeps the first relation the
+    scalar scan would test, and candidates come out in i-then-j order.
+    """
+    stop = len(columns) if stop is None else stop
+    base_block = columns.base[start:stop]
+    quote_block = columns.quote[start:stop]
+
+    parts = [
+        (_join(base_block, columns.base, start), SHARED_BASE),
+        (_join(base_block, columns.quote, start), BASE_IS_QUOTE),
+        (_join(quote_block, columns.base, start), QUOTE_IS_BASE),
+    ]
+    i = np.concatenate([part[0][0] for part in parts])
+    j = np.concatenate([part[0][1] for part in parts])
+    relation = np.concatenate([np.full(len(part[0][0]), part[1], dtype=np.int8) for part in parts])
+
+    distinct = i != j
+    i, j, relation = i[distinct], j[distinct], relation[distinct]
+
+    key = i.astype(np.int64) * len(columns) + j
+    order = np.lexsort((relation, key))
+    sorted_key = key[order]
+    first = np.ones(len(order), dtype=bool)
+    first[1:] = sorted_key[1:] != sorted_key[:-1]
+    keep = order[first]
+    return i[keep], j[keep], relation[keep]
+
+
+def evaluate_candidates(columns, i, j, relation, slippage, fee_percentage, initial_investment):
+    """
+    Price every candidate in one array pass.
+
+    The scenario parameters may be column arrays of shape (scenarios, 1); the
+    per-scenario results then come out as (scenarios, candidates) matrices.
+
+    Returns (price_diff, profit, base_liquidity, optimal_input, achievable_profit,
+    profitable_mask), profits and optimal_input in USD, computed by the scalar
+    pricing functions applied to whole columns.
+    """
+    price_native = columns.price_native
+    base1, quote1 = columns.base[i], columns.quote[i]
+    base2, quote2 = columns.base[j], columns.quote[j]
+    liquidity_base1, liquidity_quote1 = columns.liquidity_base[i], columns.liquidity_quote[i]
+    liquidity_base2, liquidity_quote2 = columns.liquidity_base[j], columns.liquidity_quote[j]
+
+    with np.errstate(divide='ignore', invalid='ignore', over='ignore'):
+        pair1_price = np.where(relation == QUOTE_IS_BASE, 1 / price_native[i], price_native[i])
+        pair2_price = np.where(relation == BASE_IS_QUOTE, 1 / price_native[j], price_native[j])
+        price_diff = pair2_price - pair1_price
+
+        base_liquidity = np.select(
+            [relation == SHARED_BASE, relation == BASE_IS_QUOTE],
+            [np.minimum(liquidity_base1, liquidity_base2), np.minimum(liquidity_base1, liquidity_quote2)],
+            np.minimum(liquidity_quote1, liquidity_base2),
+        )
+        # two_pool_hops and token_price_usd per candidate, as in utils.arbitrage.evaluate_candidate
+        entry_hop = (np.where(relation == QUOTE_IS_BASE, liquidity_base1, liquidity_quote1),
+                     np.where(relation == QUOTE_IS_BASE, liquidity_quote1, liquidity_base1))
+        exit_hop = (np.where(relation == BASE_IS_QUOTE, liquidity_quote2, liquidity_base2),
+                    np.where(relation == BASE_IS_QUOTE, liquidity_base2, liquidity_quote2))
+        price_usd1, price_usd2 = columns.price_usd[i], columns.price_usd[j]
+        entry_usd = np.where(relation == QUOTE_IS_BASE, price_usd1, price_usd1 / price_native[i])
+        exit_usd = np.where(relation == BASE_IS_QUOTE, price_usd2, price_usd2 / price_native[j])
+        token_in = np.where(relation == QUOTE_IS_BASE, base1, quote1)
+        token_out = np.where(relation == BASE_IS_QUOTE, base2, quote2)
+        exit_usd = np.where(token_out == token_in, entry_usd, exit_usd)
+
+        profit = calculate_arbitrage_profit(initial_investment, entry_hop, exit_hop, slippage,
+                                            fee_percentage, entry_usd, exit_usd)
+        optimal_input, achievable_profit = optimal_arbitrage_trade(entry_hop, exit_hop, slippage,
+                                                                   fee_percentage, entry_usd, exit_usd)
+
+        profitable = (price_diff > 0) & (entry_usd > 0) & (exit_usd > 0) & (profit > 0)
+    return price_diff, profit, base_liquidity, optimal_input, achievable_profit, profitable
+
+
+def iter_arbitrage_opportunities_vectorized(token_pairs, slippage, fee_percentage, initial_investment,
+                                            block_candidates=DEFAULT_BLOCK_CANDIDATES):
+    """
+    Batched two-pool scan over `process_token_pairs` columns, yielding each
+    block's opportunities as soon as the block is priced.
+
+    Same opportunities, in the same order, as
+    `utils.arbitrage.iter_arbitrage_opportunities_indexed`.
+    """
+    columns = PairColumns(token_pairs)
+    total_pairs_checked = 0
+    total_found = 0
+
+    for start, stop in candidate_blocks(columns, block_candidates):
+        i, j, relation = candidate_index_pairs(columns, start, stop)
+        total_pairs_checked += len(i)
+        price_diff, profit, base_liquidity, optimal_input, achievable_profit, profitable = evaluate_candidates(
+            columns, i, j, relation, slippage, fee_percentage, initial_investment
+        )
+        for k in np.flatnonzero(profitable):
+            pair1, pair2 = i[k], j[k]
+            total_found += 1
+            yield format_opportunity(
+                columns.sources[pair1], columns.sources[pair2],
+                float(price_diff[k]),
+                float(columns.liquidity_usd[pair1] - columns.liquidity_usd[pair2]),
+                float(profit[k]),
+                float(base_liquidity[k]),
+                float(optimal_input[k]),
+                float(achievable_profit[k]),
+            )
+
+    logging.info(f'Checked {total_pairs_checked} pair combinations. Found {total_found} arbitrage opportunities.')
+    metrics.inc('arbscreener_pair_combinations_total', total_pairs_checked, scan='vectorized')
+    metrics.inc('arbscreener_opportunities_total', total_found, stage='pair_scan')
+
+
+def find_arbitrage_opportunities_vectorized(token_pairs, slippage, fee_percentage, initial_investment,
+                                            block_candidates=DEFAULT_BLOCK_CANDIDATES):
+    """List form of `iter_arbitrage_opportunities_vectorized`."""
+    return list(iter_arbitrage_opportunities_vectorized(token_pairs, slippage, fee_percentage, initial_investment,
+                                                        block_candidates))
+
+
+def find_arbitrage_opportunities_grid(token_pairs, slippages, fee_percentages, initial_investments,
+                                      block_candidates=DEFAULT_BLOCK_CANDIDATES):
+    """
+    `find_arbitrage_opportunities_vectorized` for many (slippage, fee, investment)
+    scenarios at once, given as equal length sequences: one list of opportunities
+    per scenario.
+
+    Candidates are built once per block and priced for every scenario in one
+    broadcast pass.
+    """
+    columns = PairColumns(token_pairs)
+    slippage, fee_percentage, initial_investment = (
+        np.asarray(values, dtype=np.float64).reshape(-1, 1)
+        for values in (slippages, fee_percentages, initial_investments)
+    )
+    found = [[] for _ in range(len(slippage))]
+    total_pairs_checked = 0
+
+    for start, stop in candidate_blocks(columns, block_candidates):
+        i, j, relation = candidate_index_pairs(columns, start, stop)
+        total_pairs_checked += len(i)
+        price_diff, profit, base_liquidity, optimal_input, achievable_profit, profitable = evaluate_candidates(
+            columns, i, j, relation, slippage, fee_percentage, initial_investment
+        )
+        for scenario, k in zip(*np.nonzero(profitable)):
+            pair1, pair2 = i[k], j[k]
+            found[scenario].append(format_opportunity(
+                columns.sources[pair1], columns.sources[pair2],
+                float(price_diff[k]),
+                float(columns.liquidity_usd[pair1] - columns.liquidity_usd[pair2]),
+                float(profit[scenario, k]),
+                float(base_liquidity[k]),
+                float(optimal_input[scenario, k]),
+                float(achievable_profit[scenario, k]),
+            ))
+
+    logging.info(f'Checked {total_pairs_checked} pair combinations for {len(found)} scenarios.')
+    metrics.inc('arbscreener_pair_combinations_total', total_pairs_checked, scan='grid')
+    return found